@@ -1,6 +1,7 @@
 import os
 from dataclasses import dataclass
 from enum import Enum
+from pathlib import Path
 from typing import Dict
 
 
@@ -14,10 +15,117 @@ class CVVariant(str, Enum):
     VARIANT_B = "variant_b"
 
 
+BASE_DIR = Path(__file__).resolve().parent.parent
+TEMPLATES_DIR = BASE_DIR / "templates"
+STATIC_DIR = BASE_DIR / "static"
+# "production": szablony kompilowane raz przy starcie, statyki z odciskiem treści,
+# wstępnie skompresowane (gzip/brotli) i z długim Cache-Control; "development": bez cache.
+ASSET_MODE = os.getenv("ASSET_MODE", "development").lower()
+
 DEFAULT_MODEL_NAME = os.getenv("OPENAI_MODEL_NAME", "gpt-4.1-mini")
 FALLBACK_API_KEY = "WSTAW_TUTAJ_ALBO_UZYJ_ENV"
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", FALLBACK_API_KEY)
 
+# Wspólna pula połączeń HTTP dla klientów OpenAI (sync i async).
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20"))
+OPENAI_TIMEOUT_SECONDS = float(os.getenv("OPENAI_TIMEOUT_SECONDS", "60"))
+
+# Równoległe generowanie sekcji CV (podsumowanie + doświadczenia).
+CV_GENERATION_CONCURRENCY = int(os.getenv("CV_GENERATION_CONCURRENCY", "8"))
+CV_ITEM_TIMEOUT_SECONDS = float(os.getenv("CV_ITEM_TIMEOUT_SECONDS", "45"))
+# "single_shot": brakujące sekcje w jednym wywołaniu LLM ze strukturalną odpowiedzią
+# (JSON schema); gdy model jej nie obsługuje – osobne wywołanie na sekcję ("sections").
+CV_GENERATION_MODE = os.getenv("CV_GENERATION_MODE", "single_shot").lower()
+
+# Kolejka wywołań API OpenAI: limity zapytań i tokenów na minutę (0 = bez limitu;
+# ustaw zgodnie z limitami konta), maks. liczba równoczesnych wywołań (0 = bez limitu),
+# szacunek tokenów odpowiedzi oraz ponowienia z losowym backoffem po 429.
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "500"))
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "200000"))
+EMBED_REQUESTS_PER_MINUTE = int(os.getenv("EMBED_REQUESTS_PER_MINUTE", "3000"))
+EMBED_TOKENS_PER_MINUTE = int(os.getenv("EMBED_TOKENS_PER_MINUTE", "1000000"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "64"))
+LLM_COMPLETION_TOKENS_ESTIMATE = int(os.getenv("LLM_COMPLETION_TOKENS_ESTIMATE", "500"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "0.5"))
+LLM_RETRY_MAX_SECONDS = float(os.getenv("LLM_RETRY_MAX_SECONDS", "20"))
+
+# Rozmowy z CV coachem przechowywane po stronie serwera.
+CHAT_HISTORY_WINDOW = int(os.getenv("CHAT_HISTORY_WINDOW", "8"))
+CHAT_COMPACT_BATCH = int(os.getenv("CHAT_COMPACT_BATCH", "4"))
+CHAT_MAX_CONVERSATIONS = int(os.getenv("CHAT_MAX_CONVERSATIONS", "1000"))
+CHAT_SESSION_TTL_SECONDS = float(os.getenv("CHAT_SESSION_TTL_SECONDS", "21600"))
+
+# Wsadowe generowanie CV (API i CLI batch_generate.py).
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "1000"))
+
+# Wygenerowane CV (kontekst szablonu i pojedyncze sekcje) adresowane treścią –
+# zmiana wariantu, eksport PDF i drobne edycje bez ponownych wywołań LLM.
+GENERATION_CACHE_SIZE = int(os.getenv("GENERATION_CACHE_SIZE", "512"))
+GENERATION_CACHE_TTL_SECONDS = float(os.getenv("GENERATION_CACHE_TTL_SECONDS", "86400"))
+GENERATION_SECTION_CACHE_SIZE = int(os.getenv("GENERATION_SECTION_CACHE_SIZE", "4096"))
+# Generacje z sekcjami zastępczymi (timeout/błąd LLM) trzymamy krótko – wystarczy
+# na pobranie PDF, a kolejne /generate-cv dogeneruje brakujące sekcje.
+GENERATION_PARTIAL_TTL_SECONDS = float(os.getenv("GENERATION_PARTIAL_TTL_SECONDS", "300"))
+
+# Renderowanie PDF w puli procesów z ograniczoną kolejką.
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+PDF_MAX_QUEUE = int(os.getenv("PDF_MAX_QUEUE", "16"))
+PDF_RENDER_TIMEOUT_SECONDS = float(os.getenv("PDF_RENDER_TIMEOUT_SECONDS", "30"))
+PDF_RETRY_AFTER_SECONDS = int(os.getenv("PDF_RETRY_AFTER_SECONDS", "5"))
+# Cache wyrenderowanych PDF-ów na dysku (pusty katalog = wyłączony).
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", ".cache/pdf")
+PDF_CACHE_MAX_BYTES = int(os.getenv("PDF_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# Metryki: czasy etapów (/metrics w formacie Prometheusa, nagłówek Server-Timing),
+# tokeny i trafienia cache. Wyłączone nie dodają narzutu.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "false").lower() in {"1", "true", "yes", "on"}
+
+# Ładowanie indeksu RAG: "background" (start w tle przy uruchomieniu aplikacji),
+# "lazy" (przy pierwszym zapytaniu) albo "eager" (przed przyjęciem ruchu).
+RAG_LOAD_MODE = os.getenv("RAG_LOAD_MODE", "background").lower()
+# Po nieudanym ładowaniu indeksu kolejna próba nie wcześniej niż po tylu sekundach.
+RAG_LOAD_RETRY_SECONDS = float(os.getenv("RAG_LOAD_RETRY_SECONDS", "60"))
+
+# Składanie kontekstu RAG: ile chunków pobieramy, próg podobieństwa i budżet
+# tokenów kontekstu na jedno wywołanie LLM (sąsiednie chunki są sklejane bez powtórzeń).
+RAG_CANDIDATES = int(os.getenv("RAG_CANDIDATES", "6"))
+RAG_MIN_SCORE = float(os.getenv("RAG_MIN_SCORE", "0.2"))
+# Wyniki BM25 (dzielone przez maksimum możliwe dla zapytania) nie są porównywalne
+# z podobieństwem kosinusowym – długie zapytania rzadko przekraczają 0.3 – więc
+# mają własny próg. W trybie hybrydowym próg to średnia obu ważona RAG_HYBRID_WEIGHT.
+RAG_LEXICAL_MIN_SCORE = float(os.getenv("RAG_LEXICAL_MIN_SCORE", "0.1"))
+RAG_CONTEXT_TOKEN_BUDGET = int(os.getenv("RAG_CONTEXT_TOKEN_BUDGET", "800"))
+
+# Wyszukiwanie w indeksie RAG: "auto" (IVF, jeśli zbudowano go przy ingestion),
+# "exact" (pełne skanowanie) lub "ivf". nprobe (ile list IVF przeszukujemy)
+# i rerank (ilu kandydatów na wynik przeliczamy dokładnie) to pokrętła trafność/czas.
+RAG_INDEX_TYPE = os.getenv("RAG_INDEX_TYPE", "auto").lower()
+RAG_ANN_NPROBE = int(os.getenv("RAG_ANN_NPROBE", "8"))
+RAG_ANN_RERANK = int(os.getenv("RAG_ANN_RERANK", "4"))
+
+# Tryb wyszukiwania RAG: "embedding" (podobieństwo embeddingów, wymaga wywołania API),
+# "lexical" (lokalny indeks BM25, bez sieci) albo "hybrid" (ważona suma obu wyników;
+# RAG_HYBRID_WEIGHT to waga embeddingów). Podpowiedzi doświadczenia mają własny tryb,
+# bo liczy się w nich czas odpowiedzi.
+RAG_RETRIEVAL_MODE = os.getenv("RAG_RETRIEVAL_MODE", "embedding").lower()
+RAG_SUGGEST_RETRIEVAL_MODE = os.getenv("RAG_SUGGEST_RETRIEVAL_MODE", "lexical").lower()
+RAG_HYBRID_WEIGHT = float(os.getenv("RAG_HYBRID_WEIGHT", "0.7"))
+
+# Cache embeddingów zapytań RAG (pamięć LRU/TTL + opcjonalnie SQLite na dysku).
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "2048"))
+EMBED_CACHE_TTL_SECONDS = float(os.getenv("EMBED_CACHE_TTL_SECONDS", "86400"))
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", "")
+EMBED_CACHE_DISK_MAX_ENTRIES = int(os.getenv("EMBED_CACHE_DISK_MAX_ENTRIES", "50000"))
+
+# Cache odpowiedzi LLM dla deterministycznych generacji (podsumowanie, bullety, sugestie).
+COMPLETION_CACHE_BACKEND = os.getenv("COMPLETION_CACHE_BACKEND", "memory")
+COMPLETION_CACHE_SIZE = int(os.getenv("COMPLETION_CACHE_SIZE", "1024"))
+COMPLETION_CACHE_TTL_SECONDS = float(os.getenv("COMPLETION_CACHE_TTL_SECONDS", "604800"))
+COMPLETION_CACHE_PATH = os.getenv("COMPLETION_CACHE_PATH", ".cache/completions.sqlite")
+
 
 @dataclass(frozen=True)
 class ModelConfig:
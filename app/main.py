@@ -1,25 +1,122 @@
 import json
+import logging
+import os
+import tempfile
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Optional, Tuple
 
-from fastapi import Body, FastAPI, Form, Request
-from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
+from fastapi import BackgroundTasks, Body, FastAPI, Form, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import (
+    HTMLResponse,
+    JSONResponse,
+    Response,
+    StreamingResponse,
+)
+from starlette.background import BackgroundTask
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from pydantic import ValidationError
 
-from .config import CVVariant, ProfileType
+from .config import (
+    BATCH_CONCURRENCY,
+    BATCH_MAX_ITEMS,
+    METRICS_ENABLED,
+    PDF_RETRY_AFTER_SECONDS,
+    RAG_LOAD_MODE,
+    STATIC_DIR,
+    CVVariant,
+    ProfileType,
+)
 from .models import CVInput, EducationItem, ExperienceItem
-from .services.cv_engine import build_cv_context, choose_template
-from .services.llm_client import chat_with_cv_coach, suggest_experience_raw
-from .services.pdf_generator import html_to_pdf_bytes
+from .services.assets import etag_matches
+from .services.batch import RENDER_MODES, generate_batch, serialize_cv_context
+from .services.cv_engine import choose_template
+from .services.conversation_store import Conversation, conversation_store
+from .services.generation_store import Generation, generation_store
+from .services.llm_client import (
+    chat_with_cv_coach_async,
+    stream_chat_with_cv_coach,
+    suggest_experience_raw_async,
+    summarize_conversation_async,
+)
+from .services.metrics import MetricsMiddleware, record_cache, registry, span
+from .services.openai_clients import close_openai_clients
+from .services.pdf_cache import pdf_cache, pdf_cache_key
+from .services.pdf_generator import (
+    PDF_STREAM_CHUNK_SIZE,
+    PdfQueueFullError,
+    PdfRenderError,
+    PdfRenderTimeoutError,
+    pdf_render_service,
+)
+from .services.rag_client import (
+    index_status,
+    is_index_ready,
+    load_index_async,
+    start_background_load,
+)
+from .services.rendering import (
+    asset_store,
+    precompile_templates,
+    render_cv_html,
+    template_env,
+)
 
-app = FastAPI()
+logger = logging.getLogger(__name__)
 
-app.mount("/static", StaticFiles(directory="static"), name="static")
-templates = Jinja2Templates(directory="templates")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if asset_store is not None:
+        precompile_templates()
+    if RAG_LOAD_MODE == "eager":
+        await load_index_async()
+    elif RAG_LOAD_MODE == "background":
+        start_background_load()
+    yield
+    pdf_render_service.shutdown()
+    await close_openai_clients()
+
+
+app = FastAPI(lifespan=lifespan)
+
+if asset_store is not None:
+
+    @app.get("/static/{path:path}", include_in_schema=False)
+    async def static_asset(request: Request, path: str):
+        return asset_store.response(request, path)
+
+else:
+    app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
+templates = Jinja2Templates(env=template_env)
+
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        return Response(registry.render(), media_type="text/plain; version=0.0.4")
 
 
 @app.get("/", response_class=HTMLResponse)
 async def index(request: Request):
-    return templates.TemplateResponse("main.html", {"request": request})
+    return templates.TemplateResponse(request, "main.html")
+
+
+@app.get("/health/live")
+async def health_live():
+    return {"status": "ok"}
+
+
+@app.get("/health/ready")
+async def health_ready():
+    if not is_index_ready():
+        # po nieudanym ładowaniu ponawiamy je w tle (z odstępem między próbami)
+        start_background_load()
+        return JSONResponse(index_status(), status_code=503)
+    return index_status()
 
 
 @app.post("/generate-cv", response_class=HTMLResponse)
@@ -82,27 +179,235 @@ async def generate_cv(
         skills=skills_list,
     )
 
-    context = build_cv_context(cv_input)
-    context["request"] = request
+    generation = await generation_store.generate(cv_input)
 
     template_name = choose_template(cv_input)
-    return templates.TemplateResponse(template_name, context)
+    with span("render.template"):
+        return templates.TemplateResponse(
+            request,
+            template_name,
+            {**generation.context, "generation_id": generation.id},
+        )
 
 
-@app.post("/generate-pdf")
-async def generate_pdf(request: Request, html: str = Form(...)):
-    pdf_bytes = html_to_pdf_bytes(html)
+def _stream_pdf_file(
+    handle: BinaryIO, headers: Dict[str, str], delete: Optional[Path] = None
+):
+    """
+    Strumieniuje otwarty plik PDF w kawałkach z poprawnym Content-Length.
+    Plik jest otwarty przed wysyłką, więc równoległa eviction z cache jej
+    nie przerwie; `delete` to plik tymczasowy do usunięcia po zakończeniu.
+    """
+    size = os.fstat(handle.fileno()).st_size
+
+    async def chunks():
+        try:
+            while True:
+                chunk = await run_in_threadpool(handle.read, PDF_STREAM_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            handle.close()
+            if delete is not None:
+                delete.unlink(missing_ok=True)
+
     return StreamingResponse(
-        iter([pdf_bytes]),
+        chunks(),
         media_type="application/pdf",
-        headers={"Content-Disposition": 'attachment; filename="cv.pdf"'},
+        headers={**headers, "Content-Length": str(size)},
     )
 
 
+async def _pdf_response(request: Request, html: str):
+    """
+    PDF dla gotowego HTML. Klucz cache (hash HTML + wersja renderera) służy
+    też jako ETag – przeglądarka z aktualną kopią dostaje 304 bez renderowania.
+    Worker renderuje prosto do pliku, który trafia do cache przez rename
+    i jest wysyłany strumieniowo – pamięć na żądanie nie zależy od rozmiaru PDF.
+    Do cache trafia wyłącznie PDF wyrenderowany bez błędów.
+    """
+    key = pdf_cache_key(html)
+    etag = f'"{key}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "private, no-cache",
+        "Content-Disposition": 'attachment; filename="cv.pdf"',
+    }
+    if etag_matches(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=304, headers=headers)
+
+    if pdf_cache is not None:
+        cached = await run_in_threadpool(pdf_cache.open, key)
+        record_cache("pdf", cached is not None)
+        if cached is not None:
+            return _stream_pdf_file(cached, headers)
+
+    if pdf_cache is not None:
+        tmp_path = await run_in_threadpool(pdf_cache.temp_path)
+    else:
+        fd, tmp_name = tempfile.mkstemp(suffix=".pdf")
+        os.close(fd)
+        tmp_path = Path(tmp_name)
+
+    try:
+        await pdf_render_service.render_to_file(html, str(tmp_path))
+    except PdfQueueFullError as e:
+        tmp_path.unlink(missing_ok=True)
+        return JSONResponse(
+            {"error": str(e)},
+            status_code=503,
+            headers={"Retry-After": str(PDF_RETRY_AFTER_SECONDS)},
+        )
+    except PdfRenderTimeoutError as e:
+        tmp_path.unlink(missing_ok=True)
+        return JSONResponse({"error": str(e)}, status_code=504)
+    except PdfRenderError as e:
+        tmp_path.unlink(missing_ok=True)
+        logger.error("Nie udało się wyrenderować PDF: %s", e)
+        return JSONResponse({"error": str(e)}, status_code=500)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+    # otwarty uchwyt przeżyje rename do cache i ewentualną eviction wpisu
+    handle = open(tmp_path, "rb")
+    if pdf_cache is not None and pdf_cache.put_file(key, tmp_path) is not None:
+        return _stream_pdf_file(handle, headers)
+    return _stream_pdf_file(handle, headers, delete=tmp_path)
+
+
+@app.post("/generate-pdf")
+async def generate_pdf(request: Request, html: str = Form(...)):
+    return await _pdf_response(request, html)
+
+
+def _generation_pdf_html(generation: Generation) -> str:
+    return render_cv_html(generation.cv_input, generation.context)
+
+
+def _resolve_generation(
+    generation_id: str, variant: Optional[str] = None
+) -> Tuple[Optional[Generation], Optional[JSONResponse]]:
+    generation = generation_store.get(generation_id)
+    if generation is None:
+        return None, JSONResponse(
+            {"error": "nieznana lub wygasła generacja CV"}, status_code=404
+        )
+    if variant:
+        try:
+            generation = generation.with_variant(CVVariant(variant))
+        except ValueError:
+            return None, JSONResponse(
+                {"error": f"nieznany wariant CV: {variant}"}, status_code=400
+            )
+    return generation, None
+
+
+@app.get("/cv/{generation_id}/pdf")
+async def generation_pdf(
+    request: Request, generation_id: str, variant: Optional[str] = None
+):
+    """
+    PDF dla CV wygenerowanego wcześniej przez /generate-cv – bez ponownych
+    wywołań LLM i bez przesyłania HTML z przeglądarki. `variant` pozwala
+    pobrać tę samą treść w innym układzie.
+    """
+    generation, error = _resolve_generation(generation_id, variant)
+    if error is not None:
+        return error
+    return await _pdf_response(request, _generation_pdf_html(generation))
+
+
+@app.post("/api/cv/pdf")
+async def api_cv_pdf(request: Request, data: dict = Body(...)):
+    """
+    Jednorazowy eksport do PDF: przyjmuje {"generation_id": ..., "cv_variant": ...}
+    albo pełny CVInput.
+    """
+    generation_id = data.get("generation_id")
+    if generation_id:
+        generation, error = _resolve_generation(generation_id, data.get("cv_variant"))
+        if error is not None:
+            return error
+    else:
+        try:
+            cv_input = CVInput.model_validate(data)
+        except ValidationError as e:
+            return JSONResponse({"error": e.errors(include_url=False)}, status_code=422)
+        generation = await generation_store.generate(cv_input)
+
+    response = await _pdf_response(request, _generation_pdf_html(generation))
+    response.headers["X-Generation-Id"] = generation.id
+    return response
+
+
+@app.post("/api/cv/{generation_id}/regenerate")
+async def api_cv_regenerate(generation_id: str, data: dict = Body(default={})):
+    """
+    Generuje ponownie wskazane sekcje CV ({"sections": ["summary", "experience:0"]}),
+    pomijając cache; pozostałe sekcje zostają bez zmian.
+    """
+    generation, error = _resolve_generation(generation_id)
+    if error is not None:
+        return error
+    sections = data.get("sections") or ["summary"]
+    generation = await generation_store.generate(generation.cv_input, refresh=sections)
+    return {"generation_id": generation.id, **serialize_cv_context(generation.context)}
+
+
+async def _read_batch_request(request: Request) -> Tuple[List[dict], dict]:
+    """
+    Batch przyjmuje listę JSON, obiekt {"items": [...], ...} albo NDJSON
+    (jeden rekord CVInput na linię). Zwraca (rekordy, opcje).
+    """
+    body = (await request.body()).decode("utf-8")
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type or "jsonl" in content_type:
+        records = [json.loads(line) for line in body.splitlines() if line.strip()]
+        return records, dict(request.query_params)
+    data = json.loads(body or "null")
+    if isinstance(data, list):
+        return data, dict(request.query_params)
+    if isinstance(data, dict) and isinstance(data.get("items"), list):
+        options = {k: v for k, v in data.items() if k != "items"}
+        return data["items"], {**request.query_params, **options}
+    raise ValueError("oczekiwano listy rekordów, obiektu {'items': [...]} albo NDJSON")
+
+
+@app.post("/api/batch/generate-cv")
+async def api_batch_generate_cv(request: Request):
+    try:
+        records, options = await _read_batch_request(request)
+        render = str(options.get("render", "none"))
+        concurrency = int(options.get("concurrency", BATCH_CONCURRENCY))
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    if render not in RENDER_MODES:
+        return JSONResponse(
+            {"error": f"render musi być jednym z: {', '.join(sorted(RENDER_MODES))}"},
+            status_code=400,
+        )
+    if len(records) > BATCH_MAX_ITEMS:
+        return JSONResponse(
+            {"error": f"maksymalnie {BATCH_MAX_ITEMS} rekordów w jednym batchu"},
+            status_code=413,
+        )
+
+    async def result_lines():
+        # Wyniki w kolejności ukończenia – pole "index" wskazuje rekord wejściowy
+        async for result in generate_batch(
+            records, min(concurrency, BATCH_CONCURRENCY), render
+        ):
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(result_lines(), media_type="application/x-ndjson")
+
+
 @app.get("/assistant", response_class=HTMLResponse)
 async def assistant_get(request: Request):
     messages = []
-    history = json.dumps(messages, ensure_ascii=False)
     
     # Pobierz dane z query params (jeśli przekazane z formularza)
     candidate_data = {}
@@ -116,11 +421,12 @@ async def assistant_get(request: Request):
         }
     
     return templates.TemplateResponse(
+        request,
         "assistant.html",
         {
-            "request": request,
             "messages": messages,
-            "history": history,
+            "conversation_id": "",
+            "summary": "",
             "candidate_data": candidate_data,
         },
     )
@@ -129,21 +435,20 @@ async def assistant_get(request: Request):
 @app.post("/assistant", response_class=HTMLResponse)
 async def assistant_post(
     request: Request,
+    background_tasks: BackgroundTasks,
     user_input: str = Form(...),
-    history: str = Form("[]"),
+    conversation_id: str = Form(""),
     full_name: str = Form(""),
     email: str = Form(""),
     phone: str = Form(""),
     target_role: str = Form(""),
     skills: str = Form(""),
 ):
-    messages = json.loads(history)
-    messages.append({"role": "user", "content": user_input})
-
-    answer = chat_with_cv_coach(messages)
-    messages.append({"role": "assistant", "content": answer})
+    conv = conversation_store.get_or_create(conversation_id)
+    messages = conv.messages + [{"role": "user", "content": user_input}]
 
-    new_history = json.dumps(messages, ensure_ascii=False)
+    answer = await chat_with_cv_coach_async(messages, summary=conv.summary)
+    _record_turn(conv, user_input, answer, background_tasks)
     
     # Przygotuj dane kandydata
     candidate_data = {}
@@ -157,16 +462,67 @@ async def assistant_post(
         }
     
     return templates.TemplateResponse(
+        request,
         "assistant.html",
         {
-            "request": request,
-            "messages": messages,
-            "history": new_history,
+            "messages": conv.messages,
+            "conversation_id": conv.id,
+            "summary": conv.summary,
             "candidate_data": candidate_data,
         },
     )
 
 
+async def _compact_conversation(conv: Conversation) -> None:
+    """
+    Zwija najstarsze tury rozmowy do podsumowania (uruchamiane po wysłaniu odpowiedzi).
+    """
+    compacted = conversation_store.pending_compaction(conv)
+    if not compacted:
+        return
+    summary = None
+    try:
+        summary = await summarize_conversation_async(conv.summary, compacted)
+    except Exception:
+        logger.exception("Nie udało się podsumować rozmowy %s", conv.id)
+    finally:
+        conversation_store.apply_compaction(conv, compacted, summary)
+
+
+def _record_turn(
+    conv: Conversation,
+    user_message: str,
+    answer: str,
+    background_tasks: Optional[BackgroundTasks] = None,
+) -> None:
+    conv.append("user", user_message)
+    conv.append("assistant", answer)
+    if background_tasks is not None:
+        background_tasks.add_task(_compact_conversation, conv)
+
+
+def _resolve_chat_turn(
+    data: dict,
+) -> Tuple[Optional[Conversation], List[Dict[str, str]], str]:
+    """
+    Obsługuje dwa formaty żądania czatu:
+    - {"conversation_id": ..., "message": "..."} – historia trzymana po stronie serwera,
+    - {"messages": [...]} – pełna historia od klienta (dotychczasowy format).
+    Zwraca (rozmowa lub None, wiadomości dla modelu, podsumowanie starszych tur).
+    """
+    message = data.get("message")
+    if message:
+        conv = conversation_store.get_or_create(data.get("conversation_id"))
+        return conv, conv.messages + [{"role": "user", "content": message}], conv.summary
+    return None, data.get("messages", []), ""
+
+
+@app.delete("/api/assistant/conversations/{conversation_id}")
+async def api_delete_conversation(conversation_id: str):
+    conversation_store.delete(conversation_id)
+    return {"deleted": conversation_id}
+
+
 @app.post("/api/suggest/experience")
 async def api_suggest_experience(data: dict = Body(...)):
     role = data.get("role", "")
@@ -179,28 +535,73 @@ async def api_suggest_experience(data: dict = Body(...)):
             status_code=400,
         )
 
-    variants = suggest_experience_raw(role, company, target_role)
+    variants = await suggest_experience_raw_async(
+        role, company, target_role, use_cache=not data.get("no_cache", False)
+    )
     return {"variants": variants}
 
 
 @app.post("/api/assistant/chat")
-async def api_assistant_chat(data: dict = Body(...)):
-    messages = data.get("messages", [])
+async def api_assistant_chat(background_tasks: BackgroundTasks, data: dict = Body(...)):
+    conv, messages, summary = _resolve_chat_turn(data)
     candidate_data = data.get("candidate_data", {})
     
     if not messages:
         return JSONResponse(
-            {"error": "messages są wymagane"},
+            {"error": "message lub messages są wymagane"},
             status_code=400,
         )
     
     try:
         # Przekaż dane kandydata do funkcji chatu
-        answer = chat_with_cv_coach(messages, candidate_data)
-        return {"response": answer}
+        answer = await chat_with_cv_coach_async(messages, candidate_data, summary)
+        if conv is None:
+            return {"response": answer}
+        _record_turn(conv, messages[-1]["content"], answer, background_tasks)
+        return {"response": answer, "conversation_id": conv.id}
     except Exception as e:
         return JSONResponse(
             {"error": str(e)},
             status_code=500,
         )
 
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.post("/api/assistant/chat/stream")
+async def api_assistant_chat_stream(request: Request, data: dict = Body(...)):
+    conv, messages, summary = _resolve_chat_turn(data)
+    candidate_data = data.get("candidate_data", {})
+
+    if not messages:
+        return JSONResponse(
+            {"error": "message lub messages są wymagane"},
+            status_code=400,
+        )
+
+    async def event_stream():
+        events = stream_chat_with_cv_coach(messages, candidate_data, summary)
+        try:
+            async for item in events:
+                # Klient się rozłączył – zamknięcie generatora przerywa zapytanie do modelu
+                if await request.is_disconnected():
+                    break
+                if item["event"] == "done" and conv is not None:
+                    _record_turn(conv, messages[-1]["content"], item["data"]["response"])
+                    item["data"]["conversation_id"] = conv.id
+                yield _sse(item["event"], item["data"])
+        except Exception as e:
+            yield _sse("error", {"error": str(e)})
+        finally:
+            await events.aclose()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=(
+            BackgroundTask(_compact_conversation, conv) if conv is not None else None
+        ),
+    )
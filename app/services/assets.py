@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import gzip
+import mimetypes
+from dataclasses import dataclass
+from hashlib import sha256
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+try:  # opcjonalnie – bez pakietu brotli serwujemy gzip
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+# Pliki z odciskiem w nazwie nigdy się nie zmieniają – przeglądarka może je trzymać bezterminowo.
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "public, no-cache"
+_COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+
+
+@dataclass(frozen=True)
+class Asset:
+    name: str
+    fingerprinted_name: str
+    content_type: str
+    etag: str
+    body: bytes
+    gzip_body: Optional[bytes]
+    brotli_body: Optional[bytes]
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    Czy nagłówek If-None-Match obejmuje dany ETag (porównanie słabe, jak w RFC 9110).
+    """
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag in candidates or "*" in candidates
+
+
+def _fingerprinted(name: str, digest: str) -> str:
+    path = Path(name)
+    return str(path.with_name(f"{path.stem}.{digest[:12]}{path.suffix}").as_posix())
+
+
+def _load_asset(static_dir: Path, path: Path) -> Asset:
+    body = path.read_bytes()
+    name = path.relative_to(static_dir).as_posix()
+    digest = sha256(body).hexdigest()
+    content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    if content_type.startswith("text/"):
+        content_type += "; charset=utf-8"
+    gzip_body = brotli_body = None
+    if content_type.startswith(_COMPRESSIBLE_TYPES):
+        gzip_body = gzip.compress(body, compresslevel=9, mtime=0)
+        if brotli is not None:
+            brotli_body = brotli.compress(body, quality=11)
+        # bardzo małe pliki po kompresji bywają większe
+        if len(gzip_body) >= len(body):
+            gzip_body = None
+        if brotli_body is not None and len(brotli_body) >= len(body):
+            brotli_body = None
+    return Asset(
+        name=name,
+        fingerprinted_name=_fingerprinted(name, digest),
+        content_type=content_type,
+        etag=f'"{digest[:32]}"',
+        body=body,
+        gzip_body=gzip_body,
+        brotli_body=brotli_body,
+    )
+
+
+class AssetStore:
+    """
+    Statyczne pliki wczytane raz przy starcie: odcisk treści w nazwie
+    (`main.3f2a9c1b7d4e.css`), ETag oraz wstępnie skompresowane warianty
+    gzip/brotli. Pliki z odciskiem są serwowane z długim Cache-Control,
+    zwykłe nazwy – z rewalidacją po ETag.
+    """
+
+    def __init__(self, static_dir: Union[str, Path], url_prefix: str = "/static") -> None:
+        self.static_dir = Path(static_dir)
+        self.url_prefix = url_prefix.rstrip("/")
+        self._by_name: Dict[str, Asset] = {}
+        self._by_fingerprint: Dict[str, Asset] = {}
+        for path in sorted(self.static_dir.rglob("*")):
+            if path.is_file():
+                asset = _load_asset(self.static_dir, path)
+                self._by_name[asset.name] = asset
+                self._by_fingerprint[asset.fingerprinted_name] = asset
+
+    def url(self, name: str) -> str:
+        asset = self._by_name.get(name)
+        if asset is None:
+            return f"{self.url_prefix}/{name}"
+        return f"{self.url_prefix}/{asset.fingerprinted_name}"
+
+    def response(self, request: Request, path: str) -> Response:
+        asset = self._by_fingerprint.get(path)
+        cache_control = IMMUTABLE_CACHE_CONTROL
+        if asset is None:
+            asset = self._by_name.get(path)
+            cache_control = REVALIDATE_CACHE_CONTROL
+        if asset is None:
+            return Response(status_code=404)
+
+        # każdy wariant kodowania to osobna reprezentacja – osobny ETag
+        accept_encoding = request.headers.get("accept-encoding", "")
+        body, encoding = asset.body, None
+        if asset.brotli_body is not None and "br" in accept_encoding:
+            body, encoding = asset.brotli_body, "br"
+        elif asset.gzip_body is not None and "gzip" in accept_encoding:
+            body, encoding = asset.gzip_body, "gzip"
+        etag = asset.etag if encoding is None else f'{asset.etag[:-1]}-{encoding}"'
+
+        headers = {"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+        if etag_matches(request.headers.get("if-none-match", ""), etag):
+            return Response(status_code=304, headers=headers)
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+        return Response(body, media_type=asset.content_type, headers=headers)
+
+    def __len__(self) -> int:
+        return len(self._by_name)
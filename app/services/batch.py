@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import asyncio
+import base64
+import re
+from functools import partial
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, Optional
+
+from pydantic import ValidationError
+
+from ..config import BATCH_CONCURRENCY, PDF_RETRY_AFTER_SECONDS
+from ..models import CVInput
+from .generation_store import generation_store
+from .llm_scheduler import Priority, priority
+from .pdf_generator import PdfQueueFullError, pdf_render_service
+from .rendering import render_cv_html
+
+RENDER_MODES = {"none", "html", "pdf"}
+
+
+def serialize_cv_context(context: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Zamienia kontekst z `build_cv_context` na słownik serializowalny do JSON.
+    """
+    return {
+        "summary": context["summary"],
+        "experience": [
+            {
+                "role": section["item"].role,
+                "company": section["item"].company,
+                "start_year": section["item"].start_year,
+                "end_year": section["item"].end_year,
+                "bullets": section["bullets"],
+            }
+            for section in context["experience_sections"]
+        ],
+    }
+
+
+def _output_stem(item_id: str) -> Optional[str]:
+    """
+    Nazwa pliku wynikowego z id rekordu – bez separatorów ścieżki, żeby zapis
+    nie wyszedł poza katalog wynikowy. None dla id pustego albo z samych kropek.
+    """
+    stem = re.sub(r"[^\w.-]", "_", item_id)
+    if not stem.strip("."):
+        return None
+    return stem
+
+
+async def _retry_on_full_queue(render: Callable[[], Awaitable[Any]]) -> Any:
+    # Batch nie powinien odpadać na backpressure – czekamy na wolne miejsce w kolejce.
+    while True:
+        try:
+            return await render()
+        except PdfQueueFullError:
+            await asyncio.sleep(PDF_RETRY_AFTER_SECONDS / 5)
+
+
+async def _process_item(
+    index: int,
+    record: Dict[str, Any],
+    render: str,
+    output_dir: Optional[Path],
+) -> Dict[str, Any]:
+    item_id = str(record.get("id", index)) if isinstance(record, dict) else str(index)
+    result: Dict[str, Any] = {"index": index, "id": item_id}
+    try:
+        payload = {k: v for k, v in record.items() if k != "id"}
+        cv_input = CVInput.model_validate(payload)
+    except (ValidationError, AttributeError) as e:
+        return {**result, "status": "error", "stage": "validation", "error": str(e)}
+    stem = _output_stem(item_id)
+    if output_dir is not None and render != "none" and stem is None:
+        return {
+            **result,
+            "status": "error",
+            "stage": "validation",
+            "error": f"id rekordu nie nadaje się na nazwę pliku: {item_id!r}",
+        }
+
+    try:
+        generation = await generation_store.generate(cv_input)
+    except Exception as e:
+        return {**result, "status": "error", "stage": "generation", "error": str(e)}
+    context = generation.context
+    # sekcje zastąpione pustą wartością (timeout/błąd LLM) – CV jest niepełne
+    partial_sections = context["partial_sections"]
+    result.update(
+        status="partial" if partial_sections else "ok",
+        generation_id=generation.id,
+        **serialize_cv_context(context),
+    )
+    if partial_sections:
+        result["partial_sections"] = partial_sections
+
+    if render == "none":
+        return result
+
+    try:
+        html = render_cv_html(cv_input, context)
+        if render == "pdf":
+            if output_dir is not None:
+                # worker zapisuje PDF prosto do pliku wynikowego
+                path = output_dir / f"{stem}.pdf"
+                await _retry_on_full_queue(
+                    partial(pdf_render_service.render_to_file, html, str(path))
+                )
+                result["pdf_path"] = str(path)
+            else:
+                pdf_bytes = await _retry_on_full_queue(
+                    partial(pdf_render_service.render, html)
+                )
+                result["pdf_base64"] = base64.b64encode(pdf_bytes).decode("ascii")
+        elif output_dir is not None:
+            path = output_dir / f"{stem}.html"
+            path.write_text(html, encoding="utf-8")
+            result["html_path"] = str(path)
+        else:
+            result["html"] = html
+    except Exception as e:
+        result.update(status="error", stage="render", error=str(e))
+    return result
+
+
+async def generate_batch(
+    records: Iterable[Dict[str, Any]],
+    concurrency: int = BATCH_CONCURRENCY,
+    render: str = "none",
+    output_dir: Optional[Path] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Generuje CV dla wielu rekordów `CVInput` z ograniczoną równoległością
+    i zwraca wyniki w kolejności ukończenia (pole "index" wskazuje pozycję
+    na wejściu). Błędy są raportowane per rekord, nie przerywają batcha;
+    status "partial" oznacza CV z sekcjami, których nie udało się wygenerować.
+    Identyczne zapytania RAG/LLM w obrębie batcha są wykonywane raz
+    (cache odpowiedzi + łączenie równoczesnych wywołań).
+    """
+    if render not in RENDER_MODES:
+        raise ValueError(f"render musi być jednym z: {', '.join(sorted(RENDER_MODES))}")
+    if output_dir is not None:
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def _bounded(index: int, record: Dict[str, Any]) -> Dict[str, Any]:
+        async with semaphore:
+            return await _process_item(index, record, render, output_dir)
+
+    # zadania dziedziczą kontekst – wywołania LLM z batcha ustępują interaktywnym
+    with priority(Priority.BULK):
+        tasks = [
+            asyncio.ensure_future(_bounded(index, record))
+            for index, record in enumerate(records)
+        ]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import json
+from hashlib import sha256
+from typing import Dict, List, Optional, Protocol
+
+from ..config import (
+    COMPLETION_CACHE_BACKEND,
+    COMPLETION_CACHE_PATH,
+    COMPLETION_CACHE_SIZE,
+    COMPLETION_CACHE_TTL_SECONDS,
+)
+from .cache import SQLiteCache, TTLCache
+
+
+class CompletionCacheBackend(Protocol):
+    def get(self, key: str) -> Optional[str]: ...
+
+    def set(self, key: str, value: str) -> None: ...
+
+    def clear(self) -> None: ...
+
+    def stats(self) -> Dict[str, int]: ...
+
+
+class MemoryCompletionBackend:
+    """
+    Backend w pamięci procesu (LRU + TTL).
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: Optional[float]) -> None:
+        self._cache = TTLCache(max_size, ttl_seconds)
+
+    def get(self, key: str) -> Optional[str]:
+        return self._cache.get(key)
+
+    def set(self, key: str, value: str) -> None:
+        self._cache.set(key, value)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return self._cache.stats()
+
+
+class SQLiteCompletionBackend:
+    """
+    Backend w lokalnym pliku SQLite – współdzielony przez workery i restarty.
+    """
+
+    def __init__(self, path: str, max_size: int, ttl_seconds: Optional[float]) -> None:
+        self._cache = SQLiteCache(path, max_size, ttl_seconds, table="completions")
+
+    def get(self, key: str) -> Optional[str]:
+        raw = self._cache.get(key)
+        return raw.decode("utf-8") if raw is not None else None
+
+    def set(self, key: str, value: str) -> None:
+        self._cache.set(key, value.encode("utf-8"))
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return self._cache.stats()
+
+
+def completion_cache_key(model: str, messages: List[Dict[str, str]]) -> str:
+    """
+    Hash modelu i pełnej listy wiadomości. Kontekst RAG jest częścią promptu,
+    więc zmiana bazy wiedzy automatycznie daje nowy klucz.
+    """
+    payload = json.dumps(
+        {"model": model, "messages": messages},
+        ensure_ascii=False,
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return sha256(payload.encode("utf-8")).hexdigest()
+
+
+def build_completion_cache(
+    backend: str = COMPLETION_CACHE_BACKEND,
+) -> Optional[CompletionCacheBackend]:
+    """
+    Tworzy backend cache odpowiedzi LLM na podstawie konfiguracji
+    ("memory", "sqlite" albo "none").
+    """
+    backend = backend.lower()
+    if backend == "memory":
+        return MemoryCompletionBackend(COMPLETION_CACHE_SIZE, COMPLETION_CACHE_TTL_SECONDS)
+    if backend == "sqlite":
+        return SQLiteCompletionBackend(
+            COMPLETION_CACHE_PATH, COMPLETION_CACHE_SIZE, COMPLETION_CACHE_TTL_SECONDS
+        )
+    if backend in {"", "none", "off"}:
+        return None
+    raise ValueError(f"Nieznany backend cache odpowiedzi LLM: {backend}")
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from ..config import RAG_CONTEXT_TOKEN_BUDGET, RAG_MIN_SCORE
+
+# Najkrótszy fragment, od którego szukamy wspólnej części sąsiednich chunków.
+_MIN_OVERLAP_PROBE = 16
+
+
+@dataclass(frozen=True)
+class RetrievedChunk:
+    source: str
+    chunk_id: str
+    content: str
+    score: float
+
+
+@dataclass
+class AssembledContext:
+    passages: List[str] = field(default_factory=list)
+    # przybliżona liczba tokenów kontekstu po złożeniu
+    tokens: int = 0
+    # ile tokenów kosztowałoby wklejenie wprost wszystkich chunków powyżej progu
+    tokens_naive: int = 0
+    chunks_used: int = 0
+
+    @property
+    def tokens_saved(self) -> int:
+        return max(0, self.tokens_naive - self.tokens)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Przybliżona liczba tokenów (~4 znaki na token) – wystarcza do budżetowania
+    promptu bez zależności od tokenizera.
+    """
+    return (len(text) + 3) // 4
+
+
+def _chunk_position(chunk_id: str) -> Optional[int]:
+    # chunk_id z ingestion ma postać "<plik>#<numer>"
+    _, sep, index = chunk_id.rpartition("#")
+    return int(index) if sep and index.isdigit() else None
+
+
+def merge_overlapping(left: str, right: str) -> str:
+    """
+    Skleja sąsiednie chunki, usuwając wspólny fragment (koniec `left` = początek
+    `right`). Gdy chunki się nie nakładają, łączy je spacją.
+    """
+    probe = right[: min(_MIN_OVERLAP_PROBE, len(right))]
+    if probe:
+        position = left.find(probe, max(0, len(left) - len(right)))
+        while position != -1:
+            if right.startswith(left[position:]):
+                return left[:position] + right
+            position = left.find(probe, position + 1)
+    return f"{left} {right}"
+
+
+def _trim_to_tokens(text: str, tokens: int) -> str:
+    limit = tokens * 4
+    if len(text) <= limit:
+        return text
+    cut = text.rfind(" ", 0, limit)
+    return text[: cut if cut > 0 else limit].rstrip() + " …"
+
+
+def _passages(hits: Sequence[RetrievedChunk]) -> List[Tuple[float, str, int]]:
+    """
+    Łączy trafienia z tego samego pliku o kolejnych numerach w jeden fragment
+    (w kolejności czytania). Zwraca (najlepszy wynik, tekst, liczba chunków).
+    """
+    by_source: Dict[str, List[Tuple[int, RetrievedChunk]]] = {}
+    standalone: List[RetrievedChunk] = []
+    for hit in hits:
+        position = _chunk_position(hit.chunk_id)
+        if position is None:
+            standalone.append(hit)
+        else:
+            by_source.setdefault(hit.source, []).append((position, hit))
+
+    passages = [(hit.score, hit.content, 1) for hit in standalone]
+    for members in by_source.values():
+        members.sort(key=lambda item: item[0])
+        run_start = 0
+        for i in range(1, len(members) + 1):
+            if i < len(members) and members[i][0] == members[i - 1][0] + 1:
+                continue
+            run = [hit for _, hit in members[run_start:i]]
+            text = run[0].content
+            for hit in run[1:]:
+                text = merge_overlapping(text, hit.content)
+            passages.append((max(hit.score for hit in run), text, len(run)))
+            run_start = i
+    return passages
+
+
+def assemble_context(
+    hits: Sequence[RetrievedChunk],
+    token_budget: int = RAG_CONTEXT_TOKEN_BUDGET,
+    min_score: float = RAG_MIN_SCORE,
+    max_passages: Optional[int] = None,
+) -> AssembledContext:
+    """
+    Składa kontekst RAG z trafień: odrzuca wyniki poniżej `min_score`,
+    usuwa duplikaty, skleja nakładające się sąsiednie chunki i dokłada
+    fragmenty od najlepszego, dopóki mieszczą się w `token_budget`.
+    """
+    above_threshold = [hit for hit in hits if hit.score >= min_score]
+    # punkt odniesienia dla oszczędności – te same trafienia, tylko bez składania
+    result = AssembledContext(
+        tokens_naive=sum(estimate_tokens(hit.content) for hit in above_threshold)
+    )
+
+    seen = set()
+    relevant: List[RetrievedChunk] = []
+    for hit in above_threshold:
+        if hit.content in seen:
+            continue
+        seen.add(hit.content)
+        relevant.append(hit)
+
+    passages = sorted(_passages(relevant), key=lambda item: item[0], reverse=True)
+    remaining = token_budget
+    for _, text, chunks in passages:
+        if max_passages is not None and len(result.passages) >= max_passages:
+            break
+        tokens = estimate_tokens(text)
+        if tokens > remaining:
+            # pierwszy (najlepszy) fragment przycinamy, żeby kontekst nie był pusty
+            if result.passages:
+                break
+            text = _trim_to_tokens(text, remaining)
+            tokens = estimate_tokens(text)
+        result.passages.append(text)
+        result.tokens += tokens
+        result.chunks_used += chunks
+        remaining -= tokens
+        if remaining <= 0:
+            break
+    return result
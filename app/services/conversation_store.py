@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from ..config import (
+    CHAT_COMPACT_BATCH,
+    CHAT_HISTORY_WINDOW,
+    CHAT_MAX_CONVERSATIONS,
+    CHAT_SESSION_TTL_SECONDS,
+)
+
+
+@dataclass
+class Conversation:
+    id: str
+    # starsze tury zwinięte do bieżącego podsumowania
+    summary: str = ""
+    # ostatnie tury przekazywane modelowi dosłownie
+    messages: List[Dict[str, str]] = field(default_factory=list)
+    updated_at: float = field(default_factory=time.monotonic)
+    compacting: bool = False
+
+    def append(self, role: str, content: str) -> None:
+        self.messages.append({"role": role, "content": content})
+        self.updated_at = time.monotonic()
+
+
+class ConversationStore:
+    """
+    Przechowuje rozmowy z CV coachem po stronie serwera (w pamięci procesu),
+    z wygasaniem nieaktywnych sesji i limitem liczby rozmów (LRU).
+    Okno ostatnich wiadomości jest ograniczone – starsze tury trafiają
+    do podsumowania (patrz `pending_compaction` / `apply_compaction`).
+    """
+
+    def __init__(
+        self,
+        max_conversations: int = CHAT_MAX_CONVERSATIONS,
+        ttl_seconds: float = CHAT_SESSION_TTL_SECONDS,
+        window: int = CHAT_HISTORY_WINDOW,
+        compact_batch: int = CHAT_COMPACT_BATCH,
+    ) -> None:
+        self.max_conversations = max(1, max_conversations)
+        self.ttl_seconds = ttl_seconds
+        self.window = max(2, window)
+        self.compact_batch = max(1, compact_batch)
+        self._conversations: "OrderedDict[str, Conversation]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict(self, now: float) -> None:
+        expired = [
+            conv_id
+            for conv_id, conv in self._conversations.items()
+            if now - conv.updated_at > self.ttl_seconds
+        ]
+        for conv_id in expired:
+            del self._conversations[conv_id]
+        while len(self._conversations) > self.max_conversations:
+            self._conversations.popitem(last=False)
+
+    def get(self, conversation_id: Optional[str]) -> Optional[Conversation]:
+        if not conversation_id:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            conv = self._conversations.get(conversation_id)
+            if conv is None:
+                return None
+            if now - conv.updated_at > self.ttl_seconds:
+                del self._conversations[conversation_id]
+                return None
+            self._conversations.move_to_end(conversation_id)
+            return conv
+
+    def get_or_create(self, conversation_id: Optional[str] = None) -> Conversation:
+        conv = self.get(conversation_id)
+        if conv is not None:
+            return conv
+        conv = Conversation(id=uuid.uuid4().hex)
+        with self._lock:
+            self._conversations[conv.id] = conv
+            self._evict(time.monotonic())
+        return conv
+
+    def delete(self, conversation_id: str) -> None:
+        with self._lock:
+            self._conversations.pop(conversation_id, None)
+
+    def pending_compaction(self, conv: Conversation) -> List[Dict[str, str]]:
+        """
+        Zwraca najstarsze wiadomości do zwinięcia w podsumowanie, gdy okno
+        przekroczyło limit o co najmniej `compact_batch` (histereza – nie
+        podsumowujemy po każdej turze). Pusta lista = nic do zrobienia.
+        """
+        if conv.compacting or len(conv.messages) < self.window + self.compact_batch:
+            return []
+        conv.compacting = True
+        return list(conv.messages[: len(conv.messages) - self.window])
+
+    def apply_compaction(
+        self, conv: Conversation, compacted: List[Dict[str, str]], summary: Optional[str]
+    ) -> None:
+        """
+        Podmienia zwinięte wiadomości na nowe podsumowanie. Wiadomości dopisane
+        w trakcie podsumowywania trafiają na koniec listy, więc zostają nietknięte.
+        Gdy podsumowanie się nie udało (`summary` = None), najstarsze tury i tak
+        wypadają z okna – zostaje poprzednie podsumowanie, a historia nie rośnie.
+        """
+        if summary is not None:
+            conv.summary = summary
+        del conv.messages[: len(compacted)]
+        conv.compacting = False
+
+    def __len__(self) -> int:
+        return len(self._conversations)
+
+
+conversation_store = ConversationStore()
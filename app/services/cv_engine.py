@@ -1,48 +1,275 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List
+import asyncio
+import json
+import logging
+from functools import partial
+from hashlib import sha256
+from typing import Any, Awaitable, Callable, Collection, Dict, List, Optional, Sequence
 
-from ..config import CV_TEMPLATE_MAP, CVVariant, PROFILE_DEFAULT_VARIANT, ProfileType
+from ..config import (
+    CV_GENERATION_CONCURRENCY,
+    CV_GENERATION_MODE,
+    CV_ITEM_TIMEOUT_SECONDS,
+    CV_TEMPLATE_MAP,
+    CVVariant,
+    PROFILE_DEFAULT_VARIANT,
+    ProfileType,
+)
 from ..models import CVInput, ExperienceItem
-from .llm_client import generate_experience_bullets, generate_summary
+from .cache import TTLCache
+from .llm_client import (
+    StructuredOutputError,
+    generate_cv_draft_async,
+    generate_experience_bullets_async,
+    generate_summary_async,
+)
+from .metrics import record_cache, timed
 
+logger = logging.getLogger(__name__)
 
-def _build_experience_sections(
-    cv_input: CVInput, target_role: str
-) -> List[Dict[str, Any]]:
+SUMMARY_SECTION = "summary"
+
+
+async def _fan_out(
+    jobs: Sequence[Callable[[], Awaitable[Any]]],
+    fallbacks: Sequence[Any],
+    concurrency: int = CV_GENERATION_CONCURRENCY,
+    item_timeout: Optional[float] = CV_ITEM_TIMEOUT_SECONDS,
+) -> List[Any]:
+    """
+    Uruchamia zadania równolegle (maks. `concurrency` naraz) i zwraca wyniki
+    w kolejności wejścia. Zadanie, które przekroczy `item_timeout` albo
+    zakończy się błędem, jest zastępowane odpowiadającym mu `fallback` –
+    pozostałe sekcje nie przepadają.
+    """
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def _run(index: int, job: Callable[[], Awaitable[Any]]) -> Any:
+        async with semaphore:
+            try:
+                return await asyncio.wait_for(job(), timeout=item_timeout)
+            except asyncio.TimeoutError:
+                logger.warning(
+                    "Generowanie sekcji #%s przekroczyło %ss – zwracam wynik częściowy",
+                    index,
+                    item_timeout,
+                )
+                return fallbacks[index]
+            except Exception as exc:
+                logger.exception(
+                    "Generowanie sekcji #%s nie powiodło się (%s) – zwracam wynik częściowy",
+                    index,
+                    type(exc).__name__,
+                )
+                return fallbacks[index]
+
+    return list(await asyncio.gather(*(_run(i, job) for i, job in enumerate(jobs))))
+
+
+def _experience_items(cv_input: CVInput) -> List[ExperienceItem]:
     if cv_input.profile_type != ProfileType.EXPERIENCED:
         return []
+    return list(cv_input.experience)
 
-    sections: List[Dict[str, Any]] = []
-    for exp in cv_input.experience:
-        sections.append(
-            _build_experience_section_item(exp, target_role),
-        )
-    return sections
+
+def experience_section_name(index: int) -> str:
+    return f"experience:{index}"
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, str):
+        return " ".join(value.split())
+    if isinstance(value, list):
+        return [_normalize(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    return value
+
+
+def _content_hash(payload: Any) -> str:
+    raw = json.dumps(_normalize(payload), ensure_ascii=False, sort_keys=True)
+    return sha256(raw.encode("utf-8")).hexdigest()
+
+
+def cv_content_hash(cv_input: CVInput) -> str:
+    """
+    Hash treści CV bez `cv_variant` – zmiana wariantu to tylko inny szablon,
+    więc nie powinna unieważniać wygenerowanych sekcji.
+    """
+    return _content_hash(cv_input.model_dump(mode="json", exclude={"cv_variant"}))
+
+
+def summary_section_key(cv_input: CVInput) -> str:
+    # tylko pola, od których zależy prompt podsumowania
+    return _content_hash(
+        {
+            "section": SUMMARY_SECTION,
+            "profile_type": cv_input.profile_type.value,
+            "target_role": cv_input.target_role,
+            "full_name": cv_input.full_name,
+            "skills": cv_input.skills,
+        }
+    )
 
 
-def _build_experience_section_item(
-    exp: ExperienceItem, target_role: str
+def experience_section_key(exp: ExperienceItem, target_role: str) -> str:
+    return _content_hash(
+        {"section": "experience", "target_role": target_role, "item": exp.model_dump(mode="json")}
+    )
+
+
+async def _build_experience_section_item(
+    exp: ExperienceItem, target_role: str, use_cache: bool = True
 ) -> Dict[str, Any]:
-    raw_bullets = generate_experience_bullets(exp, target_role)
+    raw_bullets = await generate_experience_bullets_async(exp, target_role, use_cache=use_cache)
     bullets = [line.strip() for line in raw_bullets.split("\n") if line.strip()]
     return {"item": exp, "bullets": bullets}
 
 
+async def _generate_single_shot(
+    cv_input: CVInput,
+    experience_items: Sequence[ExperienceItem],
+    names: Sequence[str],
+    fallbacks: Sequence[Any],
+    use_cache: bool = True,
+) -> Optional[List[Any]]:
+    """
+    Generuje sekcje `names` jednym wywołaniem LLM ze strukturalną odpowiedzią.
+    Zwraca wartości w kolejności `names` (przy timeoucie lub błędzie wywołania –
+    `fallbacks`, jak w `_fan_out`) albo None, gdy model nie dał poprawnej
+    odpowiedzi – wtedy sekcje generujemy osobnymi wywołaniami.
+    """
+    positions = [int(name.split(":", 1)[1]) for name in names if name != SUMMARY_SECTION]
+    experiences = [experience_items[i] for i in positions]
+    try:
+        draft = await asyncio.wait_for(
+            generate_cv_draft_async(
+                cv_input,
+                experiences,
+                include_summary=SUMMARY_SECTION in names,
+                use_cache=use_cache,
+            ),
+            timeout=CV_ITEM_TIMEOUT_SECONDS,
+        )
+    except asyncio.TimeoutError:
+        logger.warning(
+            "Generowanie CV jednym wywołaniem przekroczyło %ss – zwracam wynik częściowy",
+            CV_ITEM_TIMEOUT_SECONDS,
+        )
+        return list(fallbacks)
+    except StructuredOutputError as exc:
+        logger.warning(
+            "Generowanie CV jednym wywołaniem nie powiodło się (%s) – generuję sekcje osobno", exc
+        )
+        return None
+    except Exception as exc:
+        logger.exception(
+            "Generowanie CV jednym wywołaniem nie powiodło się (%s) – zwracam wynik częściowy",
+            type(exc).__name__,
+        )
+        return list(fallbacks)
+
+    # doświadczenia w szkicu są w kolejności `experiences`, czyli kolejności `names`
+    drafts = iter(draft.experience)
+    sections: List[Any] = []
+    for name in names:
+        if name == SUMMARY_SECTION:
+            sections.append(draft.summary)
+        else:
+            item = next(drafts)
+            sections.append({"item": experiences[item.index], "bullets": item.bullets})
+    return sections
+
+
 def _resolve_sections_order(profile_type: ProfileType) -> List[str]:
     if profile_type == ProfileType.EXPERIENCED:
         return ["summary", "experience", "skills", "education"]
     return ["summary", "education", "skills"]
 
 
-def build_cv_context(cv_input: CVInput) -> Dict[str, Any]:
+@timed("cv.build")
+async def build_cv_context(
+    cv_input: CVInput,
+    section_cache: Optional[TTLCache] = None,
+    refresh: Collection[str] = (),
+) -> Dict[str, Any]:
     """
     Buduje kontekst na potrzeby silnika szablonów (np. Jinja2).
     Obsługuje rozgałęzienie logiki dla profili doświadczonych i niedoświadczonych.
+
+    Z `section_cache` sekcje (podsumowanie, bullety każdego doświadczenia) są
+    brane z cache po hashu treści, od której zależą – edycja jednego
+    doświadczenia generuje ponownie tylko jego bullety. Sekcje wymienione
+    w `refresh` (np. "summary", "experience:0") są generowane od nowa z pominięciem cache.
+
+    W trybie CV_GENERATION_MODE="single_shot" kilka brakujących sekcji powstaje
+    w jednym wywołaniu LLM ze strukturalną odpowiedzią; gdy model jej nie
+    obsługuje, sekcje są generowane osobno.
+
+    Nazwy sekcji, które przekroczyły timeout albo zakończyły się błędem
+    (i mają wartość zastępczą), są w kluczu "partial_sections".
     """
 
-    summary = generate_summary(cv_input)
-    experience_sections = _build_experience_sections(cv_input, cv_input.target_role)
+    experience_items = _experience_items(cv_input)
+
+    names = [SUMMARY_SECTION]
+    keys = [summary_section_key(cv_input)]
+    jobs: List[Callable[[], Awaitable[Any]]] = [
+        partial(generate_summary_async, cv_input, use_cache=SUMMARY_SECTION not in refresh)
+    ]
+    fallbacks: List[Any] = [""]
+    for index, exp in enumerate(experience_items):
+        name = experience_section_name(index)
+        names.append(name)
+        keys.append(experience_section_key(exp, cv_input.target_role))
+        jobs.append(
+            partial(
+                _build_experience_section_item,
+                exp,
+                cv_input.target_role,
+                use_cache=name not in refresh,
+            )
+        )
+        fallbacks.append({"item": exp, "bullets": []})
+
+    sections: List[Any] = [None] * len(jobs)
+    pending: List[int] = []
+    for index, (name, key) in enumerate(zip(names, keys)):
+        cached = None
+        if section_cache is not None and name not in refresh:
+            cached = section_cache.get(key)
+            record_cache("cv_section", cached is not None)
+        if cached is not None:
+            sections[index] = cached
+        else:
+            pending.append(index)
+
+    # Brakujące sekcje generujemy jednym wywołaniem albo jednocześnie –
+    # czas odpowiedzi ≈ najwolniejsze pojedyncze wywołanie, a nie ich suma.
+    fresh: Optional[List[Any]] = None
+    if CV_GENERATION_MODE == "single_shot" and len(pending) > 1:
+        # jedno wywołanie ze wspólnym promptem i kontekstem RAG zamiast N+1
+        fresh = await _generate_single_shot(
+            cv_input,
+            experience_items,
+            [names[i] for i in pending],
+            [fallbacks[i] for i in pending],
+            use_cache=not any(names[i] in refresh for i in pending),
+        )
+    if fresh is None:
+        fresh = await _fan_out([jobs[i] for i in pending], [fallbacks[i] for i in pending])
+    partial_sections: List[str] = []
+    for index, value in zip(pending, fresh):
+        sections[index] = value
+        # wyniku częściowego (timeout, błąd) nie zapamiętujemy
+        if value is fallbacks[index]:
+            partial_sections.append(names[index])
+        elif section_cache is not None:
+            section_cache.set(keys[index], value)
+
+    summary, *experience_sections = sections
 
     context: Dict[str, Any] = {
         "full_name": cv_input.full_name,
@@ -56,6 +283,8 @@ def build_cv_context(cv_input: CVInput) -> Dict[str, Any]:
         "sections_order": _resolve_sections_order(cv_input.profile_type),
         "profile_type": cv_input.profile_type.value,
         "cv_variant": cv_input.cv_variant.value,
+        # sekcje zastąpione pustą wartością – taki kontekst nie trafia do cache generacji
+        "partial_sections": partial_sections,
     }
 
     return context
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+from hashlib import sha256
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+from ..config import (
+    EMBED_CACHE_DISK_MAX_ENTRIES,
+    EMBED_CACHE_PATH,
+    EMBED_CACHE_SIZE,
+    EMBED_CACHE_TTL_SECONDS,
+)
+from .cache import SQLiteCache, TTLCache
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.split()).lower()
+
+
+class EmbeddingCache:
+    """
+    Cache embeddingów zapytań: warstwa LRU/TTL w pamięci + opcjonalna warstwa
+    SQLite na dysku. Klucz to hash znormalizowanego zapytania i nazwy modelu.
+    Wektory trzymamy jako tablice float32 (~6 KB dla 1536 wymiarów zamiast
+    ~50 KB listy floatów Pythona).
+    """
+
+    def __init__(
+        self,
+        max_size: int = EMBED_CACHE_SIZE,
+        ttl_seconds: float = EMBED_CACHE_TTL_SECONDS,
+        path: str = EMBED_CACHE_PATH,
+        disk_max_entries: int = EMBED_CACHE_DISK_MAX_ENTRIES,
+    ) -> None:
+        self._memory = TTLCache(max_size, ttl_seconds)
+        self._disk: Optional[SQLiteCache] = None
+        if path:
+            self._disk = SQLiteCache(
+                path, disk_max_entries, ttl_seconds=ttl_seconds, table="embeddings"
+            )
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key_for(query: str, model: str) -> str:
+        return sha256(f"{model}\0{normalize_query(query)}".encode("utf-8")).hexdigest()
+
+    def get(self, query: str, model: str) -> Optional[np.ndarray]:
+        key = self.key_for(query, model)
+        vector = self._memory.get(key)
+        if vector is None and self._disk is not None:
+            raw = self._disk.get(key)
+            if raw is not None:
+                vector = np.frombuffer(raw, dtype=np.float32)
+                self._memory.set(key, vector)
+        if vector is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return vector
+
+    def set(self, query: str, model: str, vector: Sequence[float]) -> np.ndarray:
+        """
+        Zapisuje wektor i zwraca go jako tablicę float32 (tę samą, którą
+        trzyma cache).
+        """
+        key = self.key_for(query, model)
+        array = np.asarray(vector, dtype=np.float32)
+        self._memory.set(key, array)
+        if self._disk is not None:
+            self._disk.set(key, array.tobytes())
+        return array
+
+    def clear(self) -> None:
+        self._memory.clear()
+        if self._disk is not None:
+            self._disk.clear()
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "memory": self._memory.stats(),
+            "disk": self._disk.stats() if self._disk is not None else None,
+        }
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Collection, Dict, Optional
+
+from ..config import (
+    GENERATION_CACHE_SIZE,
+    GENERATION_CACHE_TTL_SECONDS,
+    GENERATION_PARTIAL_TTL_SECONDS,
+    GENERATION_SECTION_CACHE_SIZE,
+    CVVariant,
+)
+from ..models import CVInput
+from .cache import TTLCache
+from .cv_engine import build_cv_context, cv_content_hash
+from .metrics import record_cache
+from .singleflight import SingleFlight
+
+
+@dataclass(frozen=True)
+class Generation:
+    # hash treści CV (bez wariantu) – ta sama treść = ta sama generacja
+    id: str
+    cv_input: CVInput
+    # kontekst z `build_cv_context` – bez obiektu żądania HTTP
+    context: Dict[str, Any]
+
+    def with_variant(self, variant: CVVariant) -> "Generation":
+        """
+        Ta sama treść w innym układzie – zmienia się tylko wybór szablonu.
+        """
+        if variant == self.cv_input.cv_variant:
+            return self
+        return Generation(
+            id=self.id,
+            cv_input=self.cv_input.model_copy(update={"cv_variant": variant}),
+            context={**self.context, "cv_variant": variant.value},
+        )
+
+
+class GenerationStore:
+    """
+    Cache wygenerowanych CV adresowany treścią. Trzyma gotowe konteksty
+    (przełączenie wariantu, ponowne pobranie PDF = zero wywołań LLM) oraz
+    pojedyncze sekcje, dzięki czemu edycja CV generuje ponownie tylko
+    sekcje, których dane się zmieniły.
+
+    Generacja z sekcjami zastępczymi trafia tylko do krótkotrwałego cache
+    (`partial_ttl_seconds`) – da się z niej pobrać PDF, ale kolejne `generate`
+    ponawia brakujące sekcje zamiast zwracać niepełne CV.
+    """
+
+    def __init__(
+        self,
+        max_size: int = GENERATION_CACHE_SIZE,
+        ttl_seconds: Optional[float] = GENERATION_CACHE_TTL_SECONDS,
+        section_max_size: int = GENERATION_SECTION_CACHE_SIZE,
+        partial_ttl_seconds: Optional[float] = GENERATION_PARTIAL_TTL_SECONDS,
+    ) -> None:
+        self._generations = TTLCache(max_size, ttl_seconds)
+        self._partial = TTLCache(max_size, partial_ttl_seconds)
+        self._sections = TTLCache(section_max_size, ttl_seconds)
+        self._flights = SingleFlight()
+
+    def get(self, generation_id: str) -> Optional[Generation]:
+        # najpierw wynik częściowy – to ostatnia generacja, którą widział użytkownik
+        generation = self._partial.get(generation_id)
+        if generation is None:
+            generation = self._generations.get(generation_id)
+        return generation
+
+    async def generate(
+        self, cv_input: CVInput, refresh: Collection[str] = ()
+    ) -> Generation:
+        """
+        Zwraca generację dla danego CV – z cache albo budując brakujące sekcje.
+        `refresh` wymusza ponowne wygenerowanie wskazanych sekcji
+        ("summary", "experience:<indeks>").
+        """
+        generation_id = cv_content_hash(cv_input)
+        if not refresh:
+            cached = self._generations.get(generation_id)
+            record_cache("generation", cached is not None)
+            if cached is not None:
+                return cached.with_variant(cv_input.cv_variant)
+
+        async def _build() -> Generation:
+            context = await build_cv_context(cv_input, self._sections, refresh)
+            generation = Generation(id=generation_id, cv_input=cv_input, context=context)
+            if context["partial_sections"]:
+                self._partial.set(generation_id, generation)
+            else:
+                self._generations.set(generation_id, generation)
+                self._partial.delete(generation_id)
+            return generation
+
+        generation = await self._flights.do(
+            (generation_id, tuple(sorted(refresh))), _build
+        )
+        return generation.with_variant(cv_input.cv_variant)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {
+            "generations": self._generations.stats(),
+            "partial": self._partial.stats(),
+            "sections": self._sections.stats(),
+        }
+
+
+generation_store = GenerationStore()
@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import math
+import os
+import re
+from collections import Counter
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple, Union
+
+import numpy as np
+
+from .vector_index import top_k
+
+_TOKEN_RE = re.compile(r"[^\W_]+", re.UNICODE)
+_FOLD = str.maketrans("ąćęłńóśźż", "acelnoszz")
+# Najkrótszy temat, jaki zostawiamy po obcięciu końcówki.
+_MIN_STEM = 3
+
+# Końcówki fleksyjne i słowotwórcze (rzeczowniki, przymiotniki, czasowniki),
+# sprawdzane od najdłuższej – lekki stemmer zamiast pełnego słownika form.
+# Porównujemy je już bez ogonków, tak jak tokeny.
+_SUFFIXES = sorted(
+    {
+        suffix.translate(_FOLD)
+        for suffix in (
+            "owaniami", "owaniach", "owaniem", "owania", "owanie", "owaniu",
+            "eniami", "eniach", "eniem", "enia", "enie", "eniu",
+            "ościami", "ościach", "ością", "ości", "ość",
+            "owałem", "owałam", "owała", "owali", "owały", "ował", "ować", "owany", "owana",
+            "ujemy", "ujecie", "uję", "uje", "ują",
+            "iłem", "iłam", "iła", "iło", "ili", "iły", "ił", "ić",
+            "ałem", "ałam", "ała", "ało", "ali", "ały", "ał", "ać",
+            "yłem", "yła", "yli", "ył", "yć", "eć",
+            "owego", "owemu", "owych", "owymi", "owej", "owym", "owa", "owe", "owy",
+            "iego", "ich", "imi", "iej", "im",
+            "ego", "ych", "ymi", "ym",
+            "ami", "ach", "owi", "owie", "ów", "om", "em",
+            "ia", "ie", "ii", "iu", "ią", "ię", "ej",
+            "a", "e", "i", "o", "u", "y", "ą", "ę",
+        )
+    },
+    key=len,
+    reverse=True,
+)
+
+STOPWORDS = frozenset(
+    """
+    a aby ale albo ani aż bardzo bez bo być był była było były będzie by byc ci co czy
+    dla do gdy gdzie go i ich ile im innych iż ja jak jaki jakie jako je jego jej jest
+    jestem jeszcze jeśli już ją każdy kiedy kto która które który ku lub ma mają mi mnie
+    może na nad nam nas nie nich niż no o od oraz po pod przez przy są się so ta tak
+    także tam te tego tej ten też to tu tylko tym u w we więc wszystko z za ze że
+    the and or of to in for on with is are
+    """.split()
+)
+
+
+@lru_cache(maxsize=65536)
+def stem(token: str) -> str:
+    """
+    Lekki stemmer dla polskiego: usuwa znaki diakrytyczne (zapytania pisane
+    bez ogonków trafiają w te same tematy) i obcina najdłuższą pasującą
+    końcówkę, zostawiając co najmniej `_MIN_STEM` znaków.
+    """
+    token = token.translate(_FOLD)
+    for suffix in _SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= _MIN_STEM:
+            return token[: -len(suffix)]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Dzieli tekst na słowa, pomija stop-słowa i pojedyncze znaki, zwraca tematy.
+    """
+    return [
+        stem(token)
+        for token in _TOKEN_RE.findall(text.lower())
+        if len(token) > 1 and token not in STOPWORDS
+    ]
+
+
+class BM25Index:
+    """
+    Indeks BM25 nad tekstami fragmentów. Wagi BM25 (idf × nasycone tf
+    z normalizacją długości) są liczone przy budowie, więc zapytanie to tylko
+    zsumowanie list postingów jego tematów (`np.bincount`). Wynik jest dzielony
+    przez maksymalny możliwy wynik zapytania, więc mieści się w [0, 1].
+    """
+
+    def __init__(
+        self,
+        terms: Sequence[str],
+        offsets: np.ndarray,
+        doc_ids: np.ndarray,
+        weights: np.ndarray,
+        max_weights: np.ndarray,
+        doc_count: int,
+    ) -> None:
+        self._vocab: Dict[str, int] = {str(term): i for i, term in enumerate(terms)}
+        self._offsets = np.asarray(offsets, dtype=np.int64)
+        self._doc_ids = np.asarray(doc_ids, dtype=np.int32)
+        self._weights = np.asarray(weights, dtype=np.float32)
+        self._max_weights = np.asarray(max_weights, dtype=np.float32)
+        self._doc_count = int(doc_count)
+
+    @classmethod
+    def build(cls, texts: Sequence[str], k1: float = 1.2, b: float = 0.75) -> "BM25Index":
+        counts = [Counter(tokenize(text)) for text in texts]
+        lengths = np.array([sum(c.values()) for c in counts], dtype=np.float32)
+        avg_length = float(lengths.mean()) if len(counts) and lengths.mean() > 0 else 1.0
+
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        for doc, counter in enumerate(counts):
+            for term, tf in counter.items():
+                postings.setdefault(term, []).append((doc, tf))
+
+        terms = sorted(postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        doc_ids: List[int] = []
+        weights: List[float] = []
+        max_weights = np.zeros(len(terms), dtype=np.float32)
+        for i, term in enumerate(terms):
+            entries = postings[term]
+            idf = math.log(1 + (len(counts) - len(entries) + 0.5) / (len(entries) + 0.5))
+            for doc, tf in entries:
+                norm = k1 * (1 - b + b * lengths[doc] / avg_length)
+                doc_ids.append(doc)
+                weights.append(idf * tf * (k1 + 1) / (tf + norm))
+            max_weights[i] = idf * (k1 + 1)
+            offsets[i + 1] = len(doc_ids)
+        return cls(
+            terms,
+            offsets,
+            np.array(doc_ids, dtype=np.int32),
+            np.array(weights, dtype=np.float32),
+            max_weights,
+            len(counts),
+        )
+
+    def save(self, path: Union[str, Path]) -> None:
+        path = Path(path)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with tmp_path.open("wb") as handle:
+            np.savez(
+                handle,
+                terms=np.array(list(self._vocab), dtype=str),
+                offsets=self._offsets,
+                doc_ids=self._doc_ids,
+                weights=self._weights,
+                max_weights=self._max_weights,
+                doc_count=np.array(self._doc_count),
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "BM25Index":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                data["terms"].tolist(),
+                data["offsets"],
+                data["doc_ids"],
+                data["weights"],
+                data["max_weights"],
+                int(data["doc_count"]),
+            )
+
+    def __len__(self) -> int:
+        return self._doc_count
+
+    def search(self, query: str, limit: int) -> List[Tuple[int, float]]:
+        """
+        Zwraca listę (indeks fragmentu, znormalizowany wynik BM25) malejąco po wyniku.
+        """
+        ids = sorted({self._vocab[t] for t in tokenize(query) if t in self._vocab})
+        if not ids or not self._doc_count:
+            return []
+        spans = [slice(self._offsets[i], self._offsets[i + 1]) for i in ids]
+        doc_ids = np.concatenate([self._doc_ids[span] for span in spans])
+        weights = np.concatenate([self._weights[span] for span in spans])
+        scores = np.bincount(doc_ids, weights=weights, minlength=self._doc_count)
+        scores /= float(self._max_weights[ids].sum())
+        return [(i, score) for i, score in top_k(scores, limit) if score > 0]
+
+    def search_batch(self, queries: Sequence[str], limit: int) -> List[List[Tuple[int, float]]]:
+        return [self.search(query, limit) for query in queries]
@@ -1,16 +1,31 @@
 from __future__ import annotations
 
+import asyncio
+import json
+from functools import partial
 from textwrap import dedent
-from typing import Dict, List
-
-from openai import OpenAI
-
-from ..config import ModelConfig, ProfileType, get_model_config
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Sequence
+
+from openai import BadRequestError
+from pydantic import BaseModel, Field, ValidationError
+
+from ..config import (
+    LLM_COMPLETION_TOKENS_ESTIMATE,
+    RAG_SUGGEST_RETRIEVAL_MODE,
+    ModelConfig,
+    ProfileType,
+    get_model_config,
+)
 from ..models import CVInput, ExperienceItem
-from .rag_client import get_rag_context_for_cv
+from .completion_cache import build_completion_cache, completion_cache_key
+from .context_assembly import estimate_tokens
+from .llm_scheduler import Priority, completion_scheduler, priority, usage_tokens
+from .metrics import record_cache, record_tokens, span, timed
+from .openai_clients import get_async_openai_client, get_openai_client
+from .rag_client import get_rag_context_for_cv, get_rag_context_for_cv_async
 
 _model_config: ModelConfig = get_model_config()
-_client = OpenAI(api_key=_model_config.api_key)
+_completion_cache = build_completion_cache()
 
 
 def _ensure_api_key_configured() -> None:
@@ -27,20 +42,119 @@ def _compose_prompt(base_prompt: str, rag_chunks: List[str]) -> str:
     return f"{base_prompt}\n\n{rag_context}"
 
 
-def generate_summary(cv_input: CVInput) -> str:
+def _cached_completion(messages: List[Dict[str, str]]) -> Optional[str]:
+    if _completion_cache is None:
+        return None
+    cached = _completion_cache.get(
+        completion_cache_key(_model_config.model_name, messages)
+    )
+    record_cache("completion", cached is not None)
+    return cached
+
+
+def _store_completion(messages: List[Dict[str, str]], content: str) -> None:
+    if _completion_cache is not None and content:
+        _completion_cache.set(
+            completion_cache_key(_model_config.model_name, messages), content
+        )
+
+
+def _estimated_tokens(messages: List[Dict[str, str]]) -> int:
+    # prompt + typowa długość odpowiedzi – korygowane po odpowiedzi o faktyczne `usage`
+    return (
+        sum(estimate_tokens(str(m.get("content", ""))) for m in messages)
+        + LLM_COMPLETION_TOKENS_ESTIMATE
+    )
+
+
+def _complete(messages: List[Dict[str, str]], use_cache: bool = False) -> str:
+    if use_cache:
+        cached = _cached_completion(messages)
+        if cached is not None:
+            return cached
+
+    with span("llm.completion"):
+        response = completion_scheduler.run_sync(
+            lambda: get_openai_client().chat.completions.create(
+                model=_model_config.model_name,
+                messages=messages,
+            ),
+            tokens=_estimated_tokens(messages),
+            usage=usage_tokens,
+        )
+    record_tokens(response.usage)
+    content = response.choices[0].message.content.strip()
+    if use_cache:
+        _store_completion(messages, content)
+    return content
+
+
+@timed("llm.completion")
+async def _request_completion_async(
+    messages: List[Dict[str, str]], response_format: Optional[Dict[str, Any]] = None
+) -> str:
+    extra = {"response_format": response_format} if response_format else {}
+    # identyczne równoczesne zapytania (np. podwójne kliknięcie, ten sam wpis
+    # w wielu CV z batcha) trafiają do API raz i współdzielą wynik
+    key = (
+        completion_cache_key(_model_config.model_name, messages),
+        json.dumps(response_format, sort_keys=True) if response_format else "",
+    )
+
+    async def _call() -> Any:
+        response = await get_async_openai_client().chat.completions.create(
+            model=_model_config.model_name,
+            messages=messages,
+            **extra,
+        )
+        record_tokens(response.usage)
+        return response
+
+    response = await completion_scheduler.run(
+        _call, tokens=_estimated_tokens(messages), key=key, usage=usage_tokens
+    )
+    return response.choices[0].message.content.strip()
+
+
+async def _complete_async(
+    messages: List[Dict[str, str]],
+    use_cache: bool = False,
+    response_format: Optional[Dict[str, Any]] = None,
+    validate: Optional[Callable[[str], Any]] = None,
+) -> str:
     """
-    Generuje podsumowanie zawodowe zależnie od profilu (doświadczony/niedoświadczony).
+    `validate` sprawdza odpowiedź przed zapisaniem jej w cache (wyjątek = brak zapisu).
     """
+    if not use_cache:
+        return await _request_completion_async(messages, response_format)
+
+    # backend SQLite blokuje – odczyt i zapis poza pętlą zdarzeń
+    cached = await asyncio.to_thread(_cached_completion, messages)
+    if cached is not None:
+        return cached
+
+    content = await _request_completion_async(messages, response_format)
+    if validate is not None:
+        validate(content)
+    await asyncio.to_thread(_store_completion, messages, content)
+    return content
+
+
+def completion_cache_stats() -> Optional[Dict[str, int]]:
+    """
+    Liczniki trafień/chybień cache odpowiedzi LLM (None, gdy cache wyłączony).
+    """
+    return _completion_cache.stats() if _completion_cache is not None else None
 
-    _ensure_api_key_configured()
 
+def _summary_base_prompt(cv_input: CVInput) -> str:
     profile_label = (
         "osoba doświadczona"
         if cv_input.profile_type == ProfileType.EXPERIENCED
         else "osoba bez doświadczenia / junior"
     )
 
-    base_prompt = dedent(
+    return dedent(
         f"""
         Jesteś asystentem piszącym CV.
         Napisz krótkie (3–4 zdania) podsumowanie zawodowe dla profilu: {profile_label}.
@@ -52,26 +166,43 @@ def generate_summary(cv_input: CVInput) -> str:
         """
     ).strip()
 
-    prompt = _compose_prompt(base_prompt, get_rag_context_for_cv(base_prompt))
 
-    response = _client.chat.completions.create(
-        model=_model_config.model_name,
-        messages=[
-            {"role": "system", "content": "Jesteś ekspertem od pisania CV."},
-            {"role": "user", "content": prompt},
-        ],
-    )
-    return response.choices[0].message.content.strip()
+def _summary_messages(prompt: str) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": "Jesteś ekspertem od pisania CV."},
+        {"role": "user", "content": prompt},
+    ]
 
 
-def generate_experience_bullets(exp: ExperienceItem, target_role: str) -> str:
+def generate_summary(cv_input: CVInput, use_cache: bool = True) -> str:
     """
-    Generuje 3–5 punktów bullet dla pojedynczego doświadczenia.
+    Generuje podsumowanie zawodowe zależnie od profilu (doświadczony/niedoświadczony).
+    use_cache=False wymusza nowe wywołanie modelu (pomija cache odpowiedzi).
     """
 
     _ensure_api_key_configured()
 
-    base_prompt = dedent(
+    base_prompt = _summary_base_prompt(cv_input)
+    prompt = _compose_prompt(base_prompt, get_rag_context_for_cv(base_prompt))
+    return _complete(_summary_messages(prompt), use_cache=use_cache)
+
+
+async def generate_summary_async(cv_input: CVInput, use_cache: bool = True) -> str:
+    """
+    Asynchroniczna wersja `generate_summary`.
+    """
+
+    _ensure_api_key_configured()
+
+    base_prompt = _summary_base_prompt(cv_input)
+    prompt = _compose_prompt(
+        base_prompt, await get_rag_context_for_cv_async(base_prompt)
+    )
+    return await _complete_async(_summary_messages(prompt), use_cache=use_cache)
+
+
+def _experience_base_prompt(exp: ExperienceItem, target_role: str) -> str:
+    return dedent(
         f"""
         Na podstawie następującego doświadczenia wygeneruj 3–5 punktów bullet
         ukierunkowanych pod rolę: {target_role}.
@@ -83,40 +214,219 @@ def generate_experience_bullets(exp: ExperienceItem, target_role: str) -> str:
         """
     ).strip()
 
+
+def _experience_messages(prompt: str) -> List[Dict[str, str]]:
+    return [
+        {
+            "role": "system",
+            "content": "Jesteś ekspertem od pisania osiągnięć w CV.",
+        },
+        {"role": "user", "content": prompt},
+    ]
+
+
+def generate_experience_bullets(
+    exp: ExperienceItem, target_role: str, use_cache: bool = True
+) -> str:
+    """
+    Generuje 3–5 punktów bullet dla pojedynczego doświadczenia.
+    use_cache=False wymusza nowe wywołanie modelu (pomija cache odpowiedzi).
+    """
+
+    _ensure_api_key_configured()
+
+    base_prompt = _experience_base_prompt(exp, target_role)
     prompt = _compose_prompt(
         base_prompt, get_rag_context_for_cv(f"{target_role}\n{base_prompt}")
     )
+    return _complete(_experience_messages(prompt), use_cache=use_cache)
 
-    response = _client.chat.completions.create(
-        model=_model_config.model_name,
-        messages=[
-            {
-                "role": "system",
-                "content": "Jesteś ekspertem od pisania osiągnięć w CV.",
-            },
-            {"role": "user", "content": prompt},
-        ],
+
+async def generate_experience_bullets_async(
+    exp: ExperienceItem, target_role: str, use_cache: bool = True
+) -> str:
+    """
+    Asynchroniczna wersja `generate_experience_bullets`.
+    """
+
+    _ensure_api_key_configured()
+
+    base_prompt = _experience_base_prompt(exp, target_role)
+    prompt = _compose_prompt(
+        base_prompt,
+        await get_rag_context_for_cv_async(f"{target_role}\n{base_prompt}"),
     )
-    return response.choices[0].message.content.strip()
+    return await _complete_async(_experience_messages(prompt), use_cache=use_cache)
 
 
-def chat_with_cv_coach(
-    messages: List[Dict[str, str]], candidate_data: Dict[str, str] = None
+class StructuredOutputError(ValueError):
+    """
+    Model nie obsługuje strukturalnej odpowiedzi albo zwrócił JSON niezgodny ze schematem.
+    """
+
+
+class ExperienceDraft(BaseModel):
+    index: int
+    bullets: List[str]
+
+
+class CVDraft(BaseModel):
+    summary: str = ""
+    experience: List[ExperienceDraft] = Field(default_factory=list)
+
+
+def _cv_draft_response_format(include_summary: bool, experience_count: int) -> Dict[str, Any]:
+    properties: Dict[str, Any] = {}
+    if include_summary:
+        properties["summary"] = {"type": "string"}
+    properties["experience"] = {
+        "type": "array",
+        "minItems": experience_count,
+        "maxItems": experience_count,
+        "items": {
+            "type": "object",
+            "properties": {
+                "index": {"type": "integer"},
+                "bullets": {"type": "array", "items": {"type": "string"}},
+            },
+            "required": ["index", "bullets"],
+            "additionalProperties": False,
+        },
+    }
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "cv_draft",
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": properties,
+                "required": list(properties),
+                "additionalProperties": False,
+            },
+        },
+    }
+
+
+def _cv_draft_prompt(
+    cv_input: CVInput, experiences: Sequence[ExperienceItem], include_summary: bool
 ) -> str:
+    profile_label = (
+        "osoba doświadczona"
+        if cv_input.profile_type == ProfileType.EXPERIENCED
+        else "osoba bez doświadczenia / junior"
+    )
+    parts = [
+        dedent(
+            f"""
+            Jesteś asystentem piszącym CV. Odpowiedz wyłącznie obiektem JSON zgodnym ze schematem.
+            Docelowa rola: {cv_input.target_role}.
+            Imię i nazwisko: {cv_input.full_name}.
+            Umiejętności: {", ".join(cv_input.skills) or "brak podanych umiejętności"}.
+            """
+        ).strip()
+    ]
+    if include_summary:
+        parts.append(
+            dedent(
+                f"""
+                Pole "summary": krótkie (3–4 zdania) podsumowanie zawodowe dla profilu: {profile_label}.
+                Styl: konkretny, profesjonalny, bez lania wody.
+                Nie używaj zwrotu 'jestem' na początku każdego zdania.
+                """
+            ).strip()
+        )
+    if experiences:
+        lines = [
+            'Pole "experience": po jednym elemencie na każde doświadczenie poniżej, z jego '
+            'numerem w "index" i 3–5 punktami bullet w "bullets" (bez znaków wypunktowania), '
+            "ukierunkowanymi pod docelową rolę. Pisz po polsku, każdy punkt zaczynaj "
+            "od czasownika, unikaj ogólników."
+        ]
+        for index, exp in enumerate(experiences):
+            lines.append(
+                f"[{index}] Stanowisko: {exp.role}; Firma: {exp.company}; "
+                f"Lata: {exp.start_year} - {exp.end_year or 'obecnie'}; "
+                f"Opis od użytkownika: {exp.description_raw or 'brak'}"
+            )
+        parts.append("\n".join(lines))
+    else:
+        parts.append('Pole "experience": pusta lista.')
+    return "\n\n".join(parts)
+
+
+def _cv_draft_rag_query(cv_input: CVInput, experiences: Sequence[ExperienceItem]) -> str:
+    roles = ", ".join(f"{exp.role} ({exp.company})" for exp in experiences)
+    return f"{cv_input.target_role}\npodsumowanie zawodowe i osiągnięcia w CV\n{roles}".strip()
+
+
+def _parse_cv_draft(content: str, experience_count: int) -> CVDraft:
+    try:
+        draft = CVDraft.model_validate(json.loads(content))
+    except (json.JSONDecodeError, ValidationError) as exc:
+        raise StructuredOutputError(f"Niepoprawny JSON szkicu CV: {exc}") from exc
+    indexes = sorted(item.index for item in draft.experience)
+    if indexes != list(range(experience_count)):
+        raise StructuredOutputError(
+            f"Szkic CV zawiera doświadczenia {indexes}, oczekiwano 0..{experience_count - 1}"
+        )
+    draft.experience.sort(key=lambda item: item.index)
+    for item in draft.experience:
+        item.bullets = [bullet.strip() for bullet in item.bullets if bullet.strip()]
+    draft.summary = draft.summary.strip()
+    return draft
+
+
+async def generate_cv_draft_async(
+    cv_input: CVInput,
+    experiences: Sequence[ExperienceItem],
+    include_summary: bool = True,
+    use_cache: bool = True,
+) -> CVDraft:
     """
-    messages: lista {"role": "user"|"assistant", "content": "..."}
-    candidate_data: słownik z danymi kandydata z formularza
-    Zwraca odpowiedź asystenta.
+    Generuje podsumowanie i bullety wszystkich `experiences` jednym wywołaniem
+    modelu ze strukturalną odpowiedzią (JSON schema) i jednym wyszukiwaniem RAG.
+    Rzuca StructuredOutputError, gdy model nie obsługuje schematu albo
+    odpowiedź jest z nim niezgodna.
     """
+
     _ensure_api_key_configured()
 
+    prompt = _compose_prompt(
+        _cv_draft_prompt(cv_input, experiences, include_summary),
+        await get_rag_context_for_cv_async(_cv_draft_rag_query(cv_input, experiences), limit=5),
+    )
+    parse = partial(_parse_cv_draft, experience_count=len(experiences))
+    try:
+        content = await _complete_async(
+            _summary_messages(prompt),
+            use_cache=use_cache,
+            response_format=_cv_draft_response_format(include_summary, len(experiences)),
+            validate=parse,
+        )
+    except BadRequestError as exc:
+        raise StructuredOutputError(f"Model odrzucił strukturalną odpowiedź: {exc}") from exc
+    return parse(content)
+
+
+def _last_user_message(messages: List[Dict[str, str]]) -> str:
     # wyciągamy ostatnie pytanie usera do RAG
-    last_user_msg = next(
+    return next(
         (m["content"] for m in reversed(messages) if m["role"] == "user"),
         "",
     )
-    rag_ctx = get_rag_context_for_cv(last_user_msg, limit=5)
+
+
+def _coach_messages(
+    messages: List[Dict[str, str]],
+    candidate_data: Dict[str, str],
+    rag_ctx: List[str],
+    summary: str = "",
+) -> List[Dict[str, str]]:
     rag_text = "\n\n".join(rag_ctx) if rag_ctx else ""
+    summary_info = (
+        f"\n\nPodsumowanie wcześniejszej części rozmowy:\n{summary}" if summary else ""
+    )
 
     # Przygotuj informacje o kandydacie
     candidate_info = ""
@@ -137,7 +447,7 @@ def chat_with_cv_coach(
             parts.append(
                 f"Edukacja: {candidate_data['edu_degree']} - {candidate_data['edu_school']}"
             )
-        
+
         if parts:
             candidate_info = "\n\nInformacje o kandydacie:\n" + "\n".join(parts)
 
@@ -147,7 +457,7 @@ def chat_with_cv_coach(
         Pomagasz użytkownikowi pisać CV, doradzasz co wpisać, jak strukturyzować doświadczenie
         i jak dopasować CV do oferty.
 
-        {candidate_info}
+        {candidate_info}{summary_info}
 
         Możesz korzystać z poniższych wskazówek z bazy wiedzy:
 
@@ -155,23 +465,133 @@ def chat_with_cv_coach(
         """
     ).strip()
 
-    all_messages = [{"role": "system", "content": system_prompt}] + messages
+    return [{"role": "system", "content": system_prompt}] + messages
 
-    response = _client.chat.completions.create(
-        model=_model_config.model_name,
-        messages=all_messages,
-    )
-    return response.choices[0].message.content.strip()
+
+def chat_with_cv_coach(
+    messages: List[Dict[str, str]], candidate_data: Dict[str, str] = None
+) -> str:
+    """
+    messages: lista {"role": "user"|"assistant", "content": "..."}
+    candidate_data: słownik z danymi kandydata z formularza
+    Zwraca odpowiedź asystenta.
+    """
+    _ensure_api_key_configured()
+
+    rag_ctx = get_rag_context_for_cv(_last_user_message(messages), limit=5)
+    return _complete(_coach_messages(messages, candidate_data, rag_ctx))
 
 
-def suggest_experience_raw(role: str, company: str, target_role: str) -> List[str]:
+async def chat_with_cv_coach_async(
+    messages: List[Dict[str, str]],
+    candidate_data: Dict[str, str] = None,
+    summary: str = "",
+) -> str:
     """
-    Zwraca kilka wariantów opisu doświadczenia (do wklejenia w exp_description_raw).
+    Asynchroniczna wersja `chat_with_cv_coach`.
+    summary: podsumowanie starszej części rozmowy (spoza okna `messages`).
+    """
+    _ensure_api_key_configured()
+
+    with priority(Priority.INTERACTIVE):
+        rag_ctx = await get_rag_context_for_cv_async(
+            _last_user_message(messages), limit=5
+        )
+        return await _complete_async(
+            _coach_messages(messages, candidate_data, rag_ctx, summary)
+        )
+
+
+async def stream_chat_with_cv_coach(
+    messages: List[Dict[str, str]],
+    candidate_data: Dict[str, str] = None,
+    summary: str = "",
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Strumieniowa wersja czatu. Zwraca kolejne zdarzenia:
+    {"event": "rag", ...} po wyszukaniu w bazie wiedzy, {"event": "token", ...}
+    dla każdego fragmentu odpowiedzi i {"event": "done", ...} na końcu.
+    Zamknięcie generatora (np. rozłączenie klienta) przerywa zapytanie do modelu.
     """
     _ensure_api_key_configured()
 
-    query = f"opis doświadczenia na stanowisku {role} w firmie {company} pod rolę {target_role}"
-    rag_ctx = get_rag_context_for_cv(query, limit=5)
+    # priorytet ustawiamy tylko wokół wywołań (bez `yield` w środku bloku)
+    with priority(Priority.INTERACTIVE):
+        rag_ctx = await get_rag_context_for_cv_async(
+            _last_user_message(messages), limit=5
+        )
+    yield {"event": "rag", "data": {"chunks": len(rag_ctx)}}
+
+    coach_messages = _coach_messages(messages, candidate_data, rag_ctx, summary)
+    with priority(Priority.INTERACTIVE):
+        # slot kolejki jest zajęty do końca strumienia; ostatni fragment niesie `usage`
+        response = completion_scheduler.stream(
+            lambda: get_async_openai_client().chat.completions.create(
+                model=_model_config.model_name,
+                messages=coach_messages,
+                stream=True,
+                stream_options={"include_usage": True},
+            ),
+            tokens=_estimated_tokens(coach_messages),
+            usage=usage_tokens,
+        )
+    parts: List[str] = []
+    async with response as stream:
+        async for chunk in stream:
+            if chunk.usage is not None:
+                record_tokens(chunk.usage)
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                yield {"event": "token", "data": {"text": delta}}
+
+    yield {"event": "done", "data": {"response": "".join(parts).strip()}}
+
+
+async def summarize_conversation_async(
+    previous_summary: str, messages: List[Dict[str, str]]
+) -> str:
+    """
+    Zwija starsze tury rozmowy (wraz z dotychczasowym podsumowaniem)
+    w jedno zwięzłe podsumowanie.
+    """
+    _ensure_api_key_configured()
+
+    transcript = "\n".join(
+        f"{'Użytkownik' if m['role'] == 'user' else 'Asystent'}: {m['content']}"
+        for m in messages
+    )
+    instructions = dedent(
+        """
+        Zaktualizuj podsumowanie rozmowy użytkownika z asystentem CV.
+        Zachowaj fakty o kandydacie, ustalenia i otwarte kwestie; pomiń powitania.
+        Maksymalnie 8 zdań.
+        """
+    ).strip()
+    prompt = (
+        f"{instructions}\n\n"
+        f"Dotychczasowe podsumowanie:\n{previous_summary or 'brak'}\n\n"
+        f"Nowe wiadomości:\n{transcript}"
+    )
+
+    with priority(Priority.INTERACTIVE):
+        return await _complete_async(
+            [
+                {"role": "system", "content": "Streszczasz rozmowy zwięźle i rzeczowo."},
+                {"role": "user", "content": prompt},
+            ]
+        )
+
+
+def _suggest_query(role: str, company: str, target_role: str) -> str:
+    return f"opis doświadczenia na stanowisku {role} w firmie {company} pod rolę {target_role}"
+
+
+def _suggest_messages(
+    role: str, company: str, target_role: str, rag_ctx: List[str]
+) -> List[Dict[str, str]]:
     rag_text = "\n\n".join(rag_ctx) if rag_ctx else ""
 
     prompt = dedent(
@@ -190,17 +610,16 @@ def suggest_experience_raw(role: str, company: str, target_role: str) -> List[st
         """
     ).strip()
 
-    response = _client.chat.completions.create(
-        model=_model_config.model_name,
-        messages=[
-            {
-                "role": "system",
-                "content": "Jesteś ekspertem od opisu doświadczeń w CV.",
-            },
-            {"role": "user", "content": prompt},
-        ],
-    )
-    text = response.choices[0].message.content.strip()
+    return [
+        {
+            "role": "system",
+            "content": "Jesteś ekspertem od opisu doświadczeń w CV.",
+        },
+        {"role": "user", "content": prompt},
+    ]
+
+
+def _parse_variants(text: str) -> List[str]:
     lines = [l.strip() for l in text.split("\n") if l.strip()]
     variants = []
     for line in lines:
@@ -215,3 +634,39 @@ def suggest_experience_raw(role: str, company: str, target_role: str) -> List[st
             variants.append(line)
     return variants[:3]  # max 3 warianty
 
+
+def suggest_experience_raw(
+    role: str, company: str, target_role: str, use_cache: bool = True
+) -> List[str]:
+    """
+    Zwraca kilka wariantów opisu doświadczenia (do wklejenia w exp_description_raw).
+    use_cache=False wymusza nowe wywołanie modelu (pomija cache odpowiedzi).
+    """
+    _ensure_api_key_configured()
+
+    # podpowiedzi są interaktywne – domyślnie BM25 bez wywołania API embeddingów
+    rag_ctx = get_rag_context_for_cv(
+        _suggest_query(role, company, target_role), limit=5, mode=RAG_SUGGEST_RETRIEVAL_MODE
+    )
+    text = _complete(
+        _suggest_messages(role, company, target_role, rag_ctx), use_cache=use_cache
+    )
+    return _parse_variants(text)
+
+
+async def suggest_experience_raw_async(
+    role: str, company: str, target_role: str, use_cache: bool = True
+) -> List[str]:
+    """
+    Asynchroniczna wersja `suggest_experience_raw`.
+    """
+    _ensure_api_key_configured()
+
+    with priority(Priority.INTERACTIVE):
+        rag_ctx = await get_rag_context_for_cv_async(
+            _suggest_query(role, company, target_role), limit=5, mode=RAG_SUGGEST_RETRIEVAL_MODE
+        )
+        text = await _complete_async(
+            _suggest_messages(role, company, target_role, rag_ctx), use_cache=use_cache
+        )
+    return _parse_variants(text)
@@ -0,0 +1,404 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import (
+    Any,
+    AsyncContextManager,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Hashable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+from openai import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+
+from ..config import (
+    EMBED_REQUESTS_PER_MINUTE,
+    EMBED_TOKENS_PER_MINUTE,
+    LLM_MAX_CONCURRENCY,
+    LLM_MAX_RETRIES,
+    LLM_REQUESTS_PER_MINUTE,
+    LLM_RETRY_BASE_SECONDS,
+    LLM_RETRY_MAX_SECONDS,
+    LLM_TOKENS_PER_MINUTE,
+    METRICS_ENABLED,
+)
+from .metrics import registry
+from .singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)
+# Pojemność kubełków: tyle sekund limitu można wykorzystać jednym zrywem.
+BURST_SECONDS = 10.0
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0  # czat, podpowiedzi – użytkownik czeka na odpowiedź
+    DEFAULT = 1  # generowanie pojedynczego CV
+    BULK = 2  # batch
+
+
+_lane: ContextVar[Priority] = ContextVar("llm_priority", default=Priority.DEFAULT)
+
+
+@contextmanager
+def priority(lane: Priority) -> Iterator[None]:
+    """
+    Ustawia pas priorytetu dla wywołań LLM w bieżącym kontekście
+    (dziedziczą go też zadania utworzone wewnątrz bloku).
+    """
+    token = _lane.set(lane)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+
+class TokenBucket:
+    """
+    Kubełek tokenów napełniany w tempie `per_minute / 60` na sekundę, z pojemnością
+    `BURST_SECONDS` limitu. Poziom może spaść poniżej zera (korekta po faktycznym
+    zużyciu) – kolejne zapytania czekają wtedy dłużej. per_minute <= 0 = bez limitu.
+    """
+
+    def __init__(self, per_minute: float) -> None:
+        self.rate = max(0.0, per_minute) / 60.0
+        self.capacity = max(1.0, self.rate * BURST_SECONDS)
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def delay(self, amount: float, now: float) -> float:
+        """
+        Ile sekund trzeba poczekać, aż w kubełku będzie `amount` tokenów.
+        """
+        if not self.enabled:
+            return 0.0
+        self._refill(now)
+        missing = min(amount, self.capacity) - self.level
+        return missing / self.rate if missing > 0 else 0.0
+
+    def consume(self, amount: float) -> None:
+        if self.enabled:
+            self.level -= min(amount, self.capacity) if amount > 0 else amount
+
+
+def _retry_after(exc: Exception) -> Optional[float]:
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    for header, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        try:
+            return float(headers[header]) * scale
+        except (KeyError, TypeError, ValueError):
+            continue
+    return None
+
+
+class LLMScheduler:
+    """
+    Wspólna kolejka wywołań API OpenAI: limity zapytań i tokenów na minutę
+    (kubełki tokenów), limit równoczesnych wywołań, pasy priorytetu (zapytanie
+    interaktywne zawsze wyprzedza czekające zapytania batcha), łączenie
+    identycznych równoczesnych wywołań oraz ponowienia z losowym backoffem po
+    429 i błędach przejściowych. Po 429 wstrzymuje na chwilę całą kolejkę.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        requests_per_minute: float = 0,
+        tokens_per_minute: float = 0,
+        max_concurrency: int = 0,
+        max_retries: int = LLM_MAX_RETRIES,
+        retry_base: float = LLM_RETRY_BASE_SECONDS,
+        retry_max: float = LLM_RETRY_MAX_SECONDS,
+    ) -> None:
+        self.name = name
+        self.max_concurrency = max(0, max_concurrency)
+        self.max_retries = max(0, max_retries)
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self._requests = TokenBucket(requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute)
+        self._lock = threading.Lock()
+        self._blocked_until = 0.0
+        self._queue: List[Tuple[int, int]] = []
+        self._seq = itertools.count()
+        self._active = 0
+        self._changed: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._flights = SingleFlight()
+        self.calls = 0
+        self.retries = 0
+
+    def _admission_delay(self, tokens: int, now: float) -> float:
+        return max(
+            self._blocked_until - now,
+            self._requests.delay(1, now),
+            self._tokens.delay(tokens, now),
+        )
+
+    def _try_consume(self, tokens: int) -> float:
+        """
+        Pobiera limit na jedno zapytanie albo zwraca, ile sekund poczekać.
+        """
+        with self._lock:
+            delay = self._admission_delay(tokens, time.monotonic())
+            if delay <= 0:
+                self._requests.consume(1)
+                self._tokens.consume(tokens)
+                self.calls += 1
+            return delay
+
+    def _event(self) -> asyncio.Event:
+        loop = asyncio.get_running_loop()
+        if self._changed is None or self._loop is not loop:
+            self._loop = loop
+            self._changed = asyncio.Event()
+        return self._changed
+
+    def _notify(self) -> None:
+        # budzi wszystkich czekających – każdy sprawdza, czy jest na czele kolejki
+        event = self._event()
+        self._changed = asyncio.Event()
+        event.set()
+
+    async def _acquire(self, tokens: int, lane: Priority) -> float:
+        entry = (int(lane), next(self._seq))
+        heapq.heappush(self._queue, entry)
+        started = time.monotonic()
+        try:
+            while True:
+                timeout: Optional[float] = None
+                event = self._event()
+                has_slot = not self.max_concurrency or self._active < self.max_concurrency
+                if self._queue[0] == entry and has_slot:
+                    timeout = self._try_consume(tokens)
+                    if timeout <= 0:
+                        heapq.heappop(self._queue)
+                        self._active += 1
+                        self._notify()
+                        return time.monotonic() - started
+                try:
+                    await asyncio.wait_for(event.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            if entry in self._queue:
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+                self._notify()
+            raise
+
+    def _release(self) -> None:
+        self._active -= 1
+        self._notify()
+
+    def _retry_delay(self, attempt: int, exc: Exception) -> float:
+        # "full jitter": losowo z [0, base·2^n], żeby ponowienia się nie zsynchronizowały
+        delay = random.uniform(0, min(self.retry_max, self.retry_base * 2**attempt))
+        retry_after = _retry_after(exc)
+        if retry_after is not None:
+            delay = max(delay, min(self.retry_max, retry_after))
+        if isinstance(exc, RateLimitError):
+            with self._lock:
+                self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+        self.retries += 1
+        if METRICS_ENABLED:
+            registry.inc("llm_retries_total", scheduler=self.name, error=type(exc).__name__)
+        logger.warning(
+            "%s: %s – ponowienie %d/%d za %.2fs",
+            self.name,
+            type(exc).__name__,
+            attempt + 1,
+            self.max_retries,
+            delay,
+        )
+        return delay
+
+    def _correct_tokens(self, estimated: int, actual: Optional[int]) -> None:
+        if actual is not None:
+            with self._lock:
+                self._tokens.consume(actual - estimated)
+
+    async def _start(self, call: Callable[[], Awaitable[T]], tokens: int, lane: Priority) -> T:
+        """
+        Czeka w kolejce i wykonuje `call` (z ponowieniami). Po sukcesie slot
+        współbieżności pozostaje zajęty – zwalnia go wywołujący (`_release`).
+        """
+        attempt = 0
+        while True:
+            waited = await self._acquire(tokens, lane)
+            if METRICS_ENABLED:
+                registry.observe(
+                    "llm_queue_seconds", waited, scheduler=self.name, lane=lane.name.lower()
+                )
+            try:
+                return await call()
+            except BaseException as exc:
+                self._release()
+                if not isinstance(exc, _RETRYABLE_ERRORS) or attempt >= self.max_retries:
+                    raise
+                delay = self._retry_delay(attempt, exc)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _run(
+        self,
+        call: Callable[[], Awaitable[T]],
+        tokens: int,
+        usage: Optional[Callable[[T], Optional[int]]],
+        lane: Priority,
+    ) -> T:
+        result = await self._start(call, tokens, lane)
+        try:
+            self._correct_tokens(tokens, usage(result) if usage else None)
+        finally:
+            self._release()
+        return result
+
+    async def run(
+        self,
+        call: Callable[[], Awaitable[T]],
+        tokens: int = 0,
+        key: Optional[Hashable] = None,
+        usage: Optional[Callable[[T], Optional[int]]] = None,
+    ) -> T:
+        """
+        Wykonuje `call` (wywołanie API) po przejściu przez kolejkę. `tokens` to
+        szacunek zużycia tokenów (korygowany przez `usage(wynik)`), a `key`
+        łączy identyczne równoczesne wywołania w jedno – w obrębie pasa priorytetu,
+        żeby interaktywne zapytanie nie czekało w kolejce za wywołaniem z batcha.
+        """
+        lane = _lane.get()
+        if key is None:
+            return await self._run(call, tokens, usage, lane)
+        return await self._flights.do(
+            (lane, key), lambda: self._run(call, tokens, usage, lane)
+        )
+
+    def stream(
+        self,
+        call: Callable[[], Awaitable[Any]],
+        tokens: int = 0,
+        usage: Optional[Callable[[Any], Optional[int]]] = None,
+    ) -> AsyncContextManager[AsyncIterator[Any]]:
+        """
+        Wywołanie strumieniowe: `async with scheduler.stream(...) as chunks`.
+        Slot współbieżności jest zajęty do wyjścia z bloku (do przeczytania
+        strumienia), a limit tokenów jest korygowany o `usage` ostatniego
+        fragmentu, który je zawiera (np. stream_options={"include_usage": True}).
+        Pas priorytetu jest ustalany w chwili wywołania `stream`.
+        """
+        return self._stream(call, tokens, usage, _lane.get())
+
+    @asynccontextmanager
+    async def _stream(
+        self,
+        call: Callable[[], Awaitable[Any]],
+        tokens: int,
+        usage: Optional[Callable[[Any], Optional[int]]],
+        lane: Priority,
+    ) -> AsyncIterator[AsyncIterator[Any]]:
+        response = await self._start(call, tokens, lane)
+        used: Optional[int] = None
+
+        async def chunks() -> AsyncIterator[Any]:
+            nonlocal used
+            async for chunk in response:
+                if usage is not None:
+                    used = usage(chunk) or used
+                yield chunk
+
+        iterator = chunks()
+        try:
+            yield iterator
+        finally:
+            try:
+                await iterator.aclose()
+                close = getattr(response, "close", None)
+                if close is not None:
+                    await close()
+            finally:
+                self._correct_tokens(tokens, used)
+                self._release()
+
+    def run_sync(
+        self,
+        call: Callable[[], T],
+        tokens: int = 0,
+        usage: Optional[Callable[[T], Optional[int]]] = None,
+    ) -> T:
+        """
+        Wersja dla wywołań synchronicznych (skrypty): te same limity i ponowienia,
+        bez pasów priorytetu i łączenia wywołań.
+        """
+        attempt = 0
+        while True:
+            delay = self._try_consume(tokens)
+            while delay > 0:
+                time.sleep(delay)
+                delay = self._try_consume(tokens)
+            try:
+                result = call()
+            except _RETRYABLE_ERRORS as exc:
+                if attempt >= self.max_retries:
+                    raise
+                time.sleep(self._retry_delay(attempt, exc))
+                attempt += 1
+            else:
+                self._correct_tokens(tokens, usage(result) if usage else None)
+                return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": len(self._queue),
+            "active": self._active,
+            "calls": self.calls,
+            "retries": self.retries,
+            "coalesced": self._flights.coalesced,
+        }
+
+
+def usage_tokens(response: Any) -> Optional[int]:
+    usage = getattr(response, "usage", None)
+    return getattr(usage, "total_tokens", None) if usage is not None else None
+
+
+completion_scheduler = LLMScheduler(
+    "completions",
+    requests_per_minute=LLM_REQUESTS_PER_MINUTE,
+    tokens_per_minute=LLM_TOKENS_PER_MINUTE,
+    max_concurrency=LLM_MAX_CONCURRENCY,
+)
+embedding_scheduler = LLMScheduler(
+    "embeddings",
+    requests_per_minute=EMBED_REQUESTS_PER_MINUTE,
+    tokens_per_minute=EMBED_TOKENS_PER_MINUTE,
+    max_concurrency=LLM_MAX_CONCURRENCY,
+)
@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from ..config import METRICS_ENABLED
+
+F = TypeVar("F", bound=Callable[..., Any])
+Labels = Tuple[Tuple[str, str], ...]
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+_PREFIX = "cv_"
+
+
+class _Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(DURATION_BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(DURATION_BUCKETS, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+def _labels(labels: Dict[str, str]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: str = "") -> str:
+    parts = [f'{k}="{v}"' for k, v in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class MetricsRegistry:
+    """
+    Minimalny rejestr metryk w pamięci procesu (histogramy czasu i liczniki)
+    eksportowany w formacie tekstowym Prometheusa.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Dict[Labels, _Histogram]] = {}
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+
+    def observe(self, name: str, seconds: float, **labels: str) -> None:
+        key = _labels(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = _Histogram()
+            histogram.observe(seconds)
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        key = _labels(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def render(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            for name, series in sorted(self._histograms.items()):
+                metric = _PREFIX + name
+                lines.append(f"# TYPE {metric} histogram")
+                for labels, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(DURATION_BUCKETS, histogram.counts):
+                        cumulative += count
+                        le = _format_labels(labels, f'le="{bound}"')
+                        lines.append(f"{metric}_bucket{le} {cumulative}")
+                    le = _format_labels(labels, 'le="+Inf"')
+                    lines.append(f"{metric}_bucket{le} {histogram.count}")
+                    lines.append(f"{metric}_sum{_format_labels(labels)} {histogram.total:.6f}")
+                    lines.append(f"{metric}_count{_format_labels(labels)} {histogram.count}")
+            for name, series in sorted(self._counters.items()):
+                metric = _PREFIX + name
+                lines.append(f"# TYPE {metric} counter")
+                for labels, value in sorted(series.items()):
+                    lines.append(f"{metric}{_format_labels(labels)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# Czasy etapów bieżącego żądania HTTP (stage -> [suma sekund, liczba]) na potrzeby
+# nagłówka Server-Timing. Zadania uruchomione przez gather dziedziczą kontekst,
+# więc ich etapy trafiają do tego samego słownika.
+_request_timings: ContextVar[Optional[Dict[str, List[float]]]] = ContextVar(
+    "request_timings", default=None
+)
+
+
+class _Span:
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage: str) -> None:
+        self.stage = stage
+
+    def __enter__(self) -> "_Span":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        elapsed = time.perf_counter() - self.start
+        registry.observe("stage_duration_seconds", elapsed, stage=self.stage)
+        timings = _request_timings.get()
+        if timings is not None:
+            entry = timings.setdefault(self.stage, [0.0, 0])
+            entry[0] += elapsed
+            entry[1] += 1
+
+
+_NOOP_SPAN = nullcontext()
+
+
+def span(stage: str):
+    """
+    Mierzy czas etapu (`with span("rag.embed"): ...`). Przy wyłączonych
+    metrykach zwraca współdzielony, pusty context manager.
+    """
+    if not METRICS_ENABLED:
+        return _NOOP_SPAN
+    return _Span(stage)
+
+
+def timed(stage: str) -> Callable[[F], F]:
+    """
+    Dekorator `span` dla funkcji synchronicznych i asynchronicznych.
+    Przy wyłączonych metrykach zwraca funkcję bez opakowania.
+    """
+
+    def decorator(fn: F) -> F:
+        if not METRICS_ENABLED:
+            return fn
+        if asyncio.iscoroutinefunction(fn):
+
+            @wraps(fn)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                with _Span(stage):
+                    return await fn(*args, **kwargs)
+
+            return async_wrapper  # type: ignore[return-value]
+
+        @wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with _Span(stage):
+                return fn(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    if METRICS_ENABLED:
+        registry.inc("cache_requests_total", cache=cache, result="hit" if hit else "miss")
+
+
+def record_tokens(usage: Any) -> None:
+    """
+    Zlicza tokeny z pola `usage` odpowiedzi OpenAI (jeśli API je zwróciło).
+    """
+    if not METRICS_ENABLED or usage is None:
+        return
+    registry.inc("llm_tokens_total", getattr(usage, "prompt_tokens", 0) or 0, kind="prompt")
+    registry.inc(
+        "llm_tokens_total", getattr(usage, "completion_tokens", 0) or 0, kind="completion"
+    )
+
+
+def record_context_tokens(used: int, saved: int) -> None:
+    """
+    Zlicza tokeny kontekstu RAG trafiające do promptów i zaoszczędzone
+    dzięki sklejaniu/deduplikacji chunków oraz budżetowi.
+    """
+    if METRICS_ENABLED:
+        registry.inc("rag_context_tokens_total", used, kind="used")
+        registry.inc("rag_context_tokens_total", saved, kind="saved")
+
+
+def _server_timing(timings: Dict[str, List[float]], total: float) -> bytes:
+    parts = [
+        f'{stage};dur={seconds * 1000:.1f};desc="x{count}"'
+        for stage, (seconds, count) in timings.items()
+    ]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts).encode("latin-1")
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI: mierzy czas żądań (per trasa) i dokleja nagłówek
+    Server-Timing z etapami zmierzonymi do momentu wysłania nagłówków
+    (dla odpowiedzi strumieniowych – do startu strumienia).
+    """
+
+    def __init__(self, app: Callable[..., Any]) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings: Dict[str, List[float]] = {}
+        token = _request_timings.set(timings)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message: Dict[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append(
+                    (b"server-timing", _server_timing(timings, time.perf_counter() - start))
+                )
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
+            route = scope.get("route")
+            registry.observe(
+                "http_request_duration_seconds",
+                time.perf_counter() - start,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=str(status),
+            )
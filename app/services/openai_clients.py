@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+from typing import Optional
+
+import httpx
+from openai import AsyncOpenAI, OpenAI
+
+from ..config import (
+    OPENAI_MAX_CONNECTIONS,
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+    OPENAI_TIMEOUT_SECONDS,
+    ModelConfig,
+    get_model_config,
+)
+
+_model_config: ModelConfig = get_model_config()
+
+_sync_client: Optional[OpenAI] = None
+_async_client: Optional[AsyncOpenAI] = None
+
+
+def _http_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+    )
+
+
+def get_openai_client() -> OpenAI:
+    """
+    Zwraca współdzielonego, synchronicznego klienta OpenAI (skrypty, ingestion).
+    """
+    global _sync_client
+    if _sync_client is None:
+        _sync_client = OpenAI(
+            api_key=_model_config.api_key,
+            timeout=OPENAI_TIMEOUT_SECONDS,
+            # ponowienia (z backoffem i wstrzymaniem kolejki po 429) robi llm_scheduler
+            max_retries=0,
+            http_client=httpx.Client(
+                limits=_http_limits(), timeout=OPENAI_TIMEOUT_SECONDS
+            ),
+        )
+    return _sync_client
+
+
+def get_async_openai_client() -> AsyncOpenAI:
+    """
+    Zwraca współdzielonego klienta AsyncOpenAI z pulą połączeń keep-alive.
+    Jeden klient na proces – wszystkie handlery korzystają z tej samej puli.
+    """
+    global _async_client
+    if _async_client is None:
+        _async_client = AsyncOpenAI(
+            api_key=_model_config.api_key,
+            timeout=OPENAI_TIMEOUT_SECONDS,
+            # ponowienia (z backoffem i wstrzymaniem kolejki po 429) robi llm_scheduler
+            max_retries=0,
+            http_client=httpx.AsyncClient(
+                limits=_http_limits(), timeout=OPENAI_TIMEOUT_SECONDS
+            ),
+        )
+    return _async_client
+
+
+async def close_openai_clients() -> None:
+    """
+    Zamyka pule połączeń (wywoływane przy zamykaniu aplikacji).
+    """
+    global _sync_client, _async_client
+    if _async_client is not None:
+        await _async_client.close()
+        _async_client = None
+    if _sync_client is not None:
+        _sync_client.close()
+        _sync_client = None
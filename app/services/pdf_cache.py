@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from hashlib import sha256
+from pathlib import Path
+from typing import BinaryIO, Dict, Optional, Union
+
+import xhtml2pdf
+
+from ..config import PDF_CACHE_DIR, PDF_CACHE_MAX_BYTES
+
+# Zmiana wersji renderera (albo tej stałej) unieważnia wszystkie wpisy.
+RENDERER_VERSION = f"xhtml2pdf-{xhtml2pdf.__version__}/1"
+
+
+def pdf_cache_key(html: str) -> str:
+    """
+    Klucz treściowy PDF: hash końcowego HTML i wersji renderera. Ten sam HTML
+    daje ten sam PDF, więc klucz nadaje się też na ETag.
+    """
+    digest = sha256(RENDERER_VERSION.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(html.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class PdfDiskCache:
+    """
+    Cache wyrenderowanych PDF-ów na dysku (plik na klucz), ograniczony łącznym
+    rozmiarem z eviction LRU. Kolejność użycia trzymamy w pamięci, a na dysku
+    odtwarzamy ją z czasu modyfikacji plików (odświeżanego przy trafieniu).
+    Katalog jest tworzony i skanowany przy pierwszym użyciu, nie przy imporcie.
+    """
+
+    def __init__(self, directory: Union[str, Path], max_bytes: int) -> None:
+        self.directory = Path(directory)
+        self.max_bytes = max(0, max_bytes)
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._size = 0
+        self._loaded = False
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self) -> None:
+        # wywoływane pod `_lock`
+        if self._loaded:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # pozostałości po przerwanych renderowaniach
+        for leftover in self.directory.glob("*.tmp"):
+            leftover.unlink(missing_ok=True)
+        existing = sorted(self.directory.glob("*.pdf"), key=lambda p: p.stat().st_mtime)
+        for path in existing:
+            size = path.stat().st_size
+            if not size:
+                # pusty plik to ślad nieudanego renderowania – nie serwujemy go
+                path.unlink(missing_ok=True)
+                continue
+            self._entries[path.stem] = size
+            self._size += size
+        self._loaded = True
+        self._evict()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.pdf"
+
+    def _evict(self) -> None:
+        while self._size > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._size -= size
+            try:
+                self._path(key).unlink()
+            except OSError:
+                # plik już usunięty albo wciąż otwarty (Windows) – zniknie z indeksu
+                pass
+
+    def open(self, key: str) -> Optional[BinaryIO]:
+        """
+        Otwiera PDF z cache do odczytu (i oznacza wpis jako ostatnio użyty).
+        Plik jest otwierany pod blokadą, więc późniejsza eviction nie odbierze
+        go wywołującemu. Pusty albo usunięty plik to chybienie – wpis jest
+        wtedy usuwany.
+        """
+        with self._lock:
+            self._load()
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            path = self._path(key)
+            try:
+                handle = open(path, "rb")
+            except FileNotFoundError:
+                # plik usunięty spoza aplikacji
+                handle = None
+            if handle is not None and os.fstat(handle.fileno()).st_size == 0:
+                handle.close()
+                handle = None
+            if handle is None:
+                self._size -= self._entries.pop(key)
+                path.unlink(missing_ok=True)
+                self.misses += 1
+                return None
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return handle
+
+    def temp_path(self) -> Path:
+        """
+        Ścieżka na plik tymczasowy w katalogu cache (ten sam system plików,
+        więc `put_file` przenosi go do cache bez kopiowania).
+        """
+        with self._lock:
+            self._load()
+        fd, tmp_name = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        os.close(fd)
+        return Path(tmp_name)
+
+    def put_file(self, key: str, source: Path) -> Optional[Path]:
+        """
+        Przenosi gotowy plik PDF do cache (atomowy rename). Zwraca ścieżkę wpisu
+        albo None, gdy dokument jest pusty lub nie mieści się w limicie – wtedy
+        plik źródłowy zostaje nietknięty.
+        """
+        size = source.stat().st_size
+        if not size or size > self.max_bytes:
+            return None
+        path = self._path(key)
+        with self._lock:
+            self._load()
+        os.replace(source, path)
+        with self._lock:
+            self._size -= self._entries.pop(key, 0)
+            self._entries[key] = size
+            self._size += size
+            self._evict()
+            return path if key in self._entries else None
+
+    def put(self, key: str, data: bytes) -> Optional[Path]:
+        if not data or len(data) > self.max_bytes:
+            return None
+        tmp_path = self.temp_path()
+        tmp_path.write_bytes(data)
+        return self.put_file(key, tmp_path)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "bytes": self._size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+def build_pdf_cache(
+    directory: str = PDF_CACHE_DIR, max_bytes: int = PDF_CACHE_MAX_BYTES
+) -> Optional[PdfDiskCache]:
+    if not directory or max_bytes <= 0:
+        return None
+    return PdfDiskCache(directory, max_bytes)
+
+
+pdf_cache = build_pdf_cache()
@@ -1,16 +1,139 @@
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
 from io import BytesIO
+from pathlib import Path
+from typing import Any, Callable, Optional
 
 from xhtml2pdf import pisa
 
+from ..config import PDF_MAX_QUEUE, PDF_RENDER_TIMEOUT_SECONDS, PDF_WORKERS
+from .metrics import timed
+
+# Rozmiar kawałka przy strumieniowaniu PDF z dysku do klienta.
+PDF_STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class PdfQueueFullError(RuntimeError):
+    """Kolejka renderowania PDF jest pełna – klient powinien spróbować później."""
+
+
+class PdfRenderTimeoutError(RuntimeError):
+    """Renderowanie PDF przekroczyło dozwolony czas."""
+
+
+class PdfRenderError(RuntimeError):
+    """xhtml2pdf zgłosił błędy – wynik jest niepełny i nie nadaje się do wysłania."""
+
+
+def _check_status(status: Any) -> None:
+    if status.err:
+        raise PdfRenderError(
+            f"Renderowanie PDF nie powiodło się (liczba błędów: {status.err})"
+        )
+
 
 def html_to_pdf_bytes(html_content: str) -> bytes:
     """
     Konwertuje HTML na PDF i zwraca bytes (np. do odpowiedzi HTTP).
     """
     result = BytesIO()
-    pisa.CreatePDF(src=html_content, dest=result)
     try:
+        _check_status(pisa.CreatePDF(src=html_content, dest=result))
         return result.getvalue()
     finally:
         result.close()
 
+
+def html_to_pdf_file(html_content: str, path: str) -> None:
+    """
+    Konwertuje HTML na PDF zapisywany bezpośrednio do pliku – bez trzymania
+    całego dokumentu w pamięci i bez przesyłania go między procesami.
+    Przy błędzie renderowania usuwa niepełny plik i zgłasza PdfRenderError.
+    """
+    try:
+        with open(path, "wb") as dest:
+            _check_status(pisa.CreatePDF(src=html_content, dest=dest))
+    except BaseException:
+        Path(path).unlink(missing_ok=True)
+        raise
+
+
+class PdfRenderService:
+    """
+    Renderuje PDF-y poza pętlą zdarzeń – w puli procesów (workers > 0) albo
+    w puli wątków (workers == 0). Liczba zadań w toku jest ograniczona do
+    workers + max_queue; nadmiarowe zlecenia są od razu odrzucane.
+    """
+
+    def __init__(
+        self,
+        workers: int = PDF_WORKERS,
+        max_queue: int = PDF_MAX_QUEUE,
+        timeout: float = PDF_RENDER_TIMEOUT_SECONDS,
+    ) -> None:
+        self.workers = workers
+        self.capacity = max(1, workers) + max(0, max_queue)
+        self.timeout = timeout
+        self._executor: Optional[Executor] = None
+        self._in_flight = 0
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.workers > 0:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=1)
+        return self._executor
+
+    def _release(self, _: Future) -> None:
+        self._in_flight -= 1
+
+    @timed("pdf.render")
+    async def _run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        if self._in_flight >= self.capacity:
+            raise PdfQueueFullError("Kolejka renderowania PDF jest pełna")
+
+        loop = asyncio.get_running_loop()
+        future = self._get_executor().submit(fn, *args)
+        self._in_flight += 1
+        # Miejsce w kolejce zwalniamy dopiero, gdy worker faktycznie skończy –
+        # także po timeoucie, żeby zawieszone zadania nadal liczyły się do limitu.
+        def _on_done(done: Future) -> None:
+            try:
+                loop.call_soon_threadsafe(self._release, done)
+            except RuntimeError:  # pętla zdarzeń już zamknięta
+                pass
+
+        future.add_done_callback(_on_done)
+
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError as exc:
+            future.cancel()
+            raise PdfRenderTimeoutError(
+                f"Renderowanie PDF trwało dłużej niż {self.timeout}s"
+            ) from exc
+
+    async def render(self, html_content: str) -> bytes:
+        return await self._run(html_to_pdf_bytes, html_content)
+
+    async def render_to_file(self, html_content: str, path: str) -> None:
+        """
+        Renderuje PDF do pliku `path` – worker zapisuje wynik na dysk,
+        do procesu aplikacji wraca tylko informacja o zakończeniu.
+        """
+        await self._run(html_to_pdf_file, html_content, path)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+
+pdf_render_service = PdfRenderService()
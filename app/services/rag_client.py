@@ -1,65 +1,505 @@
-import json
-import math
-from pathlib import Path
-from typing import List, Tuple
+import asyncio
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple, Union
 
-from openai import OpenAI
+import numpy as np
+from ingest_knowledge import (
+    ANN_INDEX_PATH,
+    EMBED_MODEL,
+    LEXICAL_INDEX_PATH,
+    OUTPUT_PATH,
+    convert_json_index,
+    index_exists,
+    ingest,
+    read_index,
+)
+from openai import OpenAIError
 
-from ingest_knowledge import EMBED_MODEL, OUTPUT_PATH, ingest
+from ..config import (
+    RAG_ANN_NPROBE,
+    RAG_ANN_RERANK,
+    RAG_CANDIDATES,
+    RAG_HYBRID_WEIGHT,
+    RAG_INDEX_TYPE,
+    RAG_LEXICAL_MIN_SCORE,
+    RAG_LOAD_MODE,
+    RAG_LOAD_RETRY_SECONDS,
+    RAG_MIN_SCORE,
+    RAG_RETRIEVAL_MODE,
+    ModelConfig,
+    get_model_config,
+)
+from .context_assembly import RetrievedChunk, assemble_context, estimate_tokens
+from .embedding_cache import EmbeddingCache
+from .lexical_index import BM25Index
+from .llm_scheduler import embedding_scheduler, usage_tokens
+from .metrics import record_cache, record_context_tokens, timed
+from .openai_clients import get_async_openai_client, get_openai_client
+from .vector_index import EmbeddingIndex, IVFIndex
 
-from ..config import ModelConfig, get_model_config
+logger = logging.getLogger(__name__)
 
 _model_config: ModelConfig = get_model_config()
-_client = OpenAI(api_key=_model_config.api_key) if _model_config.is_configured else None
 
-_ingested_path = ingest()
-if Path(_ingested_path).exists():
-    _CHUNKS = json.loads(Path(_ingested_path).read_text())
-else:
-    _CHUNKS = []
+# Indeks ładujemy leniwie (przy pierwszym użyciu) albo w tle przy starcie
+# aplikacji – import modułu nie uruchamia już ingestion.
+_INDEX: Union[EmbeddingIndex, IVFIndex] = EmbeddingIndex.from_embeddings([])
+_CHUNKS: List[Dict[str, object]] = []
+_LEXICAL: Optional[BM25Index] = None
+_load_lock = threading.Lock()
+_load_state: Dict[str, Optional[str]] = {"status": "not_loaded", "error": None}
+# kiedy (time.monotonic) wolno ponowić nieudane ładowanie indeksu
+_retry_load_at = 0.0
 
-_EMBEDDINGS: List[List[float]] = [chunk["embedding"] for chunk in _CHUNKS]
-_EMBED_NORMS: List[float] = [
-    math.sqrt(sum(value * value for value in embedding)) or 1.0
-    for embedding in _EMBEDDINGS
-]
+_EMBED_CACHE = EmbeddingCache()
 
 
-def _cosine_similarity(
-    emb: List[float], emb_norm: float, query_vec: List[float], query_norm: float
-) -> float:
-    if not emb or not query_vec or emb_norm == 0 or query_norm == 0:
-        return 0.0
-    dot = sum(a * b for a, b in zip(emb, query_vec))
-    return dot / (emb_norm * query_norm)
+def _read_ann_index(vectors: np.ndarray) -> Optional[IVFIndex]:
+    if RAG_INDEX_TYPE == "exact":
+        return None
+    if not ANN_INDEX_PATH.exists():
+        if RAG_INDEX_TYPE == "ivf":
+            logger.warning("Brak indeksu IVF (%s) – używam pełnego skanowania", ANN_INDEX_PATH)
+        return None
+    # pełne wektory (mapowane z dysku) są potrzebne tylko do rerankingu kandydatów
+    index = IVFIndex.load(
+        ANN_INDEX_PATH,
+        full=vectors if RAG_ANN_RERANK else None,
+        nprobe=RAG_ANN_NPROBE,
+        rerank=RAG_ANN_RERANK,
+    )
+    if len(index) != vectors.shape[0] or index.dim != vectors.shape[1]:
+        logger.warning("Indeks IVF nie pasuje do wektorów – używam pełnego skanowania")
+        return None
+    return index
 
 
-def _embed_query(query: str) -> Tuple[List[float], float]:
-    if not _client:
-        return [], 0.0
-    response = _client.embeddings.create(model=EMBED_MODEL, input=[query])
-    vector = response.data[0].embedding
-    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
-    return vector, norm
+def _read_lexical_index(chunks: List[Dict[str, object]]) -> BM25Index:
+    if LEXICAL_INDEX_PATH.exists():
+        index = BM25Index.load(LEXICAL_INDEX_PATH)
+        if len(index) == len(chunks):
+            return index
+        logger.warning("Indeks BM25 nie pasuje do fragmentów – buduję go w pamięci")
+    return BM25Index.build([str(chunk["content"]) for chunk in chunks])
 
 
-def get_rag_context_for_cv(query: str, limit: int = 3) -> List[str]:
+def _read_chunks() -> Tuple[Union[EmbeddingIndex, IVFIndex], List[Dict[str, object]]]:
+    # Wektory są mapowane do pamięci i już znormalizowane przy zapisie –
+    # indeks korzysta z nich bez kopiowania.
+    chunks, vectors = read_index(mmap=True)
+    ann_index = _read_ann_index(vectors)
+    if ann_index is not None:
+        return ann_index, chunks
+    return EmbeddingIndex(vectors, normalized=True), chunks
+
+
+def _mark_failed(error: str) -> None:
+    global _retry_load_at
+
+    _load_state.update(status="failed", error=error)
+    _retry_load_at = time.monotonic() + RAG_LOAD_RETRY_SECONDS
+
+
+def _can_start_load() -> bool:
+    """
+    Indeks jeszcze nie był ładowany albo minął odstęp od nieudanej próby.
+    """
+    status = _load_state["status"]
+    if status == "failed":
+        return time.monotonic() >= _retry_load_at
+    return status == "not_loaded"
+
+
+def load_index() -> bool:
+    """
+    Uruchamia ingestion (jeśli baza wiedzy się zmieniła) i ładuje indeks.
+    Bezpieczne wątkowo i idempotentne. Gdy ingestion się nie powiedzie
+    (np. brak klucza API), próbuje użyć ostatniego zapisanego indeksu.
+    Po porażce stan "failed" trwa RAG_LOAD_RETRY_SECONDS – potem kolejne
+    zapytanie (albo sprawdzenie gotowości) ponawia ładowanie.
+    """
+    global _INDEX, _CHUNKS, _LEXICAL
+
+    with _load_lock:
+        if _load_state["status"] == "ready":
+            return True
+        _load_state.update(status="loading", error=None)
+
+        try:
+            ingest()
+        except Exception as exc:
+            logger.warning("Ingestion bazy wiedzy nie powiodła się: %s", exc)
+            _load_state["error"] = str(exc)
+
+        try:
+            if not index_exists() and OUTPUT_PATH.exists():
+                convert_json_index(OUTPUT_PATH)
+            if not index_exists():
+                _mark_failed(_load_state["error"] or "Brak zapisanego indeksu RAG")
+                return False
+            _INDEX, _CHUNKS = _read_chunks()
+            _LEXICAL = _read_lexical_index(_CHUNKS)
+        except Exception as exc:
+            logger.exception("Nie udało się wczytać indeksu RAG")
+            _mark_failed(str(exc))
+            return False
+
+        _load_state["status"] = "ready"
+        return True
+
+
+async def load_index_async() -> bool:
+    """
+    Ładuje indeks w wątku roboczym, nie blokując pętli zdarzeń.
+    """
+    return await asyncio.to_thread(load_index)
+
+
+def start_background_load() -> None:
+    """
+    Startuje ładowanie indeksu w wątku w tle (jeśli jeszcze nie trwa,
+    a po porażce – gdy minął odstęp między próbami).
+    """
+    if not _can_start_load():
+        return
+    _load_state["status"] = "loading"
+    threading.Thread(target=load_index, name="rag-index-loader", daemon=True).start()
+
+
+def is_index_ready() -> bool:
+    return _load_state["status"] == "ready"
+
+
+def index_status() -> Dict[str, object]:
+    """
+    Stan indeksu RAG na potrzeby endpointu gotowości.
+    """
+    return {
+        "status": _load_state["status"],
+        "error": _load_state["error"],
+        "chunks": len(_CHUNKS),
+        "mode": RAG_LOAD_MODE,
+        "index": "ivf" if isinstance(_INDEX, IVFIndex) else "exact",
+        "retrieval": RAG_RETRIEVAL_MODE,
+    }
+
+
+def _ensure_index() -> bool:
+    if is_index_ready():
+        return True
+    # wywołania synchroniczne (skrypty) mogą poczekać na załadowanie indeksu
+    if _can_start_load():
+        return load_index()
+    return False
+
+
+async def _ensure_index_async() -> bool:
+    if is_index_ready():
+        return True
+    if _can_start_load():
+        if RAG_LOAD_MODE == "lazy":
+            return await load_index_async()
+        start_background_load()
+    # do czasu załadowania indeksu odpowiadamy bez kontekstu RAG
+    return False
+
+
+def _estimated_tokens(queries: Sequence[str]) -> int:
+    return sum(estimate_tokens(query) for query in queries)
+
+
+@timed("rag.embed")
+def _fetch_embeddings(queries: Sequence[str]) -> List[List[float]]:
+    response = embedding_scheduler.run_sync(
+        lambda: get_openai_client().embeddings.create(model=EMBED_MODEL, input=list(queries)),
+        tokens=_estimated_tokens(queries),
+        usage=usage_tokens,
+    )
+    return [item.embedding for item in response.data]
+
+
+@timed("rag.embed")
+async def _fetch_embeddings_async(queries: Sequence[str]) -> List[List[float]]:
+    # równoczesne zapytania o te same embeddingi wysyłamy do API tylko raz
+    key = tuple(EmbeddingCache.key_for(query, EMBED_MODEL) for query in queries)
+    response = await embedding_scheduler.run(
+        lambda: get_async_openai_client().embeddings.create(
+            model=EMBED_MODEL, input=list(queries)
+        ),
+        tokens=_estimated_tokens(queries),
+        key=key,
+        usage=usage_tokens,
+    )
+    return [item.embedding for item in response.data]
+
+
+def _lookup_cached(
+    queries: Sequence[str],
+) -> Tuple[List[Optional[np.ndarray]], List[str]]:
+    """
+    Zwraca wektory z cache (None dla brakujących) oraz unikalne zapytania
+    do pobrania z API.
+    """
+    vectors = [_EMBED_CACHE.get(query, EMBED_MODEL) for query in queries]
+    missing: Dict[str, str] = {}
+    for query, vector in zip(queries, vectors):
+        record_cache("embedding", vector is not None)
+        if vector is None:
+            missing.setdefault(EmbeddingCache.key_for(query, EMBED_MODEL), query)
+    return vectors, list(missing.values())
+
+
+def _merge_fetched(
+    queries: Sequence[str],
+    vectors: List[Optional[np.ndarray]],
+    missing: List[str],
+    fetched: List[List[float]],
+) -> List[np.ndarray]:
+    by_key: Dict[str, np.ndarray] = {}
+    for query, vector in zip(missing, fetched):
+        by_key[EmbeddingCache.key_for(query, EMBED_MODEL)] = _EMBED_CACHE.set(
+            query, EMBED_MODEL, vector
+        )
+    return [
+        vector
+        if vector is not None
+        else by_key[EmbeddingCache.key_for(query, EMBED_MODEL)]
+        for query, vector in zip(queries, vectors)
+    ]
+
+
+def _embed_queries(queries: Sequence[str]) -> List[np.ndarray]:
+    """
+    Embeddingi zapytań (z cache albo z API). Pusta lista, gdy API nie jest
+    skonfigurowane albo zawiodło mimo ponowień – wyszukiwanie przechodzi
+    wtedy na BM25.
+    """
+    if not _model_config.is_configured or not queries:
+        return []
+    vectors, missing = _lookup_cached(queries)
+    try:
+        fetched = _fetch_embeddings(missing) if missing else []
+    except OpenAIError as exc:
+        logger.warning("Embedding zapytań nie powiódł się, używam BM25: %s", exc)
+        return []
+    return _merge_fetched(queries, vectors, missing, fetched)
+
+
+async def _embed_queries_async(queries: Sequence[str]) -> List[np.ndarray]:
+    if not _model_config.is_configured or not queries:
+        return []
+    # cache embeddingów może sięgać do SQLite – poza pętlą zdarzeń
+    vectors, missing = await asyncio.to_thread(_lookup_cached, queries)
+    try:
+        fetched = await _fetch_embeddings_async(missing) if missing else []
+    except OpenAIError as exc:
+        logger.warning("Embedding zapytań nie powiódł się, używam BM25: %s", exc)
+        return []
+    if not missing:
+        return _merge_fetched(queries, vectors, missing, fetched)
+    return await asyncio.to_thread(_merge_fetched, queries, vectors, missing, fetched)
+
+
+def embedding_cache_stats() -> Dict[str, object]:
+    """
+    Liczniki trafień/chybień cache embeddingów zapytań.
+    """
+    return _EMBED_CACHE.stats()
+
+
+def _embed_query(query: str) -> Sequence[float]:
+    vectors = _embed_queries([query])
+    return vectors[0] if vectors else []
+
+
+async def _embed_query_async(query: str) -> Sequence[float]:
+    vectors = await _embed_queries_async([query])
+    return vectors[0] if vectors else []
+
+
+def _min_score(mode: str) -> float:
+    """
+    Próg wyniku dla trybu, który faktycznie dał trafienia – skale kosinusa
+    i znormalizowanego BM25 się różnią.
+    """
+    if mode == "lexical":
+        return RAG_LEXICAL_MIN_SCORE
+    # bez indeksu BM25 tryb hybrydowy zwraca same wyniki kosinusowe
+    if mode == "hybrid" and _LEXICAL is not None:
+        return RAG_HYBRID_WEIGHT * RAG_MIN_SCORE + (1 - RAG_HYBRID_WEIGHT) * RAG_LEXICAL_MIN_SCORE
+    return RAG_MIN_SCORE
+
+
+def _assemble(hits: List[Tuple[int, float]], limit: int, mode: str) -> List[str]:
+    """
+    Zamienia trafienia indeksu na kontekst dla promptu: sąsiednie chunki
+    sklejone bez powtórzonego nakładu, próg podobieństwa, budżet tokenów.
+    """
+    context = assemble_context(
+        [
+            RetrievedChunk(
+                source=str(_CHUNKS[idx].get("source", "")),
+                chunk_id=str(_CHUNKS[idx].get("chunk_id", idx)),
+                content=str(_CHUNKS[idx]["content"]),
+                score=score,
+            )
+            for idx, score in hits
+        ],
+        min_score=_min_score(mode),
+        max_passages=limit,
+    )
+    record_context_tokens(context.tokens, context.tokens_saved)
+    if context.tokens_saved:
+        logger.debug(
+            "Kontekst RAG: %s tokenów (%s chunków), zaoszczędzono %s",
+            context.tokens,
+            context.chunks_used,
+            context.tokens_saved,
+        )
+    return context.passages
+
+
+def _retrieval_mode(mode: Optional[str]) -> str:
+    """
+    Tryb wyszukiwania dla wywołania: jawny `mode` albo RAG_RETRIEVAL_MODE.
+    Bez skonfigurowanego API zostaje wyszukiwanie leksykalne.
+    """
+    mode = (mode or RAG_RETRIEVAL_MODE).lower()
+    if mode not in ("embedding", "lexical", "hybrid"):
+        mode = "embedding"
+    if mode != "lexical" and not _model_config.is_configured:
+        return "lexical"
+    return mode
+
+
+def _fuse(
+    embedding_hits: List[Tuple[int, float]],
+    lexical_hits: List[Tuple[int, float]],
+    limit: int,
+) -> List[Tuple[int, float]]:
+    """
+    Łączy wyniki ważoną sumą podobieństwa kosinusowego i znormalizowanego
+    BM25 (fragment nieobecny na jednej z list dostaje tam 0).
+    """
+    scores: Dict[int, float] = {}
+    for idx, score in embedding_hits:
+        scores[idx] = RAG_HYBRID_WEIGHT * score
+    for idx, score in lexical_hits:
+        scores[idx] = scores.get(idx, 0.0) + (1 - RAG_HYBRID_WEIGHT) * score
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+
+def _search(
+    query: str, query_vec: Sequence[float], mode: str, limit: int
+) -> List[Tuple[int, float]]:
+    # brak wektora (tryb leksykalny albo błąd API) – zostaje BM25
+    if len(query_vec) == 0:
+        return _LEXICAL.search(query, limit) if _LEXICAL is not None else []
+    hits = _INDEX.search(query_vec, limit)
+    if mode == "hybrid" and _LEXICAL is not None:
+        return _fuse(hits, _LEXICAL.search(query, limit), limit)
+    return hits
+
+
+@timed("rag.search")
+def _top_chunks(query: str, query_vec: Sequence[float], limit: int, mode: str) -> List[str]:
+    hits = _search(query, query_vec, mode, max(limit, RAG_CANDIDATES))
+    # bez wektora zapytania (np. błąd API) wyniki pochodzą z BM25
+    return _assemble(hits, limit, mode if len(query_vec) else "lexical")
+
+
+@timed("rag.search")
+def _top_chunks_batch(
+    queries: Sequence[str], query_vecs: Sequence[Sequence[float]], limit: int, mode: str
+) -> List[List[str]]:
+    candidates = max(limit, RAG_CANDIDATES)
+    if mode == "lexical" or len(query_vecs) != len(queries):
+        mode = "lexical"
+        batch_hits = [_search(query, [], mode, candidates) for query in queries]
+    else:
+        batch_hits = _INDEX.search_batch(query_vecs, candidates)
+        if mode == "hybrid" and _LEXICAL is not None:
+            batch_hits = [
+                _fuse(hits, _LEXICAL.search(query, candidates), candidates)
+                for query, hits in zip(queries, batch_hits)
+            ]
+    return [_assemble(hits, limit, mode) for hits in batch_hits]
+
+
+def _can_search(queries: Sequence[str]) -> bool:
+    return bool(queries) and bool(_CHUNKS)
+
+
+def get_rag_context_for_cv(query: str, limit: int = 3, mode: Optional[str] = None) -> List[str]:
     """
     Zwraca listę fragmentów wiedzy najlepiej dopasowanych do zapytania.
+    `mode` nadpisuje RAG_RETRIEVAL_MODE ("lexical" nie wywołuje API embeddingów).
     """
 
-    if not query or not _CHUNKS or not _client:
+    if not query or not _ensure_index() or not _can_search([query]):
         return []
 
-    query_vec, query_norm = _embed_query(query)
-    if not query_vec:
+    mode = _retrieval_mode(mode)
+    query_vec = _embed_query(query) if mode != "lexical" else []
+    return _top_chunks(query, query_vec, limit, mode)
+
+
+async def get_rag_context_for_cv_async(
+    query: str, limit: int = 3, mode: Optional[str] = None
+) -> List[str]:
+    """
+    Wersja asynchroniczna `get_rag_context_for_cv` – embedding zapytania
+    nie blokuje pętli zdarzeń.
+    """
+
+    if not query or not await _ensure_index_async() or not _can_search([query]):
         return []
 
-    scored = []
-    for chunk, emb, emb_norm in zip(_CHUNKS, _EMBEDDINGS, _EMBED_NORMS):
-        score = _cosine_similarity(emb, emb_norm, query_vec, query_norm)
-        scored.append((score, chunk["content"]))
+    mode = _retrieval_mode(mode)
+    query_vec = await _embed_query_async(query) if mode != "lexical" else []
+    return _top_chunks(query, query_vec, limit, mode)
+
+
+def get_rag_context_for_queries(
+    queries: Sequence[str], limit: int = 3, mode: Optional[str] = None
+) -> List[List[str]]:
+    """
+    Wersja wsadowa: jedno zapytanie o embeddingi dla wszystkich `queries`
+    i jedno mnożenie macierzy. Zwraca listę wyników w kolejności zapytań.
+    """
+
+    queries = list(queries)
+    if not _ensure_index() or not _can_search(queries):
+        return [[] for _ in queries]
+
+    mode = _retrieval_mode(mode)
+    positions = [i for i, query in enumerate(queries) if query]
+    texts = [queries[i] for i in positions]
+    vectors = _embed_queries(texts) if mode != "lexical" else []
+    results: List[List[str]] = [[] for _ in queries]
+    for position, chunks in zip(positions, _top_chunks_batch(texts, vectors, limit, mode)):
+        results[position] = chunks
+    return results
+
+
+async def get_rag_context_for_queries_async(
+    queries: Sequence[str], limit: int = 3, mode: Optional[str] = None
+) -> List[List[str]]:
+    """
+    Asynchroniczna wersja `get_rag_context_for_queries`.
+    """
 
-    scored.sort(key=lambda item: item[0], reverse=True)
-    return [content for score, content in scored[:limit] if score > 0]
+    queries = list(queries)
+    if not await _ensure_index_async() or not _can_search(queries):
+        return [[] for _ in queries]
 
+    mode = _retrieval_mode(mode)
+    positions = [i for i, query in enumerate(queries) if query]
+    texts = [queries[i] for i in positions]
+    vectors = await _embed_queries_async(texts) if mode != "lexical" else []
+    results: List[List[str]] = [[] for _ in queries]
+    for position, chunks in zip(positions, _top_chunks_batch(texts, vectors, limit, mode)):
+        results[position] = chunks
+    return results
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+from typing import Any, Dict, Optional
+
+from jinja2 import Environment, FileSystemLoader
+
+from ..config import ASSET_MODE, STATIC_DIR, TEMPLATES_DIR
+from ..models import CVInput
+from .assets import AssetStore
+from .cv_engine import choose_template
+from .metrics import timed
+
+PRODUCTION = ASSET_MODE == "production"
+
+# Wspólne środowisko Jinja2 – dla stron aplikacji i dla renderowania poza
+# cyklem żądania HTTP (batch, PDF po stronie serwera). W trybie produkcyjnym
+# szablony nie są sprawdzane pod kątem zmian na dysku.
+template_env = Environment(
+    loader=FileSystemLoader(str(TEMPLATES_DIR)),
+    autoescape=True,
+    auto_reload=not PRODUCTION,
+)
+
+asset_store: Optional[AssetStore] = AssetStore(STATIC_DIR) if PRODUCTION else None
+
+
+def asset_url(name: str) -> str:
+    if asset_store is None:
+        return f"/static/{name}"
+    return asset_store.url(name)
+
+
+template_env.globals["asset_url"] = asset_url
+
+
+def precompile_templates() -> int:
+    """
+    Kompiluje wszystkie szablony do cache środowiska (wywoływane przy starcie
+    w trybie produkcyjnym, żeby pierwsze żądania nie płaciły za parsowanie).
+    """
+    names = template_env.list_templates(extensions=["html"])
+    for name in names:
+        template_env.get_template(name)
+    return len(names)
+
+
+@timed("render.template")
+def render_cv_html(cv_input: CVInput, context: Dict[str, Any]) -> str:
+    """
+    Renderuje gotowy dokument HTML CV dla kontekstu z `build_cv_context`.
+    """
+    return template_env.get_template(choose_template(cv_input)).render(**context)
@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """
+    Łączy identyczne, równoczesne wywołania asynchroniczne: pierwsze wywołanie
+    dla danego klucza wykonuje pracę, kolejne czekają na ten sam wynik.
+    Po zakończeniu klucz jest zwalniany (to nie jest cache).
+    """
+
+    def __init__(self) -> None:
+        self._in_flight: Dict[Hashable, "asyncio.Future[Any]"] = {}
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        existing = self._in_flight.get(key)
+        if existing is not None:
+            self.coalesced += 1
+            # shield: anulowanie jednego z oczekujących nie przerywa pracy pozostałym
+            return await asyncio.shield(existing)
+
+        task = asyncio.ensure_future(factory())
+        self._in_flight[key] = task
+        task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return await asyncio.shield(task)
+
+    def __len__(self) -> int:
+        return len(self._in_flight)
@@ -0,0 +1,309 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import Any, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """
+    Zwraca macierz float32 (C-contiguous) z wierszami znormalizowanymi do długości 1.
+    Wiersze zerowe zostają zerowe.
+    """
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return np.ascontiguousarray(matrix / norms, dtype=np.float32)
+
+
+def top_k(scores: np.ndarray, limit: int) -> List[Tuple[int, float]]:
+    """
+    `limit` najlepszych pozycji jako (indeks, wynik), od najwyższego wyniku –
+    `argpartition` zamiast pełnego sortowania. Wspólne dla indeksów wektorowych i BM25.
+    """
+    if limit <= 0 or scores.size == 0:
+        return []
+    k = min(limit, scores.size)
+    if k < scores.size:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(scores.size)
+    ordered = candidates[np.argsort(-scores[candidates], kind="stable")]
+    return [(int(i), float(scores[i])) for i in ordered]
+
+
+class EmbeddingIndex:
+    """
+    Indeks embeddingów trzymany jako jedna ciągła macierz float32 z wierszami
+    znormalizowanymi przy ładowaniu – podobieństwo kosinusowe to zwykły iloczyn
+    macierz × wektor, a top-k wybieramy przez `argpartition` zamiast pełnego sortowania.
+    """
+
+    def __init__(self, matrix: np.ndarray, normalized: bool = False) -> None:
+        if matrix.size == 0:
+            self._matrix = np.zeros((0, 0), dtype=np.float32)
+        elif normalized:
+            self._matrix = matrix
+        else:
+            self._matrix = normalize_rows(matrix)
+
+    @classmethod
+    def from_embeddings(cls, embeddings: Sequence[Sequence[float]]) -> "EmbeddingIndex":
+        if not embeddings:
+            return cls(np.zeros((0, 0), dtype=np.float32))
+        return cls(np.asarray(embeddings, dtype=np.float32))
+
+    def __len__(self) -> int:
+        return int(self._matrix.shape[0])
+
+    @property
+    def dim(self) -> int:
+        return int(self._matrix.shape[1]) if self._matrix.ndim == 2 else 0
+
+    def search(self, query_vec: Sequence[float], limit: int) -> List[Tuple[int, float]]:
+        """
+        Zwraca listę (indeks wiersza, podobieństwo kosinusowe) malejąco po wyniku.
+        """
+        if not len(self):
+            return []
+        query = normalize_rows(np.asarray(query_vec, dtype=np.float32))[0]
+        if query.shape[0] != self.dim:
+            return []
+        return top_k(self._matrix @ query, limit)
+
+    def search_batch(
+        self, query_matrix: Sequence[Sequence[float]], limit: int
+    ) -> List[List[Tuple[int, float]]]:
+        """
+        Ocenia wiele zapytań jednym mnożeniem macierzy (Q × D).
+        """
+        queries = np.asarray(query_matrix, dtype=np.float32)
+        if queries.size == 0:
+            return []
+        queries = normalize_rows(queries)
+        if not len(self) or queries.shape[1] != self.dim:
+            return [[] for _ in range(queries.shape[0])]
+        scores = queries @ self._matrix.T
+        return [top_k(row, limit) for row in scores]
+
+
+QUANTIZATIONS = ("int8", "float16", "float32")
+
+
+def quantize_rows(matrix: np.ndarray, kind: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Kwantyzuje znormalizowane wiersze: int8 ze skalą per wiersz (symetrycznie,
+    max |x| → 127), float16 albo float32 bez zmian. Zwraca (kody, skale);
+    dla typów zmiennoprzecinkowych skale są puste.
+    """
+    if kind == "int8":
+        scales = np.abs(matrix).max(axis=1) / 127.0 if matrix.size else np.zeros(0)
+        scales = scales.astype(np.float32)
+        scales[scales == 0] = 1.0
+        codes = np.rint(matrix / scales[:, None]).astype(np.int8)
+        return codes, scales
+    if kind in ("float16", "float32"):
+        return np.ascontiguousarray(matrix, dtype=kind), np.zeros(0, dtype=np.float32)
+    raise ValueError(f"Nieznana kwantyzacja: {kind!r} (dostępne: {', '.join(QUANTIZATIONS)})")
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray, block: int = 4096) -> np.ndarray:
+    # blokami, żeby macierz podobieństw N × nlist nie zajęła całej pamięci
+    labels = np.empty(vectors.shape[0], dtype=np.int32)
+    for start in range(0, vectors.shape[0], block):
+        chunk = np.asarray(vectors[start : start + block], dtype=np.float32)
+        labels[start : start + block] = np.argmax(chunk @ centroids.T, axis=1)
+    return labels
+
+
+def _train_centroids(
+    vectors: np.ndarray, nlist: int, iterations: int, rng: np.random.Generator
+) -> np.ndarray:
+    """
+    Sferyczne k-means (podobieństwo kosinusowe) na próbce ~64 wektorów na listę.
+    """
+    sample_size = min(vectors.shape[0], nlist * 64)
+    rows = np.sort(rng.choice(vectors.shape[0], sample_size, replace=False))
+    sample = np.asarray(vectors[rows], dtype=np.float32)
+    centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+    for _ in range(iterations):
+        labels = _assign(sample, centroids)
+        order = np.argsort(labels, kind="stable")
+        counts = np.bincount(labels, minlength=nlist)
+        present = np.flatnonzero(counts)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[present]
+        centroids[present] = np.add.reduceat(sample[order], starts, axis=0)
+        empty = np.flatnonzero(counts == 0)
+        if empty.size:
+            # puste listy dostają losowy punkt z próbki
+            centroids[empty] = sample[rng.choice(sample_size, empty.size, replace=False)]
+        centroids = normalize_rows(centroids)
+    return centroids
+
+
+def default_nlist(count: int) -> int:
+    return max(1, min(count, int(round(4 * np.sqrt(count)))))
+
+
+class IVFIndex:
+    """
+    Przybliżony indeks IVF: wektory pogrupowane k-means wokół `nlist` centroidów,
+    każda lista trzymana w ciągłym bloku skwantyzowanych kodów (int8/float16).
+    Zapytanie ocenia tylko `nprobe` najbliższych list, a `rerank`-krotność
+    limitu najlepszych kandydatów przelicza dokładnie na pełnych wektorach
+    (jeśli są dostępne, np. zmapowane z dysku). Interfejs jak `EmbeddingIndex`.
+    """
+
+    def __init__(
+        self,
+        centroids: np.ndarray,
+        offsets: np.ndarray,
+        ids: np.ndarray,
+        codes: np.ndarray,
+        scales: np.ndarray,
+        full: Optional[np.ndarray] = None,
+        nprobe: int = 8,
+        rerank: int = 4,
+    ) -> None:
+        self._centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self._offsets = np.asarray(offsets, dtype=np.int64)
+        self._ids = np.asarray(ids, dtype=np.int32)
+        self._codes = codes
+        self._scales = scales if scales.size else None
+        self._full = full
+        self.nprobe = max(1, nprobe)
+        self.rerank = max(0, rerank)
+
+    @classmethod
+    def build(
+        cls,
+        vectors: np.ndarray,
+        nlist: int = 0,
+        quantization: str = "int8",
+        iterations: int = 10,
+        seed: int = 0,
+        **kwargs: Any,
+    ) -> "IVFIndex":
+        """
+        Buduje indeks z już znormalizowanych wektorów (np. macierzy z ingestion).
+        nlist=0 dobiera liczbę list automatycznie (~4·√N).
+        """
+        if vectors.ndim != 2 or vectors.shape[0] == 0:
+            raise ValueError("Indeks IVF wymaga niepustej macierzy wektorów")
+        count = vectors.shape[0]
+        nlist = min(count, nlist) if nlist > 0 else default_nlist(count)
+        rng = np.random.default_rng(seed)
+        centroids = _train_centroids(vectors, nlist, iterations, rng)
+        labels = _assign(vectors, centroids)
+        ids = np.argsort(labels, kind="stable").astype(np.int32)
+        offsets = np.concatenate(([0], np.cumsum(np.bincount(labels, minlength=nlist))))
+        codes, scales = quantize_rows(np.asarray(vectors[ids], dtype=np.float32), quantization)
+        return cls(centroids, offsets, ids, codes, scales, **kwargs)
+
+    def save(self, path: Union[str, Path]) -> None:
+        path = Path(path)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with tmp_path.open("wb") as handle:
+            np.savez(
+                handle,
+                centroids=self._centroids,
+                offsets=self._offsets,
+                ids=self._ids,
+                codes=self._codes,
+                scales=self._scales if self._scales is not None else np.zeros(0, np.float32),
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Union[str, Path], **kwargs: Any) -> "IVFIndex":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                data["centroids"],
+                data["offsets"],
+                data["ids"],
+                data["codes"],
+                data["scales"],
+                **kwargs,
+            )
+
+    def __len__(self) -> int:
+        return int(self._ids.shape[0])
+
+    @property
+    def dim(self) -> int:
+        return int(self._centroids.shape[1])
+
+    @property
+    def nlist(self) -> int:
+        return int(self._centroids.shape[0])
+
+    @property
+    def quantization(self) -> str:
+        return "int8" if self._scales is not None else str(self._codes.dtype)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Pamięć zajmowana przez indeks (bez pełnych wektorów do rerankingu,
+        które zwykle są mapowane z dysku).
+        """
+        arrays = (self._centroids, self._offsets, self._ids, self._codes, self._scales)
+        return sum(int(a.nbytes) for a in arrays if a is not None)
+
+    def _candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        nprobe = min(self.nlist, nprobe)
+        centroid_scores = self._centroids @ query
+        if nprobe < self.nlist:
+            probes = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        else:
+            probes = np.arange(self.nlist)
+        return np.concatenate(
+            [np.arange(self._offsets[c], self._offsets[c + 1]) for c in probes]
+        )
+
+    def _search_one(self, query: np.ndarray, limit: int, nprobe: int) -> List[Tuple[int, float]]:
+        positions = self._candidates(query, nprobe)
+        if positions.size == 0:
+            return []
+        scores = self._codes[positions].astype(np.float32) @ query
+        if self._scales is not None:
+            scores *= self._scales[positions]
+
+        if self._full is None or not self.rerank:
+            return [(int(self._ids[positions[i]]), score) for i, score in top_k(scores, limit)]
+
+        shortlist = [i for i, _ in top_k(scores, limit * self.rerank)]
+        rows = np.sort(self._ids[positions[shortlist]])
+        exact = np.asarray(self._full[rows], dtype=np.float32) @ query
+        return [(int(rows[i]), score) for i, score in top_k(exact, limit)]
+
+    def search(
+        self, query_vec: Sequence[float], limit: int, nprobe: Optional[int] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        Zwraca listę (indeks wiersza, podobieństwo kosinusowe) malejąco po wyniku.
+        """
+        if not len(self) or limit <= 0:
+            return []
+        query = normalize_rows(np.asarray(query_vec, dtype=np.float32))[0]
+        if query.shape[0] != self.dim:
+            return []
+        return self._search_one(query, limit, nprobe or self.nprobe)
+
+    def search_batch(
+        self,
+        query_matrix: Sequence[Sequence[float]],
+        limit: int,
+        nprobe: Optional[int] = None,
+    ) -> List[List[Tuple[int, float]]]:
+        queries = np.asarray(query_matrix, dtype=np.float32)
+        if queries.size == 0:
+            return []
+        queries = normalize_rows(queries)
+        if not len(self) or limit <= 0 or queries.shape[1] != self.dim:
+            return [[] for _ in range(queries.shape[0])]
+        return [self._search_one(query, limit, nprobe or self.nprobe) for query in queries]
@@ -0,0 +1,74 @@
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from app.config import BATCH_CONCURRENCY
+from app.services.batch import RENDER_MODES, generate_batch
+from app.services.pdf_generator import pdf_render_service
+from app.services.rag_client import load_index
+
+
+def _read_records(source: str) -> List[Dict[str, Any]]:
+    """
+    Wczytuje rekordy CVInput z pliku (lub stdin dla "-"): lista JSON albo JSONL.
+    """
+    text = sys.stdin.read() if source == "-" else Path(source).read_text(encoding="utf-8")
+    stripped = text.lstrip()
+    if stripped.startswith("["):
+        return json.loads(stripped)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+async def _run(args: argparse.Namespace) -> int:
+    records = _read_records(args.input)
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    out_dir = Path(args.out_dir) if args.out_dir else None
+    failed = 0
+    start = time.perf_counter()
+    try:
+        async for result in generate_batch(records, args.concurrency, args.render, out_dir):
+            if result["status"] != "ok":
+                failed += 1
+            output.write(json.dumps(result, ensure_ascii=False) + "\n")
+            output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        pdf_render_service.shutdown()
+    elapsed = time.perf_counter() - start
+    print(
+        f"Batch finished: {len(records)} records, {failed} failed, {elapsed:.1f}s",
+        file=sys.stderr,
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Wsadowe generowanie CV z pliku JSON/JSONL.")
+    parser.add_argument("input", help="plik z rekordami CVInput (lista JSON lub JSONL), '-' = stdin")
+    parser.add_argument("--output", "-o", help="plik wynikowy JSONL (domyślnie stdout)")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=BATCH_CONCURRENCY,
+        help="liczba CV generowanych równolegle",
+    )
+    parser.add_argument(
+        "--render",
+        choices=sorted(RENDER_MODES),
+        default="none",
+        help="czy renderować gotowe CV do HTML/PDF",
+    )
+    parser.add_argument(
+        "--out-dir",
+        help="katalog na wyrenderowane pliki (domyślnie HTML/PDF trafia do wyniku JSONL)",
+    )
+    args = parser.parse_args()
+
+    # Indeks RAG ładujemy raz, zanim ruszą równoległe zadania.
+    load_index()
+    sys.exit(asyncio.run(_run(args)))
@@ -0,0 +1,159 @@
+"""
+Wspólne narzędzia benchmarków: statystyki opóźnień, zapis wyników do JSON,
+przykładowe dane CV i uruchamianie serwerów pomocniczych w podprocesach.
+"""
+
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import httpx
+import numpy as np
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+
+def latency_stats(latencies: Sequence[float]) -> Dict[str, float]:
+    """
+    Statystyki opóźnień w milisekundach (wejście w sekundach).
+    """
+    if not latencies:
+        return {"count": 0}
+    values = np.asarray(latencies, dtype=np.float64) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "count": int(values.size),
+        "mean_ms": round(float(values.mean()), 3),
+        "min_ms": round(float(values.min()), 3),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "max_ms": round(float(values.max()), 3),
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_results(kind: str, config: Dict[str, Any], results: Dict[str, Any], output: Optional[str] = None) -> Path:
+    """
+    Zapisuje wyniki z metadanymi (commit, środowisko, konfiguracja) do
+    benchmarks/results/<kind>-<znacznik czasu>.json albo do `output`.
+    """
+    now = datetime.now(timezone.utc)
+    payload = {
+        "kind": kind,
+        "timestamp": now.isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": config,
+        "results": results,
+    }
+    if output:
+        path = Path(output)
+    else:
+        RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        path = RESULTS_DIR / f"{kind}-{now.strftime('%Y%m%dT%H%M%SZ')}.json"
+    path.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+    return path
+
+
+def sample_cv_payload(i: int = 0, experiences: int = 2) -> Dict[str, Any]:
+    """
+    Przykładowy rekord CVInput; `i` różnicuje treść (żeby nie trafiać w cache).
+    """
+    return {
+        "full_name": f"Jan Kowalski {i}",
+        "email": f"jan{i}@example.com",
+        "phone": "+48 600 000 000",
+        "profile_type": "experienced",
+        "cv_variant": "variant_a" if i % 2 == 0 else "variant_b",
+        "target_role": f"Solution Architect {i}",
+        "skills": ["Python", "AWS", "Kubernetes", "PostgreSQL"],
+        "education": [
+            {"school": "Politechnika Warszawska", "degree": "mgr inż. informatyki", "start_year": 2008, "end_year": 2013}
+        ],
+        "experience": [
+            {
+                "role": f"Senior Developer {n}",
+                "company": f"Firma {i}-{n}",
+                "start_year": 2014 + n,
+                "end_year": 2016 + n,
+                "description_raw": "Rozwój systemów płatności, migracja do chmury, mentoring zespołu.",
+            }
+            for n in range(experiences)
+        ],
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class ServerProcess:
+    """
+    Serwer HTTP w podprocesie (uvicorn albo skrypt) – czeka, aż `ready_path`
+    odpowie 200, i sprząta po sobie przy wyjściu z bloku `with`.
+    """
+
+    def __init__(
+        self,
+        args: List[str],
+        port: int,
+        ready_path: str = "/",
+        env: Optional[Dict[str, str]] = None,
+        timeout: float = 120.0,
+    ) -> None:
+        self.args = args
+        self.url = f"http://127.0.0.1:{port}"
+        self.ready_path = ready_path
+        self.env = {**os.environ, **(env or {})}
+        self.timeout = timeout
+        self._process: Optional[subprocess.Popen] = None
+
+    def __enter__(self) -> "ServerProcess":
+        self._process = subprocess.Popen(
+            [sys.executable, *self.args], cwd=BASE_DIR, env=self.env
+        )
+        deadline = time.monotonic() + self.timeout
+        while time.monotonic() < deadline:
+            if self._process.poll() is not None:
+                raise RuntimeError(f"Serwer {self.args} zakończył się kodem {self._process.returncode}")
+            try:
+                if httpx.get(self.url + self.ready_path, timeout=1.0).status_code == 200:
+                    return self
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.2)
+        self.__exit__()
+        raise TimeoutError(f"Serwer {self.args} nie wystartował w {self.timeout}s")
+
+    def __exit__(self, *exc: Any) -> None:
+        if self._process is not None and self._process.poll() is None:
+            self._process.terminate()
+            try:
+                self._process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
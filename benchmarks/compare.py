@@ -0,0 +1,44 @@
+"""
+Porównuje dwa pliki wyników (micro lub load) i wypisuje zmiany p50/p95/p99.
+
+    python -m benchmarks.compare benchmarks/results/load-A.json benchmarks/results/load-B.json
+"""
+
+import argparse
+import json
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+METRICS = ("p50_ms", "p95_ms", "p99_ms")
+
+
+def _latency(entry: Dict[str, Any]) -> Dict[str, Any]:
+    # wyniki load trzymają statystyki w "latency", micro – bezpośrednio
+    return entry.get("latency", entry)
+
+
+def _delta(before: Optional[float], after: Optional[float]) -> str:
+    if before is None or after is None:
+        return "n/a"
+    if before == 0:
+        return f"{after:.3f}"
+    return f"{after:.3f} ({(after - before) / before * 100:+.1f}%)"
+
+
+def main(baseline: Path, candidate: Path) -> None:
+    before = json.loads(baseline.read_text(encoding="utf-8"))
+    after = json.loads(candidate.read_text(encoding="utf-8"))
+    print(f"{before.get('git_commit')} → {after.get('git_commit')}")
+    for name in sorted(set(before["results"]) | set(after["results"])):
+        old = _latency(before["results"].get(name, {}))
+        new = _latency(after["results"].get(name, {}))
+        parts = [f"{metric}={_delta(old.get(metric), new.get(metric))}" for metric in METRICS]
+        print(f"{name:32s} " + "  ".join(parts))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Porównanie dwóch wyników benchmarków.")
+    parser.add_argument("baseline", type=Path)
+    parser.add_argument("candidate", type=Path)
+    args = parser.parse_args()
+    main(args.baseline, args.candidate)
@@ -0,0 +1,187 @@
+"""
+Lokalny zamiennik API OpenAI do benchmarków: /v1/chat/completions (również
+strumieniowo, także ze strukturalną odpowiedzią `response_format=json_schema`)
+i /v1/embeddings z konfigurowalnym opóźnieniem. Embeddingi są deterministyczne
+(ziarno = hash tekstu), więc wyniki RAG są powtarzalne.
+
+    python -m benchmarks.fake_openai --port 8900 --chat-latency 0.5 --embed-latency 0.05
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+from hashlib import sha256
+from typing import Any, Dict, List
+
+import numpy as np
+from fastapi import Body, FastAPI
+from fastapi.responses import StreamingResponse
+
+CHAT_LATENCY = float(os.getenv("FAKE_CHAT_LATENCY", "0.3"))
+EMBED_LATENCY = float(os.getenv("FAKE_EMBED_LATENCY", "0.05"))
+STREAM_CHUNK_DELAY = float(os.getenv("FAKE_STREAM_CHUNK_DELAY", "0.01"))
+EMBED_DIM = int(os.getenv("FAKE_EMBED_DIM", "1536"))
+
+ANSWER = (
+    "- Zaprojektowałem architekturę usług obsługujących 2 mln żądań dziennie\n"
+    "- Skróciłem czas wdrożeń z 2 dni do 2 godzin dzięki automatyzacji CI/CD\n"
+    "- Prowadziłem zespół 5 inżynierów i mentorowałem 2 juniorów\n"
+    "- Wprowadziłem monitoring, który obniżył liczbę incydentów o 40%"
+)
+
+app = FastAPI()
+
+
+def _count_tokens(text: str) -> int:
+    # przybliżenie wystarczające do benchmarków (~4 znaki na token)
+    return max(1, len(text) // 4)
+
+
+def _embedding(text: str) -> List[float]:
+    seed = int.from_bytes(sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(EMBED_DIM).astype(np.float32)
+    vector /= np.linalg.norm(vector)
+    return vector.tolist()
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+
+@app.post("/v1/embeddings")
+async def embeddings(data: Dict[str, Any] = Body(...)):
+    inputs = data["input"]
+    if isinstance(inputs, str):
+        inputs = [inputs]
+    await asyncio.sleep(EMBED_LATENCY)
+    return {
+        "object": "list",
+        "model": data.get("model", "fake-embedding"),
+        "data": [
+            {"object": "embedding", "index": i, "embedding": _embedding(text)}
+            for i, text in enumerate(inputs)
+        ],
+        "usage": {
+            "prompt_tokens": sum(_count_tokens(t) for t in inputs),
+            "total_tokens": sum(_count_tokens(t) for t in inputs),
+        },
+    }
+
+
+def _schema_instance(schema: Dict[str, Any], position: int = 0) -> Any:
+    """
+    Minimalna wartość zgodna ze schematem JSON (liczba elementów tablic z minItems,
+    pola "index" numerowane pozycją w tablicy).
+    """
+    kind = schema.get("type")
+    if kind == "object":
+        return {
+            name: position if name == "index" else _schema_instance(prop, position)
+            for name, prop in schema.get("properties", {}).items()
+        }
+    if kind == "array":
+        count = schema.get("minItems", 3)
+        return [_schema_instance(schema["items"], i) for i in range(count)]
+    if kind in ("integer", "number"):
+        return position
+    if kind == "boolean":
+        return True
+    return ANSWER.split("\n")[position % 4].lstrip("- ")
+
+
+def _chunk(completion_id: str, model: str, delta: Dict[str, Any], finish: Any = None) -> str:
+    payload = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+    }
+    return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+def _usage_chunk(completion_id: str, model: str, prompt_tokens: int) -> str:
+    completion_tokens = _count_tokens(ANSWER)
+    payload = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+    return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(data: Dict[str, Any] = Body(...)):
+    model = data.get("model", "fake-chat")
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    prompt_tokens = sum(_count_tokens(str(m.get("content", ""))) for m in data["messages"])
+
+    if data.get("stream"):
+
+        async def events():
+            await asyncio.sleep(CHAT_LATENCY)
+            yield _chunk(completion_id, model, {"role": "assistant", "content": ""})
+            for word in ANSWER.split(" "):
+                await asyncio.sleep(STREAM_CHUNK_DELAY)
+                yield _chunk(completion_id, model, {"content": word + " "})
+            yield _chunk(completion_id, model, {}, finish="stop")
+            if (data.get("stream_options") or {}).get("include_usage"):
+                yield _usage_chunk(completion_id, model, prompt_tokens)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    content = ANSWER
+    response_format = data.get("response_format") or {}
+    if response_format.get("type") == "json_schema":
+        content = json.dumps(
+            _schema_instance(response_format["json_schema"]["schema"]), ensure_ascii=False
+        )
+
+    await asyncio.sleep(CHAT_LATENCY)
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": _count_tokens(content),
+            "total_tokens": prompt_tokens + _count_tokens(content),
+        },
+    }
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Lokalny zamiennik API OpenAI do benchmarków.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--chat-latency", type=float, default=CHAT_LATENCY)
+    parser.add_argument("--embed-latency", type=float, default=EMBED_LATENCY)
+    parser.add_argument("--stream-chunk-delay", type=float, default=STREAM_CHUNK_DELAY)
+    args = parser.parse_args()
+
+    CHAT_LATENCY = args.chat_latency
+    EMBED_LATENCY = args.embed_latency
+    STREAM_CHUNK_DELAY = args.stream_chunk_delay
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
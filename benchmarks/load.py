@@ -0,0 +1,226 @@
+"""
+Scenariusze obciążeniowe dla działającej aplikacji: /generate-cv,
+/api/assistant/chat i /generate-pdf. Domyślnie uruchamia lokalny zamiennik
+API OpenAI oraz aplikację (uvicorn) na kopii bazy wiedzy, żeby nie nadpisać
+prawdziwego indeksu; raportuje przepustowość i p50/p95/p99.
+
+    python -m benchmarks.load --requests 200 --concurrency 20 --chat-latency 0.5
+    python -m benchmarks.load --app-url http://127.0.0.1:8000 --scenarios pdf
+"""
+
+import argparse
+import asyncio
+import shutil
+import tempfile
+import time
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List
+
+import httpx
+
+from benchmarks.common import (
+    BASE_DIR,
+    ServerProcess,
+    free_port,
+    latency_stats,
+    sample_cv_payload,
+    save_results,
+)
+
+Request = Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]]
+
+
+def _generate_cv_form(i: int, unique: bool) -> Dict[str, Any]:
+    cv = sample_cv_payload(i if unique else 0, experiences=1)
+    exp = cv["experience"][0]
+    edu = cv["education"][0]
+    return {
+        "full_name": cv["full_name"],
+        "email": cv["email"],
+        "phone": cv["phone"],
+        "target_role": cv["target_role"],
+        "profile_type": cv["profile_type"],
+        "cv_variant": cv["cv_variant"],
+        "skills": ", ".join(cv["skills"]),
+        "exp_role": exp["role"],
+        "exp_company": exp["company"],
+        "exp_start_year": exp["start_year"],
+        "exp_end_year": exp["end_year"],
+        "exp_description_raw": exp["description_raw"],
+        "edu_school": edu["school"],
+        "edu_degree": edu["degree"],
+        "edu_start_year": edu["start_year"],
+        "edu_end_year": edu["end_year"],
+    }
+
+
+def _pdf_html(i: int, unique: bool) -> str:
+    rows = "".join(
+        f"<li>Osiągnięcie {n}: wdrożenie systemu płatności w chmurze.</li>" for n in range(40)
+    )
+    marker = i if unique else 0
+    return (
+        "<!DOCTYPE html><html><head><meta charset='UTF-8'><title>CV</title></head>"
+        f"<body><h1>Jan Kowalski {marker}</h1><ul>{rows}</ul></body></html>"
+    )
+
+
+def scenarios(unique: bool) -> Dict[str, Request]:
+    async def generate_cv(client: httpx.AsyncClient, i: int) -> httpx.Response:
+        return await client.post("/generate-cv", data=_generate_cv_form(i, unique))
+
+    async def chat(client: httpx.AsyncClient, i: int) -> httpx.Response:
+        message = f"Jak opisać doświadczenie w CV? ({i if unique else 0})"
+        return await client.post(
+            "/api/assistant/chat",
+            json={"messages": [{"role": "user", "content": message}]},
+        )
+
+    async def pdf(client: httpx.AsyncClient, i: int) -> httpx.Response:
+        return await client.post("/generate-pdf", data={"html": _pdf_html(i, unique)})
+
+    return {"generate-cv": generate_cv, "chat": chat, "pdf": pdf}
+
+
+async def run_scenario(
+    base_url: str, request: Request, total: int, concurrency: int, timeout: float
+) -> Dict[str, Any]:
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+
+        async def one(i: int) -> None:
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    response = await request(client, i)
+                    await response.aread()
+                except httpx.HTTPError as exc:
+                    errors += 1
+                    statuses[type(exc).__name__] = statuses.get(type(exc).__name__, 0) + 1
+                    return
+                elapsed = time.perf_counter() - start
+                statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+                if response.status_code < 400:
+                    latencies.append(elapsed)
+                else:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        duration = time.perf_counter() - start
+
+    return {
+        "requests": total,
+        "concurrency": concurrency,
+        "errors": errors,
+        "statuses": statuses,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(len(latencies) / duration, 2) if duration else 0.0,
+        "latency": latency_stats(latencies),
+    }
+
+
+def _app_env(fake_url: str, knowledge_dir: Path, args: argparse.Namespace) -> Dict[str, str]:
+    return {
+        "OPENAI_API_KEY": "benchmark",
+        "OPENAI_BASE_URL": f"{fake_url}/v1",
+        "KNOWLEDGE_DIR": str(knowledge_dir),
+        "RAG_LOAD_MODE": "eager",
+        "EMBED_CACHE_PATH": "",
+        "COMPLETION_CACHE_BACKEND": "memory" if args.cache else "none",
+        "PDF_CACHE_DIR": str(knowledge_dir / "pdf-cache") if args.cache else "",
+        # zamiennik API nie ma limitów – mierzymy aplikację, nie kolejkę wywołań
+        "LLM_REQUESTS_PER_MINUTE": "0",
+        "LLM_TOKENS_PER_MINUTE": "0",
+        "EMBED_REQUESTS_PER_MINUTE": "0",
+        "EMBED_TOKENS_PER_MINUTE": "0",
+        "LLM_MAX_CONCURRENCY": "0",
+    }
+
+
+def main(args: argparse.Namespace) -> None:
+    selected = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    available = scenarios(unique=not args.cache)
+    unknown = set(selected) - set(available)
+    if unknown:
+        raise SystemExit(f"Nieznane scenariusze: {', '.join(sorted(unknown))}")
+
+    with ExitStack() as stack:
+        base_url = args.app_url
+        if not base_url:
+            fake_port, app_port = free_port(), free_port()
+            fake = stack.enter_context(
+                ServerProcess(
+                    [
+                        "-m", "benchmarks.fake_openai",
+                        "--port", str(fake_port),
+                        "--chat-latency", str(args.chat_latency),
+                        "--embed-latency", str(args.embed_latency),
+                    ],
+                    fake_port,
+                    ready_path="/health",
+                )
+            )
+            knowledge_dir = Path(stack.enter_context(tempfile.TemporaryDirectory()))
+            for pdf in (BASE_DIR / "knowledge_base").glob("*.pdf"):
+                shutil.copy2(pdf, knowledge_dir / pdf.name)
+            app = stack.enter_context(
+                ServerProcess(
+                    [
+                        "-m", "uvicorn", "app.main:app",
+                        "--port", str(app_port),
+                        "--workers", str(args.workers),
+                        "--log-level", "warning",
+                    ],
+                    app_port,
+                    ready_path="/health/ready",
+                    env=_app_env(fake.url, knowledge_dir, args),
+                    timeout=300,
+                )
+            )
+            base_url = app.url
+
+        results: Dict[str, Any] = {}
+        for name in selected:
+            asyncio.run(
+                run_scenario(base_url, available[name], args.warmup, args.concurrency, args.timeout)
+            )
+            results[name] = asyncio.run(
+                run_scenario(base_url, available[name], args.requests, args.concurrency, args.timeout)
+            )
+            latency = results[name]["latency"]
+            print(
+                f"{name:12s} {results[name]['throughput_rps']:>8.2f} req/s  "
+                f"p50={latency.get('p50_ms', 0):>9.1f} ms  p95={latency.get('p95_ms', 0):>9.1f} ms  "
+                f"p99={latency.get('p99_ms', 0):>9.1f} ms  errors={results[name]['errors']}"
+            )
+
+    path = save_results("load", vars(args), results, args.output)
+    print(f"Wyniki zapisane w {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark obciążeniowy CV Creatora.")
+    parser.add_argument("--scenarios", default="generate-cv,chat,pdf")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--chat-latency", type=float, default=0.3)
+    parser.add_argument("--embed-latency", type=float, default=0.05)
+    parser.add_argument("--workers", type=int, default=1, help="liczba workerów uvicorna aplikacji")
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="powtarzalne żądania z włączonymi cache (domyślnie unikalne, cache wyłączone)",
+    )
+    parser.add_argument("--app-url", help="testuj już działającą aplikację zamiast uruchamiać własną")
+    parser.add_argument("--output", help="plik wynikowy JSON (domyślnie benchmarks/results/)")
+    main(parser.parse_args())
@@ -0,0 +1,224 @@
+"""
+Mikrobenchmarki gorących ścieżek: dzielenie tekstu na chunki, wyszukiwanie
+RAG (z lokalnym zamiennikiem API embeddingów), renderowanie szablonu CV
+i konwersja HTML → PDF.
+
+    python -m benchmarks.micro --iterations 200 --rag-chunks 5000
+    python -m benchmarks.micro --ann-chunks 100000   # + pełne skanowanie vs IVF
+"""
+
+import argparse
+import os
+import time
+from typing import Any, Callable, Dict
+
+from benchmarks.common import (
+    BASE_DIR,
+    ServerProcess,
+    free_port,
+    latency_stats,
+    sample_cv_payload,
+    save_results,
+)
+
+
+def measure(fn: Callable[[int], Any], iterations: int, warmup: int) -> Dict[str, float]:
+    for i in range(warmup):
+        fn(i)
+    latencies = []
+    start = time.perf_counter()
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        fn(warmup + i)
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - start
+    return {**latency_stats(latencies), "ops_per_s": round(iterations / elapsed, 2)}
+
+
+def _sample_text() -> str:
+    from ingest_knowledge import _extract_text_from_pdf
+
+    pdfs = sorted((BASE_DIR / "knowledge_base").glob("*.pdf"))
+    if pdfs:
+        return _extract_text_from_pdf(pdfs[0])[0]
+    return "Przykładowy tekst poradnika o pisaniu CV. " * 2000
+
+
+def _setup_rag_index(chunks: int, dim: int) -> None:
+    import numpy as np
+
+    from app.services import rag_client
+    from app.services.lexical_index import BM25Index
+    from app.services.vector_index import EmbeddingIndex
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((chunks, dim), dtype=np.float32)
+    rag_client._INDEX = EmbeddingIndex(vectors)
+    words = _sample_text().split()
+    rag_client._CHUNKS = [
+        {
+            "source": "bench",
+            "chunk_id": i,
+            "content": " ".join(words[(i * 40) % len(words) :][:120]),
+        }
+        for i in range(chunks)
+    ]
+    rag_client._LEXICAL = BM25Index.build([str(c["content"]) for c in rag_client._CHUNKS])
+    rag_client._load_state.update(status="ready", error=None)
+
+
+def _ivf_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Pełne skanowanie vs indeks IVF na syntetycznych wektorach z klastrami
+    (losowy szum bez struktury to najgorszy przypadek dla IVF, niepodobny do embeddingów).
+    """
+    import numpy as np
+
+    from app.services.vector_index import EmbeddingIndex, IVFIndex, normalize_rows
+
+    rng = np.random.default_rng(0)
+    count, dim = args.ann_chunks, args.embed_dim
+    centers = rng.standard_normal((max(1, count // 50), dim), dtype=np.float32)
+    noise = rng.standard_normal((count, dim), dtype=np.float32)
+    vectors = normalize_rows(centers[rng.integers(0, centers.shape[0], count)] + 0.6 * noise)
+    queries = normalize_rows(
+        vectors[rng.choice(count, 100)] + 0.02 * rng.standard_normal((100, dim), dtype=np.float32)
+    )
+
+    exact = EmbeddingIndex(vectors, normalized=True)
+    start = time.perf_counter()
+    ivf = IVFIndex.build(
+        vectors,
+        quantization=args.ann_quantization,
+        full=vectors,
+        nprobe=args.ann_nprobe,
+        rerank=args.ann_rerank,
+    )
+    build_seconds = time.perf_counter() - start
+
+    expected = [{i for i, _ in exact.search(q, 5)} for q in queries]
+    found = [{i for i, _ in ivf.search(q, 5)} for q in queries]
+    recall = sum(len(e & f) for e, f in zip(expected, found)) / (5 * len(queries))
+
+    n = len(queries)
+    return {
+        "rag_search_exact": {
+            "chunks": count,
+            "bytes_per_chunk": round(vectors.nbytes / count, 1),
+            **measure(lambda i: exact.search(queries[i % n], 5), args.iterations, args.warmup),
+        },
+        "rag_search_ivf": {
+            "chunks": count,
+            "nlist": ivf.nlist,
+            "quantization": ivf.quantization,
+            "build_s": round(build_seconds, 2),
+            "recall_at_5": round(recall, 4),
+            "bytes_per_chunk": round(ivf.nbytes / count, 1),
+            **measure(lambda i: ivf.search(queries[i % n], 5), args.iterations, args.warmup),
+        },
+    }
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    from ingest_knowledge import CHUNK_OVERLAP, CHUNK_SIZE, _chunk_text
+
+    from app.models import CVInput
+    from app.services.cv_engine import _resolve_sections_order
+    from app.services.pdf_generator import html_to_pdf_bytes
+    from app.services.rag_client import _top_chunks, get_rag_context_for_cv
+    from app.services.rendering import render_cv_html
+
+    results: Dict[str, Any] = {}
+
+    text = _sample_text()
+    results["chunk_text"] = {
+        "chars": len(text),
+        **measure(lambda i: _chunk_text(text, CHUNK_SIZE, CHUNK_OVERLAP), args.iterations, args.warmup),
+    }
+
+    _setup_rag_index(args.rag_chunks, args.embed_dim)
+    query_vec = [1.0] * args.embed_dim
+    results["rag_search"] = {
+        "chunks": args.rag_chunks,
+        **measure(
+            lambda i: _top_chunks("", query_vec, 3, "embedding"), args.iterations, args.warmup
+        ),
+    }
+    results["rag_search_lexical"] = {
+        "chunks": args.rag_chunks,
+        **measure(
+            lambda i: get_rag_context_for_cv(f"podsumowanie zawodowe {i}", mode="lexical"),
+            args.iterations,
+            args.warmup,
+        ),
+    }
+    if args.ann_chunks:
+        results.update(_ivf_benchmark(args))
+    results["get_rag_context_for_cv_warm"] = measure(
+        lambda i: get_rag_context_for_cv("Solution Architect podsumowanie zawodowe"),
+        args.iterations,
+        args.warmup,
+    )
+    results["get_rag_context_for_cv_cold"] = measure(
+        lambda i: get_rag_context_for_cv(f"Solution Architect podsumowanie {i}"),
+        args.iterations,
+        args.warmup,
+    )
+
+    cv_input = CVInput.model_validate(sample_cv_payload(0, experiences=4))
+    context = {
+        **cv_input.model_dump(),
+        "summary": "Doświadczony architekt rozwiązań chmurowych. " * 4,
+        "experience_sections": [
+            {"item": exp, "bullets": ["Zaprojektował i wdrożył system płatności."] * 4}
+            for exp in cv_input.experience
+        ],
+        "education": cv_input.education,
+        "sections_order": _resolve_sections_order(cv_input.profile_type),
+        "profile_type": cv_input.profile_type.value,
+        "cv_variant": cv_input.cv_variant.value,
+    }
+    html = render_cv_html(cv_input, context)
+    results["render_cv_html"] = measure(
+        lambda i: render_cv_html(cv_input, context), args.iterations, args.warmup
+    )
+    results["html_to_pdf_bytes"] = {
+        "html_bytes": len(html.encode("utf-8")),
+        **measure(lambda i: html_to_pdf_bytes(html), args.pdf_iterations, 2),
+    }
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mikrobenchmarki CV Creatora.")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--pdf-iterations", type=int, default=20)
+    parser.add_argument("--rag-chunks", type=int, default=5000)
+    parser.add_argument("--embed-dim", type=int, default=1536)
+    parser.add_argument("--embed-latency", type=float, default=0.0)
+    parser.add_argument("--ann-chunks", type=int, default=0, help="porównanie z indeksem IVF (0 = pomiń)")
+    parser.add_argument("--ann-quantization", default="int8", choices=("int8", "float16", "float32"))
+    parser.add_argument("--ann-nprobe", type=int, default=8)
+    parser.add_argument("--ann-rerank", type=int, default=4)
+    parser.add_argument("--output", help="plik wynikowy JSON (domyślnie benchmarks/results/)")
+    args = parser.parse_args()
+
+    port = free_port()
+    fake = ServerProcess(
+        ["-m", "benchmarks.fake_openai", "--port", str(port), "--embed-latency", str(args.embed_latency)],
+        port,
+        ready_path="/health",
+        env={"FAKE_EMBED_DIM": str(args.embed_dim)},
+    )
+    with fake:
+        # klienci OpenAI czytają te zmienne przy tworzeniu – przed importem aplikacji
+        os.environ["OPENAI_BASE_URL"] = f"{fake.url}/v1"
+        os.environ["OPENAI_API_KEY"] = "benchmark"
+        os.environ["EMBED_CACHE_PATH"] = ""
+        results = run(args)
+
+    path = save_results("micro", vars(args), results, args.output)
+    for name, stats in results.items():
+        print(f"{name:32s} p50={stats['p50_ms']:>9.3f} ms  p95={stats['p95_ms']:>9.3f} ms  {stats['ops_per_s']:>10.1f} ops/s")
+    print(f"Wyniki zapisane w {path}")
@@ -1,43 +1,111 @@
+import argparse
 import json
+import logging
 import os
-from hashlib import md5
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from hashlib import sha256
 from pathlib import Path
-from typing import Dict, Iterable, List, Sequence
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
 
+import numpy as np
 from openai import OpenAI
 from pypdf import PdfReader
 
 from app.config import ModelConfig, get_model_config
+from app.services.context_assembly import estimate_tokens
+from app.services.lexical_index import BM25Index
+from app.services.llm_scheduler import embedding_scheduler, usage_tokens
+from app.services.openai_clients import get_openai_client
+from app.services.vector_index import IVFIndex, normalize_rows
 
 BASE_DIR = Path(__file__).resolve().parent
-KNOWLEDGE_DIR = BASE_DIR / "knowledge_base"
+# Katalog z PDF-ami i indeksem; nadpisywalny np. przez benchmarki (kopia bazy wiedzy).
+KNOWLEDGE_DIR = Path(os.getenv("KNOWLEDGE_DIR", str(BASE_DIR / "knowledge_base")))
+# Starszy format (JSON z embeddingami) – czytany już tylko przez konwerter.
 OUTPUT_PATH = KNOWLEDGE_DIR / "ingested_chunks.json"
+# Format binarny: macierz float32 (.npy, mapowana do pamięci) + zwarte metadane.
+VECTORS_PATH = KNOWLEDGE_DIR / "ingested_vectors.npy"
+METADATA_PATH = KNOWLEDGE_DIR / "ingested_chunks.meta.json"
 STATE_PATH = KNOWLEDGE_DIR / ".ingest_state.json"
+# Opcjonalny indeks ANN (IVF, skwantyzowane wektory) dla dużych baz wiedzy.
+ANN_INDEX_PATH = KNOWLEDGE_DIR / "ingested_ivf.npz"
+# Indeks leksykalny BM25 – wyszukiwanie bez wywołań API embeddingów.
+LEXICAL_INDEX_PATH = KNOWLEDGE_DIR / "ingested_bm25.npz"
+INDEX_FORMAT_VERSION = 1
+STATE_VERSION = 2
 
 CHUNK_SIZE = 800
 CHUNK_OVERLAP = 200
 EMBED_MODEL = os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small")
 
+# Równoległość ingestion: procesy do ekstrakcji PDF, wątki do batchy embeddingów.
+EXTRACT_WORKERS = int(os.getenv("INGEST_EXTRACT_WORKERS", str(os.cpu_count() or 1)))
+EMBED_BATCH_SIZE = int(os.getenv("INGEST_EMBED_BATCH_SIZE", "256"))
+EMBED_CONCURRENCY = int(os.getenv("INGEST_EMBED_CONCURRENCY", "4"))
+# Budowa indeksu IVF: "auto" (od INGEST_ANN_MIN_CHUNKS fragmentów), "on" albo "off".
+ANN_MODE = os.getenv("INGEST_ANN", "auto").lower()
+ANN_MIN_CHUNKS = int(os.getenv("INGEST_ANN_MIN_CHUNKS", "20000"))
+ANN_NLIST = int(os.getenv("INGEST_ANN_NLIST", "0"))
+ANN_QUANTIZATION = os.getenv("INGEST_ANN_QUANTIZATION", "int8").lower()
 
-def _load_state() -> Dict[str, str]:
+logger = logging.getLogger(__name__)
+
+
+def _load_state() -> Dict[str, Any]:
     if STATE_PATH.exists():
         return json.loads(STATE_PATH.read_text())
     return {}
 
 
-def _save_state(state: Dict[str, str]) -> None:
+def _save_state(state: Dict[str, Any]) -> None:
     STATE_PATH.write_text(json.dumps(state, indent=2, ensure_ascii=False))
 
 
-def _compute_signature(files: Sequence[Path]) -> str:
-    hasher = md5()
-    for path in sorted(files):
-        stat = path.stat()
-        hasher.update(f"{path.name}:{stat.st_mtime_ns}:{stat.st_size}".encode("utf-8"))
+def _state_matches_settings(state: Dict[str, Any]) -> bool:
+    return (
+        state.get("version") == STATE_VERSION
+        and state.get("embed_model") == EMBED_MODEL
+        and state.get("chunk_size") == CHUNK_SIZE
+        and state.get("chunk_overlap") == CHUNK_OVERLAP
+    )
+
+
+def _file_hash(path: Path) -> str:
+    hasher = sha256()
+    with path.open("rb") as handle:
+        for block in iter(lambda: handle.read(1 << 20), b""):
+            hasher.update(block)
     return hasher.hexdigest()
 
 
-def _extract_text_from_pdf(path: Path) -> str:
+def _text_hash(text: str) -> str:
+    return sha256(text.encode("utf-8")).hexdigest()
+
+
+def _file_fingerprint(path: Path, previous: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Zwraca (size, mtime, sha256) pliku. Gdy rozmiar i mtime się nie zmieniły,
+    hash bierzemy ze stanu zamiast ponownie czytać plik.
+    """
+    stat = path.stat()
+    if (
+        previous
+        and previous.get("size") == stat.st_size
+        and previous.get("mtime_ns") == stat.st_mtime_ns
+        and previous.get("sha256")
+    ):
+        content_hash = previous["sha256"]
+    else:
+        content_hash = _file_hash(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": content_hash}
+
+
+def _extract_text_from_pdf(path: Path) -> Tuple[str, int]:
+    """
+    Zwraca tekst PDF-a i liczbę stron. Funkcja modułowa – uruchamiana w puli procesów.
+    """
     reader = PdfReader(str(path))
     pages = []
     for page in reader.pages:
@@ -46,7 +114,7 @@ def _extract_text_from_pdf(path: Path) -> str:
         except Exception:
             text = ""
         pages.append(text)
-    return "\n".join(pages)
+    return "\n".join(pages), len(pages)
 
 
 def _chunk_text(text: str, chunk_size: int, overlap: int) -> List[str]:
@@ -66,64 +134,375 @@ def _chunk_text(text: str, chunk_size: int, overlap: int) -> List[str]:
     return chunks
 
 
-def _batch(iterable: Sequence[str], size: int) -> Iterable[List[str]]:
-    for i in range(0, len(iterable), size):
-        yield list(iterable[i : i + size])
+@dataclass
+class IngestStats:
+    files_processed: int = 0
+    files_unchanged: int = 0
+    pages: int = 0
+    chunks: int = 0
+    chunks_embedded: int = 0
+    tokens_embedded: int = 0
+    extract_seconds: float = 0.0
+    total_seconds: float = 0.0
 
+    def summary(self) -> str:
+        total = self.total_seconds or 1e-9
+        return (
+            f"{self.files_processed} plików przetworzonych ({self.files_unchanged} bez zmian), "
+            f"{self.pages} stron, {self.chunks} fragmentów, "
+            f"{self.chunks_embedded} embeddingów / {self.tokens_embedded} tokenów; "
+            f"{self.total_seconds:.2f}s: {self.pages / total:.1f} stron/s, "
+            f"{self.chunks / total:.1f} fragmentów/s"
+        )
 
-def _embed_chunks(chunks: List[str], client: OpenAI) -> List[List[float]]:
-    if not chunks:
-        return []
 
-    embeddings: List[List[float]] = []
-    for batch in _batch(chunks, 20):
-        response = client.embeddings.create(
-            model=EMBED_MODEL,
-            input=batch,
+def _embed_batch(batch: List[str], client: OpenAI) -> Tuple[List[List[float]], int]:
+    """
+    Embedding jednego batcha przez wspólną kolejkę embeddingów aplikacji
+    (limity zapytań/tokenów i ponowienia z backoffem jak dla zapytań RAG).
+    """
+    response = embedding_scheduler.run_sync(
+        lambda: client.embeddings.create(model=EMBED_MODEL, input=batch),
+        tokens=sum(estimate_tokens(text) for text in batch),
+        usage=usage_tokens,
+    )
+    return [item.embedding for item in response.data], usage_tokens(response) or 0
+
+
+class _EmbeddingPipeline:
+    """
+    Zbiera teksty do embeddingu i wysyła pełne batche równolegle (maks.
+    EMBED_CONCURRENCY naraz), gdy tylko się zapełnią – równolegle z ekstrakcją PDF-ów.
+    """
+
+    def __init__(self, batch_size: int = EMBED_BATCH_SIZE, concurrency: int = EMBED_CONCURRENCY) -> None:
+        self._batch_size = max(1, batch_size)
+        self._pool = ThreadPoolExecutor(max_workers=max(1, concurrency))
+        self._client: Optional[OpenAI] = None
+        self._pending: List[str] = []
+        self._futures: List[Future] = []
+        self.size = 0
+
+    def _get_client(self) -> OpenAI:
+        if self._client is None:
+            model_config: ModelConfig = get_model_config()
+            if not model_config.is_configured:
+                raise RuntimeError(
+                    "Brak OPENAI_API_KEY – nie można obliczyć embeddingów dla knowledge_base."
+                )
+            # współdzielony klient (bez własnych ponowień – robi je embedding_scheduler)
+            self._client = get_openai_client()
+        return self._client
+
+    def add(self, text: str) -> int:
+        position = self.size
+        self.size += 1
+        self._pending.append(text)
+        if len(self._pending) >= self._batch_size:
+            self._flush()
+        return position
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        self._futures.append(self._pool.submit(_embed_batch, batch, self._get_client()))
+
+    def results(self, stats: IngestStats) -> List[List[float]]:
+        try:
+            self._flush()
+            embeddings: List[List[float]] = []
+            for future in self._futures:
+                batch_embeddings, tokens = future.result()
+                embeddings.extend(batch_embeddings)
+                stats.tokens_embedded += tokens
+            stats.chunks_embedded = len(embeddings)
+            return embeddings
+        finally:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _extract_files(paths: Sequence[Path]) -> Iterable[Tuple[Path, str, int]]:
+    """
+    Ekstrakcja tekstu z PDF-ów w puli procesów; wyniki zwracane w kolejności ukończenia.
+    """
+    if EXTRACT_WORKERS <= 1 or len(paths) <= 1:
+        for path in paths:
+            yield (path, *_extract_text_from_pdf(path))
+        return
+
+    with ProcessPoolExecutor(max_workers=min(EXTRACT_WORKERS, len(paths))) as pool:
+        futures = {pool.submit(_extract_text_from_pdf, path): path for path in paths}
+        for future in as_completed(futures):
+            yield (futures[future], *future.result())
+
+
+def _atomic_write_bytes(path: Path, data: bytes) -> None:
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+
+def write_index(chunks: Sequence[Dict[str, object]], embeddings: Sequence[Sequence[float]]) -> Path:
+    """
+    Zapisuje indeks w formacie binarnym: wektory jako znormalizowana macierz
+    float32 (.npy) oraz metadane fragmentów (source, chunk_id, content) jako zwarty JSON.
+    Zwraca ścieżkę do pliku metadanych.
+    """
+    if embeddings:
+        matrix = normalize_rows(np.asarray(embeddings, dtype=np.float32))
+    else:
+        matrix = np.zeros((0, 0), dtype=np.float32)
+
+    tmp_vectors = VECTORS_PATH.with_name(VECTORS_PATH.name + ".tmp")
+    with tmp_vectors.open("wb") as handle:
+        np.save(handle, matrix, allow_pickle=False)
+    os.replace(tmp_vectors, VECTORS_PATH)
+    write_ann_index(matrix)
+    write_lexical_index(chunks)
+
+    metadata = {
+        "version": INDEX_FORMAT_VERSION,
+        "embed_model": EMBED_MODEL,
+        "dim": int(matrix.shape[1]) if matrix.ndim == 2 else 0,
+        "normalized": True,
+        "chunks": [
+            {
+                "source": chunk["source"],
+                "chunk_id": chunk["chunk_id"],
+                "content": chunk["content"],
+            }
+            for chunk in chunks
+        ],
+    }
+    _atomic_write_bytes(
+        METADATA_PATH,
+        json.dumps(metadata, ensure_ascii=False, separators=(",", ":")).encode("utf-8"),
+    )
+    return METADATA_PATH
+
+
+def _ann_enabled(count: int) -> bool:
+    if ANN_MODE == "on":
+        return count > 0
+    return ANN_MODE == "auto" and count >= ANN_MIN_CHUNKS
+
+
+def write_ann_index(matrix: np.ndarray) -> Optional[Path]:
+    """
+    Buduje indeks IVF dla znormalizowanej macierzy wektorów (albo usuwa
+    nieaktualny, gdy indeks ANN jest wyłączony lub baza jest za mała).
+    """
+    count = int(matrix.shape[0]) if matrix.ndim == 2 else 0
+    if not _ann_enabled(count):
+        ANN_INDEX_PATH.unlink(missing_ok=True)
+        return None
+    started = time.perf_counter()
+    index = IVFIndex.build(matrix, nlist=ANN_NLIST, quantization=ANN_QUANTIZATION)
+    index.save(ANN_INDEX_PATH)
+    logger.info(
+        "Indeks IVF: %d wektorów, %d list, %s, %.1f MB w %.1fs",
+        len(index),
+        index.nlist,
+        index.quantization,
+        index.nbytes / 1e6,
+        time.perf_counter() - started,
+    )
+    return ANN_INDEX_PATH
+
+
+def write_lexical_index(chunks: Sequence[Dict[str, object]]) -> Path:
+    """
+    Buduje i zapisuje indeks BM25 nad treścią fragmentów (w kolejności wektorów).
+    """
+    BM25Index.build([str(chunk["content"]) for chunk in chunks]).save(LEXICAL_INDEX_PATH)
+    return LEXICAL_INDEX_PATH
+
+
+def index_exists() -> bool:
+    return VECTORS_PATH.exists() and METADATA_PATH.exists()
+
+
+def read_index(mmap: bool = True) -> Tuple[List[Dict[str, object]], np.ndarray]:
+    """
+    Wczytuje indeks binarny. Przy mmap=True wektory są mapowane do pamięci
+    bez kopiowania (tylko do odczytu) – strony ładują się na żądanie.
+    """
+    metadata = json.loads(METADATA_PATH.read_text(encoding="utf-8"))
+    vectors = np.load(VECTORS_PATH, mmap_mode="r" if mmap else None, allow_pickle=False)
+    chunks = metadata.get("chunks", [])
+    if len(chunks) != vectors.shape[0]:
+        raise ValueError(
+            f"Niespójny indeks: {len(chunks)} metadanych vs {vectors.shape[0]} wektorów"
         )
-        embeddings.extend([item.embedding for item in response.data])
-    return embeddings
+    return chunks, vectors
+
+
+def convert_json_index(json_path: Path = OUTPUT_PATH) -> Path:
+    """
+    Jednorazowa konwersja starego `ingested_chunks.json` do formatu binarnego.
+    """
+    raw_chunks = json.loads(Path(json_path).read_text())
+    embeddings = [chunk["embedding"] for chunk in raw_chunks]
+    return write_index(raw_chunks, embeddings)
+
+
+def _load_existing_index() -> Tuple[List[Dict[str, object]], Optional[np.ndarray]]:
+    """
+    Wczytuje istniejący indeks, o ile powstał dla bieżącego modelu embeddingów –
+    jego wektory można wtedy przenieść do nowego indeksu.
+    """
+    if not index_exists() and OUTPUT_PATH.exists():
+        # indeks z poprzedniej wersji – konwersja bez ponownego liczenia embeddingów
+        convert_json_index(OUTPUT_PATH)
+    if not index_exists():
+        return [], None
+
+    metadata = json.loads(METADATA_PATH.read_text(encoding="utf-8"))
+    if metadata.get("embed_model", EMBED_MODEL) != EMBED_MODEL:
+        return [], None
+    return read_index(mmap=True)
 
 
 def ingest(force: bool = False) -> Path:
+    """
+    Przyrostowa ingestion bazy wiedzy. Przetwarzane są tylko pliki dodane lub
+    zmienione od ostatniego uruchomienia, a embeddingi fragmentów o niezmienionej
+    treści są przenoszone ze starego indeksu. force=True liczy wszystko od nowa.
+    """
+    return run_ingest(force=force)[0]
+
+
+def run_ingest(force: bool = False) -> Tuple[Path, IngestStats]:
+    """
+    Jak `ingest`, ale zwraca też statystyki przepustowości. Ekstrakcja PDF-ów
+    działa w puli procesów, a batche embeddingów są wysyłane równolegle,
+    jak tylko pierwsze pliki zostaną pocięte na fragmenty.
+    """
+    started = time.perf_counter()
+    stats = IngestStats()
     KNOWLEDGE_DIR.mkdir(exist_ok=True)
 
-    kb_files = [p for p in KNOWLEDGE_DIR.glob("*.pdf") if p.is_file()]
-    signature = _compute_signature(kb_files)
+    kb_files = sorted(p for p in KNOWLEDGE_DIR.glob("*.pdf") if p.is_file())
     state = _load_state()
+    previous_files: Dict[str, Dict[str, Any]] = (
+        state.get("files", {}) if _state_matches_settings(state) and not force else {}
+    )
+
+    old_chunks, old_vectors = ([], None) if force else _load_existing_index()
+    by_chunk_id = {str(chunk["chunk_id"]): row for row, chunk in enumerate(old_chunks)}
+    by_text_hash = {
+        _text_hash(str(chunk["content"])): row for row, chunk in enumerate(old_chunks)
+    }
+
+    fingerprints = {
+        path.name: _file_fingerprint(path, previous_files.get(path.name))
+        for path in kb_files
+    }
+    unchanged = {
+        name
+        for name, fingerprint in fingerprints.items()
+        if name in previous_files
+        and previous_files[name].get("sha256") == fingerprint["sha256"]
+        and old_vectors is not None
+        and all(c["chunk_id"] in by_chunk_id for c in previous_files[name].get("chunks", []))
+    }
+    removed = set(previous_files) - set(fingerprints)
 
-    if not force and state.get("signature") == signature and OUTPUT_PATH.exists():
-        return OUTPUT_PATH
+    stats.files_unchanged = len(unchanged)
+    if not force and old_vectors is not None and not removed and len(unchanged) == len(kb_files):
+        stats.chunks = len(old_chunks)
+        # baza bez zmian, ale ustawienia ANN mogły się zmienić od ostatniego zapisu
+        # (a indeks BM25 – jeszcze nie istnieć, jeśli zapisała go starsza wersja)
+        if _ann_enabled(len(old_chunks)) != ANN_INDEX_PATH.exists():
+            write_ann_index(old_vectors)
+        if not LEXICAL_INDEX_PATH.exists():
+            write_lexical_index(old_chunks)
+        stats.total_seconds = time.perf_counter() - started
+        return METADATA_PATH, stats
 
-    model_config: ModelConfig = get_model_config()
-    if not model_config.is_configured:
-        raise RuntimeError(
-            "Brak OPENAI_API_KEY – nie można obliczyć embeddingów dla knowledge_base."
+    # Dla każdego pliku: fragmenty, sloty wektorów i stan. Slot to
+    # ("row", wiersz starego indeksu) albo ("new", pozycja w potoku embeddingów).
+    per_file: Dict[str, Tuple[List[Dict[str, object]], List[Tuple[str, int]], List[Dict[str, str]]]] = {}
+    for name in unchanged:
+        file_chunks = previous_files[name]["chunks"]
+        rows = [by_chunk_id[chunk_state["chunk_id"]] for chunk_state in file_chunks]
+        per_file[name] = (
+            [dict(old_chunks[row]) for row in rows],
+            [("row", row) for row in rows],
+            file_chunks,
         )
 
-    client = OpenAI(api_key=model_config.api_key)
-    all_chunks: List[Dict[str, object]] = []
+    pipeline = _EmbeddingPipeline()
+    to_process = [path for path in kb_files if path.name not in unchanged]
+    extract_started = time.perf_counter()
+    for pdf_path, text, page_count in _extract_files(to_process):
+        stats.files_processed += 1
+        stats.pages += page_count
+        chunks: List[Dict[str, object]] = []
+        slots: List[Tuple[str, int]] = []
+        file_chunks: List[Dict[str, str]] = []
+        for idx, chunk in enumerate(_chunk_text(text, CHUNK_SIZE, CHUNK_OVERLAP)):
+            chunk_id = f"{pdf_path.stem}#{idx}"
+            text_hash = _text_hash(chunk)
+            chunks.append({"source": pdf_path.name, "chunk_id": chunk_id, "content": chunk})
+            if text_hash in by_text_hash:
+                slots.append(("row", by_text_hash[text_hash]))
+            else:
+                slots.append(("new", pipeline.add(chunk)))
+            file_chunks.append({"chunk_id": chunk_id, "text_hash": text_hash})
+        per_file[pdf_path.name] = (chunks, slots, file_chunks)
+    stats.extract_seconds = time.perf_counter() - extract_started
+
+    new_embeddings = pipeline.results(stats)
 
+    all_chunks: List[Dict[str, object]] = []
+    all_embeddings: List[Any] = []
+    files_state: Dict[str, Dict[str, Any]] = {}
     for pdf_path in kb_files:
-        text = _extract_text_from_pdf(pdf_path)
-        chunks = _chunk_text(text, CHUNK_SIZE, CHUNK_OVERLAP)
-        embeddings = _embed_chunks(chunks, client)
-        for idx, (chunk, emb) in enumerate(zip(chunks, embeddings)):
-            all_chunks.append(
-                {
-                    "source": pdf_path.name,
-                    "chunk_id": f"{pdf_path.stem}#{idx}",
-                    "content": chunk,
-                    "embedding": emb,
-                }
-            )
-
-    OUTPUT_PATH.write_text(json.dumps(all_chunks, ensure_ascii=False, indent=2))
-    _save_state({"signature": signature})
-    return OUTPUT_PATH
+        chunks, slots, file_chunks = per_file[pdf_path.name]
+        all_chunks.extend(chunks)
+        all_embeddings.extend(
+            np.array(old_vectors[value]) if kind == "row" else new_embeddings[value]
+            for kind, value in slots
+        )
+        files_state[pdf_path.name] = {**fingerprints[pdf_path.name], "chunks": file_chunks}
+    stats.chunks = len(all_chunks)
+
+    path = write_index(all_chunks, all_embeddings)
+    _save_state(
+        {
+            "version": STATE_VERSION,
+            "embed_model": EMBED_MODEL,
+            "chunk_size": CHUNK_SIZE,
+            "chunk_overlap": CHUNK_OVERLAP,
+            "files": files_state,
+        }
+    )
+    stats.total_seconds = time.perf_counter() - started
+    logger.info("Ingestion: %s (usunięte pliki: %d)", stats.summary(), len(removed))
+    return path, stats
 
 
 if __name__ == "__main__":
-    path = ingest(force=True)
-    print(f"Ingestion finished. Data saved to {path}")
+    parser = argparse.ArgumentParser(description="Ingestion bazy wiedzy (knowledge_base/).")
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="przelicz embeddingi wszystkich plików (domyślnie tylko zmienione)",
+    )
+    parser.add_argument(
+        "--convert",
+        action="store_true",
+        help="skonwertuj istniejący ingested_chunks.json do formatu binarnego i zakończ",
+    )
+    args = parser.parse_args()
+
+    if args.convert:
+        path = convert_json_index(OUTPUT_PATH)
+        print(f"Conversion finished. Data saved to {path} and {VECTORS_PATH}")
+    else:
+        path, stats = run_ingest(force=args.force)
+        print(f"Ingestion finished. Data saved to {path}")
+        print(f"Stats: {stats.summary()}")
 
@@ -0,0 +1,19 @@
+// Przewiń do dołu po załadowaniu strony (jeśli są wiadomości)
+window.addEventListener('DOMContentLoaded', function() {
+    scrollToBottom();
+});
+
+// Przewiń do dołu po wysłaniu formularza
+function scrollToBottom() {
+    setTimeout(function() {
+        var container = document.getElementById('messages-container');
+        if (container) {
+            container.scrollTop = container.scrollHeight;
+        }
+    }, 100);
+}
+
+// Przewiń do dołu po załadowaniu strony
+window.addEventListener('load', function() {
+    scrollToBottom();
+});
@@ -0,0 +1,472 @@
+// Przełączanie zakładek
+function switchTab(tabName, buttonElement) {
+    // Ukryj wszystkie zakładki
+    document.querySelectorAll('.tab-content').forEach(function(tab) {
+        tab.classList.remove('active');
+    });
+    
+    // Usuń aktywną klasę z wszystkich przycisków
+    document.querySelectorAll('.tab').forEach(function(btn) {
+        btn.classList.remove('active');
+    });
+    
+    // Pokaż wybraną zakładkę
+    document.getElementById('tab-' + tabName).classList.add('active');
+    
+    // Aktywuj przycisk
+    if (buttonElement) {
+        buttonElement.classList.add('active');
+    }
+    
+    // Jeśli przełączamy na chat, przewiń do dołu
+    if (tabName === 'chat') {
+        setTimeout(scrollChatToBottom, 100);
+        // Sprawdź czy trzeba wysłać kontekst
+        sendInitialContextIfNeeded();
+    }
+}
+
+// Aktualizacja sidebara z danymi formularza
+function updateSidebar() {
+    var sidebar = document.getElementById('sidebar-content');
+    var html = '';
+    
+    var fullName = document.getElementById('full_name').value;
+    var email = document.getElementById('email').value;
+    var phone = document.getElementById('phone').value;
+    var targetRole = document.getElementById('target_role').value;
+    var skills = document.getElementById('skills').value;
+    var expRole = document.getElementById('exp_role').value;
+    var expCompany = document.getElementById('exp_company').value;
+    var eduSchool = document.getElementById('edu_school').value;
+    var eduDegree = document.getElementById('edu_degree').value;
+    
+    if (fullName || email || phone || targetRole || skills) {
+        if (fullName) {
+            html += '<div class="sidebar-section"><strong>Imię i nazwisko:</strong>' + fullName + '</div>';
+        }
+        if (email) {
+            html += '<div class="sidebar-section"><strong>Email:</strong>' + email + '</div>';
+        }
+        if (phone) {
+            html += '<div class="sidebar-section"><strong>Telefon:</strong>' + phone + '</div>';
+        }
+        if (targetRole) {
+            html += '<div class="sidebar-section"><strong>Docelowa rola:</strong>' + targetRole + '</div>';
+        }
+        if (skills) {
+            html += '<div class="sidebar-section"><strong>Umiejętności:</strong>' + skills.replace(/\n/g, ', ') + '</div>';
+        }
+        if (expRole && expCompany) {
+            html += '<div class="sidebar-section"><strong>Doświadczenie:</strong>' + expRole + '<br><small>' + expCompany + '</small></div>';
+        }
+        if (eduDegree && eduSchool) {
+            html += '<div class="sidebar-section"><strong>Edukacja:</strong>' + eduDegree + '<br><small>' + eduSchool + '</small></div>';
+        }
+    } else {
+        html = '<p style="color: #7f8c8d; font-style: italic;">Wypełnij formularz, aby zobaczyć dane.</p>';
+    }
+    
+    sidebar.innerHTML = html;
+}
+
+// Zapisz dane formularza do localStorage
+function saveFormData() {
+    var formData = getFormData();
+    localStorage.setItem('cvFormData', JSON.stringify(formData));
+}
+
+// Wczytaj dane formularza z localStorage
+function loadFormData() {
+    var saved = localStorage.getItem('cvFormData');
+    if (saved) {
+        var formData = JSON.parse(saved);
+        
+        if (formData.full_name) document.getElementById('full_name').value = formData.full_name;
+        if (formData.email) document.getElementById('email').value = formData.email;
+        if (formData.phone) document.getElementById('phone').value = formData.phone;
+        if (formData.target_role) document.getElementById('target_role').value = formData.target_role;
+        if (formData.skills) document.getElementById('skills').value = formData.skills;
+        if (formData.exp_role) document.getElementById('exp_role').value = formData.exp_role;
+        if (formData.exp_company) document.getElementById('exp_company').value = formData.exp_company;
+        if (formData.exp_description_raw) document.getElementById('exp_description_raw').value = formData.exp_description_raw;
+        if (formData.edu_school) document.getElementById('edu_school').value = formData.edu_school;
+        if (formData.edu_degree) document.getElementById('edu_degree').value = formData.edu_degree;
+        
+        // Aktualizuj sidebar po wczytaniu danych
+        updateSidebar();
+    }
+}
+
+// Obsługa zmian w formularzu - aktualizacja sidebara na żywo i zapisywanie
+document.addEventListener('DOMContentLoaded', function() {
+    // Wczytaj zapisane dane formularza
+    loadFormData();
+    
+    var formInputs = document.querySelectorAll('#cv-form input, #cv-form textarea, #cv-form select');
+    formInputs.forEach(function(input) {
+        input.addEventListener('input', function() {
+            updateSidebar();
+            saveFormData();
+        });
+        input.addEventListener('change', function() {
+            updateSidebar();
+            saveFormData();
+        });
+    });
+    
+    // Wczytaj historię chatu z localStorage
+    loadChatHistory();
+});
+
+// Wysyłanie wiadomości w chacie
+function sendChatMessage(event) {
+    event.preventDefault();
+    
+    var input = document.getElementById('chat-input');
+    var message = input.value.trim();
+    if (!message) return;
+    
+    // Dodaj wiadomość użytkownika
+    addChatMessage('user', message);
+    input.value = '';
+    
+    // Pokaż ładowanie
+    var loadingId = addChatMessage('assistant', '⏳ Piszę odpowiedź...');
+    
+    // Historia w localStorage służy tylko do wyświetlania – serwer trzyma
+    // rozmowę pod conversation_id, więc wysyłamy wyłącznie nową wiadomość
+    var history = getChatHistory();
+    history.push({ role: 'user', content: message });
+    
+    // Zbierz dane z formularza
+    var formData = getFormData();
+    
+    // Wyślij do API – odpowiedź przychodzi strumieniowo (SSE), token po tokenie
+    fetch('/api/assistant/chat/stream', {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify({ 
+            conversation_id: getConversationId(),
+            message: message,
+            candidate_data: formData
+        })
+    })
+    .then(function(resp) {
+        if (!resp.ok || !resp.body) throw new Error('Błąd: ' + resp.status);
+        
+        var reader = resp.body.getReader();
+        var decoder = new TextDecoder();
+        var buffer = '';
+        var answer = '';
+        var answerEl = null;
+        
+        function handleEvent(rawEvent) {
+            var eventName = 'message';
+            var dataLines = [];
+            rawEvent.split('\n').forEach(function(line) {
+                if (line.indexOf('event:') === 0) eventName = line.slice(6).trim();
+                else if (line.indexOf('data:') === 0) dataLines.push(line.slice(5).trim());
+            });
+            if (!dataLines.length) return;
+            var payload = JSON.parse(dataLines.join('\n'));
+            
+            if (eventName === 'token') {
+                if (!answerEl) {
+                    var loadingEl = document.getElementById(loadingId);
+                    if (loadingEl) loadingEl.remove();
+                    answerEl = document.getElementById(addChatMessage('assistant', ''));
+                }
+                answer += payload.text;
+                answerEl.lastChild.textContent = answer;
+                scrollChatToBottom();
+            } else if (eventName === 'done') {
+                answer = payload.response;
+                if (payload.conversation_id) setConversationId(payload.conversation_id);
+                if (answerEl) {
+                    answerEl.lastChild.textContent = answer;
+                } else {
+                    var loadingElDone = document.getElementById(loadingId);
+                    if (loadingElDone) loadingElDone.remove();
+                    addChatMessage('assistant', answer);
+                }
+                history.push({ role: 'assistant', content: answer });
+                saveChatHistory(history);
+            } else if (eventName === 'error') {
+                throw new Error(payload.error);
+            }
+        }
+        
+        function read() {
+            return reader.read().then(function(result) {
+                if (result.done) return;
+                buffer += decoder.decode(result.value, { stream: true });
+                var events = buffer.split('\n\n');
+                buffer = events.pop();
+                events.forEach(handleEvent);
+                return read();
+            });
+        }
+        return read();
+    })
+    .catch(function(error) {
+        var loadingEl = document.getElementById(loadingId);
+        if (loadingEl) loadingEl.remove();
+        addChatMessage('assistant', '❌ Błąd: ' + error.message);
+    });
+}
+
+function addChatMessage(role, content) {
+    var container = document.getElementById('chat-messages');
+    if (!container) return '';
+    
+    var msgDiv = document.createElement('div');
+    var msgId = 'msg-' + Date.now() + '-' + Math.random();
+    msgDiv.id = msgId;
+    msgDiv.className = 'message ' + role;
+    
+    var label = role === 'user' ? 'Ty' : 'Asystent';
+    msgDiv.innerHTML = '<p><strong>' + label + ':</strong></p><p>' + content + '</p>';
+    
+    container.appendChild(msgDiv);
+    scrollChatToBottom();
+    
+    return msgId;
+}
+
+function scrollChatToBottom() {
+    var container = document.getElementById('chat-messages');
+    if (container) {
+        container.scrollTop = container.scrollHeight;
+    }
+}
+
+// Pobierz dane z formularza
+function getFormData() {
+    return {
+        full_name: document.getElementById('full_name').value || '',
+        email: document.getElementById('email').value || '',
+        phone: document.getElementById('phone').value || '',
+        target_role: document.getElementById('target_role').value || '',
+        skills: document.getElementById('skills').value || '',
+        exp_role: document.getElementById('exp_role').value || '',
+        exp_company: document.getElementById('exp_company').value || '',
+        exp_description_raw: document.getElementById('exp_description_raw').value || '',
+        edu_school: document.getElementById('edu_school').value || '',
+        edu_degree: document.getElementById('edu_degree').value || '',
+    };
+}
+
+// Zarządzanie historią chatu w localStorage
+function getChatHistory() {
+    var history = localStorage.getItem('cvCoachHistory');
+    return history ? JSON.parse(history) : [];
+}
+
+function saveChatHistory(history) {
+    localStorage.setItem('cvCoachHistory', JSON.stringify(history));
+}
+
+function getConversationId() {
+    return localStorage.getItem('cvCoachConversationId') || null;
+}
+
+function setConversationId(conversationId) {
+    localStorage.setItem('cvCoachConversationId', conversationId);
+}
+
+function loadChatHistory() {
+    var history = getChatHistory();
+    var container = document.getElementById('chat-messages');
+    container.innerHTML = '';
+    
+    if (history.length > 0) {
+        history.forEach(function(msg) {
+            addChatMessage(msg.role, msg.content);
+        });
+    } else {
+        // Jeśli brak historii, pokaż powitalną wiadomość
+        addChatMessage('assistant', 'Cześć! Jestem Twoim asystentem CV.');
+    }
+}
+
+// Wyczyść historię chatu
+function clearChatHistory() {
+    if (confirm('Czy na pewno chcesz wyczyścić historię konwersacji?')) {
+        localStorage.removeItem('cvCoachHistory');
+        var conversationId = getConversationId();
+        if (conversationId) {
+            fetch('/api/assistant/conversations/' + encodeURIComponent(conversationId), { method: 'DELETE' });
+            localStorage.removeItem('cvCoachConversationId');
+        }
+        var container = document.getElementById('chat-messages');
+        container.innerHTML = '';
+        addChatMessage('assistant', 'Cześć! Jestem Twoim asystentem CV.');
+    }
+}
+
+// Przy przełączaniu na zakładkę chat, wyślij dane z formularza do asystenta (jeśli to pierwsza wiadomość)
+function sendInitialContextIfNeeded() {
+    var history = getChatHistory();
+    if (history.length === 0) {
+        var formData = getFormData();
+        var hasData = formData.full_name || formData.target_role || formData.skills || 
+                     (formData.exp_role && formData.exp_company);
+        
+        if (hasData) {
+            // Wyślij kontekst o danych użytkownika jako pierwszą wiadomość systemową
+            var contextMessage = 'Witaj! Mam już wypełnione dane w formularzu. ';
+            if (formData.full_name) contextMessage += 'Nazywam się ' + formData.full_name + '. ';
+            if (formData.target_role) contextMessage += 'Szukam pracy jako ' + formData.target_role + '. ';
+            if (formData.skills) contextMessage += 'Moje umiejętności to: ' + formData.skills.substring(0, 200) + '. ';
+            if (formData.exp_role && formData.exp_company) {
+                contextMessage += 'Mam doświadczenie jako ' + formData.exp_role + ' w ' + formData.exp_company + '. ';
+            }
+            contextMessage += 'Pomóż mi przygotować CV.';
+            
+            // Dodaj jako wiadomość użytkownika (ale nie pokazuj w UI, tylko w kontekście)
+            // Zamiast tego, po prostu upewnijmy się, że dane są przekazywane przy pierwszej prawdziwej wiadomości
+        }
+    }
+}
+
+// Funkcja sugerowania opisu doświadczenia
+function suggestExperience() {
+    var role = document.getElementById('exp_role').value.trim();
+    var company = document.getElementById('exp_company').value.trim();
+    var targetRole = document.getElementById('target_role').value.trim();
+
+    if (!role || !company || !targetRole) {
+        alert("Podaj stanowisko, firmę i rolę docelową, aby wygenerować opis.");
+        return;
+    }
+
+    var container = document.getElementById("exp_suggestions");
+    container.innerHTML = "<p style='color: #3498db;'>⏳ Generuję sugestie...</p>";
+
+    fetch("/api/suggest/experience", {
+        method: "POST",
+        headers: {"Content-Type": "application/json"},
+        body: JSON.stringify({
+            role: role,
+            company: company,
+            target_role: targetRole
+        })
+    })
+    .then(function(resp) {
+        if (!resp.ok) {
+            return resp.text().then(function(errorText) {
+                container.innerHTML = "<p style='color: red;'>Błąd podczas generowania sugestii. Status: " + resp.status + "</p>";
+                throw new Error("HTTP " + resp.status);
+            });
+        }
+        return resp.json();
+    })
+    .then(function(data) {
+        if (!data.variants || data.variants.length === 0) {
+            container.innerHTML = "<p style='color: orange;'>Nie udało się wygenerować sugestii. Spróbuj ponownie.</p>";
+            return;
+        }
+
+        container.innerHTML = "";
+
+        data.variants.forEach(function(v, idx) {
+            var div = document.createElement("div");
+            div.style.margin = "10px 0";
+            div.style.padding = "15px";
+            div.style.border = "1px solid #3498db";
+            div.style.borderRadius = "5px";
+            div.style.background = "#f8f9fa";
+
+            var p = document.createElement("p");
+            p.textContent = v;
+            p.style.marginBottom = "10px";
+            div.appendChild(p);
+
+            var btn = document.createElement("button");
+            btn.type = "button";
+            btn.textContent = "Wstaw wersję " + (idx + 1);
+            btn.onclick = function() {
+                document.getElementById("exp_description_raw").value = v;
+                container.innerHTML = "<p style='color: green;'>✓ Wersja " + (idx + 1) + " została wstawiona!</p>";
+                updateSidebar();
+            };
+            div.appendChild(btn);
+
+            container.appendChild(div);
+        });
+    })
+    .catch(function(error) {
+        console.error("Błąd:", error);
+        container.innerHTML = "<p style='color: red;'>Błąd: " + error.message + "</p>";
+    });
+}
+
+// Konwersja dat na lata dla backendu i formatowanie umiejętności
+document.querySelector('#cv-form').addEventListener('submit', function(e) {
+    // Formatowanie umiejętności - zamiana na przecinki
+    var skillsTextarea = this.querySelector('textarea[name="skills"]');
+    if (skillsTextarea && skillsTextarea.value) {
+        var skillsLines = skillsTextarea.value.split('\n').map(function(s) { return s.trim(); }).filter(function(s) { return s; });
+        var skillsComma = skillsLines.join(', ');
+        var hiddenSkills = document.createElement('input');
+        hiddenSkills.type = 'hidden';
+        hiddenSkills.name = 'skills';
+        hiddenSkills.value = skillsComma;
+        this.appendChild(hiddenSkills);
+        skillsTextarea.disabled = true;
+    }
+    
+    // Doświadczenie
+    var expStartDate = document.getElementById('exp_start_date').value;
+    var expEndDate = document.getElementById('exp_end_date').value;
+    
+    if (expStartDate) {
+        var year = new Date(expStartDate).getFullYear();
+        var hiddenStart = document.createElement('input');
+        hiddenStart.type = 'hidden';
+        hiddenStart.name = 'exp_start_year';
+        hiddenStart.value = year;
+        this.appendChild(hiddenStart);
+    }
+    
+    if (expEndDate) {
+        var year = new Date(expEndDate).getFullYear();
+        var hiddenEnd = document.createElement('input');
+        hiddenEnd.type = 'hidden';
+        hiddenEnd.name = 'exp_end_year';
+        hiddenEnd.value = year;
+        this.appendChild(hiddenEnd);
+    } else {
+        var hiddenEnd = document.createElement('input');
+        hiddenEnd.type = 'hidden';
+        hiddenEnd.name = 'exp_end_year';
+        hiddenEnd.value = '0';
+        this.appendChild(hiddenEnd);
+    }
+    
+    // Edukacja
+    var eduStartDate = document.getElementById('edu_start_date').value;
+    var eduEndDate = document.getElementById('edu_end_date').value;
+    
+    if (eduStartDate) {
+        var year = new Date(eduStartDate).getFullYear();
+        var hiddenStart = document.createElement('input');
+        hiddenStart.type = 'hidden';
+        hiddenStart.name = 'edu_start_year';
+        hiddenStart.value = year;
+        this.appendChild(hiddenStart);
+    }
+    
+    if (eduEndDate) {
+        var year = new Date(eduEndDate).getFullYear();
+        var hiddenEnd = document.createElement('input');
+        hiddenEnd.type = 'hidden';
+        hiddenEnd.name = 'edu_end_year';
+        hiddenEnd.value = year;
+        this.appendChild(hiddenEnd);
+    }
+    
+    // Otwórz w nowej zakładce
+    this.target = '_blank';
+});
@@ -0,0 +1,92 @@
+from app.services import cache as cache_module
+from app.services.cache import SQLiteCache, TTLCache
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_ttl_cache_expires_entries(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cache_module.time, "monotonic", clock)
+    cache = TTLCache(max_size=10, ttl_seconds=60)
+    cache.set("a", 1)
+    clock.now += 59
+    assert cache.get("a") == 1
+    clock.now += 2
+    assert cache.get("a") is None
+    assert len(cache) == 0
+    assert cache.stats() == {"size": 0, "hits": 1, "misses": 1}
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_ttl_cache_with_zero_size_stores_nothing():
+    cache = TTLCache(max_size=0)
+    cache.set("a", 1)
+    assert cache.get("a") is None
+
+
+def test_sqlite_cache_expires_entries(tmp_path, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cache_module.time, "time", clock)
+    cache = SQLiteCache(tmp_path / "cache.db", max_entries=10, ttl_seconds=60)
+    cache.set("a", b"1")
+    clock.now += 30
+    assert cache.get("a") == b"1"
+    clock.now += 31
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_sqlite_cache_evicts_least_recently_used(tmp_path, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cache_module.time, "time", clock)
+    cache = SQLiteCache(tmp_path / "cache.db", max_entries=2, touch_interval=0)
+    cache.set("a", b"1")
+    clock.now += 1
+    cache.set("b", b"2")
+    clock.now += 1
+    assert cache.get("a") == b"1"
+    clock.now += 1
+    cache.set("c", b"3")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1"
+    assert cache.get("c") == b"3"
+
+
+def test_sqlite_cache_throttles_access_updates(tmp_path, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cache_module.time, "time", clock)
+    cache = SQLiteCache(tmp_path / "cache.db", max_entries=2, touch_interval=60)
+    cache.set("a", b"1")
+    clock.now += 1
+    cache.set("b", b"2")
+    clock.now += 1
+    # trafienie krótko po zapisie nie odświeża czasu dostępu – "a" wypada pierwsze
+    assert cache.get("a") == b"1"
+    clock.now += 1
+    cache.set("c", b"3")
+    assert cache.get("a") is None
+    assert cache.get("b") == b"2"
+
+
+def test_sqlite_cache_survives_reopen(tmp_path):
+    path = tmp_path / "cache.db"
+    cache = SQLiteCache(path, max_entries=10)
+    cache.set("a", b"1")
+    cache.close()
+    assert SQLiteCache(path, max_entries=10).get("a") == b"1"
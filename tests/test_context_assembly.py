@@ -0,0 +1,53 @@
+from app.services.context_assembly import (
+    RetrievedChunk,
+    assemble_context,
+    estimate_tokens,
+    merge_overlapping,
+)
+
+
+def _chunk(source, number, content, score):
+    return RetrievedChunk(source=source, chunk_id=f"{source}#{number}", content=content, score=score)
+
+
+def test_context_stays_within_token_budget():
+    hits = [_chunk(f"doc{i}.md", 0, "słowo " * 100, 0.9 - i * 0.05) for i in range(10)]
+    context = assemble_context(hits, token_budget=400, min_score=0.0)
+    assert context.passages
+    assert context.tokens <= 400
+    assert sum(estimate_tokens(p) for p in context.passages) == context.tokens
+    assert context.tokens_saved > 0
+
+
+def test_best_passage_is_trimmed_instead_of_dropped():
+    hits = [_chunk("doc.md", 0, "słowo " * 500, 0.9)]
+    context = assemble_context(hits, token_budget=50, min_score=0.0)
+    assert len(context.passages) == 1
+    assert context.tokens <= 50
+
+
+def test_hits_below_threshold_are_ignored():
+    hits = [
+        _chunk("a.md", 0, "istotny fragment", 0.8),
+        _chunk("b.md", 0, "nieistotny fragment " * 50, 0.1),
+    ]
+    context = assemble_context(hits, token_budget=1000, min_score=0.5)
+    assert context.passages == ["istotny fragment"]
+    # oszczędność liczona tylko względem trafień powyżej progu
+    assert context.tokens_naive == estimate_tokens("istotny fragment")
+
+
+def test_adjacent_chunks_are_merged_without_overlap():
+    left = "Pierwsze zdanie o architekturze. Wspólny fragment obu chunków."
+    right = "Wspólny fragment obu chunków. Drugie zdanie o chmurze."
+    hits = [_chunk("doc.md", 1, right, 0.7), _chunk("doc.md", 0, left, 0.8)]
+    context = assemble_context(hits, token_budget=1000, min_score=0.0)
+    assert context.passages == [merge_overlapping(left, right)]
+    assert context.passages[0].count("Wspólny fragment") == 1
+    assert context.chunks_used == 2
+
+
+def test_max_passages_limits_result():
+    hits = [_chunk(f"doc{i}.md", 0, f"fragment {i}", 0.9) for i in range(5)]
+    context = assemble_context(hits, token_budget=1000, min_score=0.0, max_passages=2)
+    assert len(context.passages) == 2
@@ -0,0 +1,90 @@
+import asyncio
+import time
+
+from app.services.llm_scheduler import LLMScheduler, Priority, TokenBucket, priority
+
+
+def test_token_bucket_refills_at_rate():
+    bucket = TokenBucket(60)  # 1 token/s, pojemność 10
+    now = bucket._updated
+    assert bucket.delay(10, now) == 0
+    bucket.consume(10)
+    assert bucket.delay(1, now) == 1.0
+    assert bucket.delay(1, now + 0.5) == 0.5
+    assert bucket.delay(1, now + 1.0) == 0
+
+
+def test_token_bucket_without_limit():
+    bucket = TokenBucket(0)
+    bucket.consume(1_000_000)
+    assert bucket.delay(1_000_000, time.monotonic()) == 0
+
+
+def test_scheduler_waits_for_token_budget():
+    # 1000 tokenów/s – po wyczerpaniu kubełka 200 tokenów to ~0.2 s czekania
+    scheduler = LLMScheduler("test", tokens_per_minute=60_000, max_retries=0)
+
+    async def call():
+        return "ok"
+
+    async def main():
+        await scheduler.run(call, tokens=scheduler._tokens.capacity)
+        started = time.monotonic()
+        await scheduler.run(call, tokens=200)
+        return time.monotonic() - started
+
+    waited = asyncio.run(main())
+    assert 0.15 <= waited < 1.0
+    assert scheduler.calls == 2
+
+
+def test_scheduler_serves_higher_priority_first():
+    scheduler = LLMScheduler("test", max_concurrency=1, max_retries=0)
+    order = []
+
+    async def main():
+        release = asyncio.Event()
+
+        async def blocker():
+            await release.wait()
+
+        def call(name):
+            async def _call():
+                order.append(name)
+            return _call
+
+        held = asyncio.create_task(scheduler.run(blocker))
+        await asyncio.sleep(0)
+        waiting = []
+        for lane in (Priority.BULK, Priority.DEFAULT, Priority.INTERACTIVE):
+            with priority(lane):
+                waiting.append(asyncio.create_task(scheduler.run(call(lane.name))))
+            await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(held, *waiting)
+
+    asyncio.run(main())
+    assert order == ["INTERACTIVE", "DEFAULT", "BULK"]
+
+
+def test_scheduler_coalesces_identical_calls_per_lane():
+    scheduler = LLMScheduler("test", max_retries=0)
+    calls = []
+
+    async def call():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return len(calls)
+
+    async def main():
+        same_lane = await asyncio.gather(*(scheduler.run(call, key="k") for _ in range(3)))
+        with priority(Priority.INTERACTIVE):
+            interactive = asyncio.ensure_future(scheduler.run(call, key="k"))
+        with priority(Priority.BULK):
+            bulk = asyncio.ensure_future(scheduler.run(call, key="k"))
+        await asyncio.gather(interactive, bulk)
+        return same_lane
+
+    assert asyncio.run(main()) == [1, 1, 1]
+    # różne pasy nie współdzielą wywołania
+    assert len(calls) == 3
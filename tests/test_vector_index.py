@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from app.services.vector_index import EmbeddingIndex, IVFIndex, normalize_rows, top_k
+
+
+def _clustered(count, dim, clusters, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    labels = rng.integers(0, clusters, size=count)
+    return normalize_rows(centers[labels] + 0.5 * rng.normal(size=(count, dim)))
+
+
+def test_top_k_orders_by_score():
+    scores = np.array([0.1, 0.9, 0.5, 0.7], dtype=np.float32)
+    assert [i for i, _ in top_k(scores, 2)] == [1, 3]
+    assert [i for i, _ in top_k(scores, 10)] == [1, 3, 2, 0]
+    assert top_k(scores, 0) == []
+
+
+@pytest.mark.parametrize("quantization", ["int8", "float16"])
+def test_ivf_recall_against_exact_index(quantization):
+    vectors = _clustered(4000, 64, clusters=32)
+    queries = _clustered(50, 64, clusters=32, seed=1)
+    exact = EmbeddingIndex(vectors, normalized=True)
+    ivf = IVFIndex.build(vectors, quantization=quantization, full=vectors, nprobe=16)
+
+    limit = 10
+    found = 0
+    for query in queries:
+        expected = {i for i, _ in exact.search(query, limit)}
+        found += len(expected & {i for i, _ in ivf.search(query, limit)})
+    assert found / (limit * len(queries)) >= 0.9
+
+
+def test_ivf_with_all_lists_probed_matches_exact_index():
+    vectors = _clustered(500, 32, clusters=8)
+    query = _clustered(1, 32, clusters=8, seed=2)[0]
+    exact = EmbeddingIndex(vectors, normalized=True)
+    ivf = IVFIndex.build(vectors, quantization="float32", full=vectors)
+    hits = ivf.search(query, 5, nprobe=ivf.nlist)
+    assert [i for i, _ in hits] == [i for i, _ in exact.search(query, 5)]